@@ -1,19 +1,22 @@
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, run_db
 from app.models import User, RevokedToken
+from app.services.auth_cache import Principal, principal_cache, revoked_tokens
+from app.services.password_hashing import password_hasher, pwd_context
 
 # JWT Configuration
 SECRET_KEY = "Alohomora"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def get_password_hash(password: str) -> str:
@@ -22,52 +25,116 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def get_password_hash_async(password: str) -> str:
+    """Hash on the dedicated password-hashing pool; raises PasswordHasherBusy when it is saturated."""
+    return await password_hasher.hash(password)
+
+def _load_credentials(db: Session, email: str):
+    row = db.execute(
+        select(User.id, User.email, User.is_admin, User.hashed_password).where(User.email == email)
+    ).first()
+    db.rollback()  # Return the connection to the pool before waiting on bcrypt
+    return row
+
+def _store_password_hash(db: Session, user_id: int, hashed_password: str):
+    db.query(User).filter(User.id == user_id).update({"hashed_password": hashed_password})
+    db.commit()
+
+async def authenticate_user(db: Session, email: str, password: str):
+    """Check a login without blocking the event loop or the request threadpool on bcrypt.
+
+    Returns the user's (id, email, is_admin, hashed_password) row, or False.
+    A hash made with outdated settings (e.g. an old BCRYPT_ROUNDS) is
+    transparently replaced with a fresh one on successful login.
+    """
+    user = await run_in_threadpool(_load_credentials, db, email)
+    if not user:
         return False
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        await run_in_threadpool(_store_password_hash, db, user.id, new_hash)
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def revoke_token(db: Session, jti: str):
-    """Mark a token as revoked in the database"""
-    revoked_token = RevokedToken(jti=jti)
+def revoke_token(db: Session, jti: str, exp: Optional[int] = None):
+    """Mark a token as revoked in the database, until its ``exp`` claim (seconds since the epoch)"""
+    expires_at = datetime.utcfromtimestamp(exp) if exp is not None else None
+    revoked_token = RevokedToken(jti=jti, expires_at=expires_at)
     db.add(revoked_token)
     db.commit()
+    revoked_tokens.add(jti, expires_at)
 
 def is_token_revoked(db: Session, jti: str) -> bool:
-    """Check if a token is revoked"""
-    return db.query(RevokedToken).filter(RevokedToken.jti == jti).first() is not None
+    """Check if a token is revoked (against the periodically refreshed in-memory set)"""
+    return revoked_tokens.contains(db, jti)
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> User:
-    """Retrieve user from JWT token"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode_jwt(token: str) -> dict:
+    """Verify a JWT's signature and expiry; no revocation check."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+def decode_access_token(db: Session, token: str) -> dict:
+    """Decode and validate a JWT, rejecting revoked tokens."""
+    payload = _decode_jwt(token)
+    jti = payload.get("jti")
+    if jti is not None and is_token_revoked(db, jti):
+        raise _credentials_exception()
+    return payload
+
+def _resolve_principal(db: Session, token: str) -> Principal:
+    payload = decode_access_token(db, token)
+    user = principal_cache.get(db, payload["sub"])
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
-def get_current_admin(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_current_user(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme)
+) -> Principal:
+    """Retrieve the user from a JWT token.
+
+    Principals are served from an in-process cache, so a warm request makes
+    no DB round trip; user changes and revocations apply within the cache TTL
+    and revocation refresh interval.
+    """
+    return _resolve_principal(db, token)
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme)) -> Principal:
+    """get_current_user for async handlers.
+
+    A warm request is answered from the in-process caches on the event loop;
+    only cache misses and revocation refreshes go through run_db.
+    """
+    payload = _decode_jwt(token)
+    revoked = revoked_tokens.cached_contains(payload.get("jti"))
+    principal = principal_cache.peek(payload["sub"])
+    if revoked:
+        raise _credentials_exception()
+    if revoked is False and principal is not None:
+        return principal
+    return await run_db(_resolve_principal, token)
+
+def get_current_admin(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     """Ensure the user is an admin."""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
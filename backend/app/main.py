@@ -1,12 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from app.config import engine, Base
+from fastapi.responses import JSONResponse
+from app.config import CREATE_SCHEMA_ON_STARTUP
+from app.database import create_schema, dispose_engines
 from app.routes import user_routes, match_routes, response_routes, admin_routes, questionnaire_routes
 from app.routes import chat_routes
-
-# Create database tables if they don't exist
-Base.metadata.create_all(bind=engine)
+from app.services.chat_hub import hub
+from app.services.message_writer import message_writer
+from app.services.jobs import resume_stale_jobs, shutdown_executor, start_job_sweeper, stop_job_sweeper
+from app.services.profile_pictures import PROFILE_PICTURE_MAX_BYTES, CachedStaticFiles
 
 app = FastAPI(
     title="RoomMatch API",
@@ -21,16 +23,60 @@ app.include_router(user_routes.router)
 app.include_router(match_routes.router)
 app.include_router(response_routes.router)
 app.include_router(admin_routes.router)
+
+# Form fields that travel with a profile picture; anything bigger is refused before the body is read
+MAX_REQUEST_BYTES = PROFILE_PICTURE_MAX_BYTES + 256 * 1024
+
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    """Reject oversized uploads up front, since multipart bodies are spooled to disk before a route runs."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_REQUEST_BYTES:
+        return JSONResponse(status_code=413, content={"detail": "Request body too large"})
+    return await call_next(request)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Replace with frontend URL in production
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Has-More"],  # Chat history paging
 )
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 app.include_router(chat_routes.router, prefix="/chat")
 
+@app.on_event("startup")
+def create_missing_tables():
+    """Create tables that don't exist yet; registered first so the handlers below can rely on them."""
+    if CREATE_SCHEMA_ON_STARTUP:
+        create_schema()
+
+@app.on_event("startup")
+def resume_matching_jobs():
+    """Pick up matching jobs whose worker died before they finished, now and then periodically."""
+    resume_stale_jobs()
+    start_job_sweeper()
+
+@app.on_event("shutdown")
+def stop_matching_workers():
+    stop_job_sweeper()
+    shutdown_executor()
+
+@app.on_event("startup")
+async def start_chat_hub():
+    await message_writer.start()
+    await hub.start()
+
+@app.on_event("shutdown")
+async def stop_chat_hub():
+    await hub.stop()
+    await message_writer.stop()
+
+@app.on_event("shutdown")
+async def close_database():
+    await dispose_engines()
+
 @app.get("/")
 def read_root():
     return {"message": "p-RoomMatch API is running!"}
\ No newline at end of file
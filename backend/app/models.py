@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Float, func
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, DateTime, Float, LargeBinary, Index, func, DDL, event
+from array import array
 from datetime import datetime
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.hybrid import hybrid_property
 from app.database import Base
-from sqlalchemy import select
+
+MATCHES_PER_USER = 5  # Users with this many matches count as matched
+QUESTION_COUNT = 25
+MISSING_ANSWER = 0  # Packed value for an unanswered question (answers start at 1)
+MIN_ANSWER, MAX_ANSWER = 1, 7  # The questionnaire's answer scale
+MATCH_STRATEGIES = ("greedy", "assignment", "blocked", "stable")
+MAX_ROUNDS = 10  # Default number of rounds in a matching run
+ACTIVE_JOB_STATUSES = ("queued", "running")
 
 class User(Base):
     __tablename__ = "users"
@@ -22,19 +30,18 @@ class User(Base):
         overlaps="matched_users"
     )
 
+    # Number of matches rows this user appears in, kept in sync by triggers on matches
+    match_count = Column(Integer, nullable=False, default=0, server_default="0", index=True)
+
     @hybrid_property
     def is_matched(self):
         """Works in Python: Returns True if the user has 5 or more matches"""
-        return len(self.matches) >= 5
+        return (self.match_count or 0) >= MATCHES_PER_USER
 
     @is_matched.expression
     def is_matched(cls):
-        """Works in Queries: Returns True if the user has 5+ matches in SQLAlchemy"""
-        return (
-            select(func.count(Match.id))
-            .where((Match.user_id == cls.id) | (Match.match_id == cls.id))
-            .scalar_subquery()
-        ) >= 5
+        """Works in Queries: Indexed check on the maintained match counter"""
+        return cls.match_count >= MATCHES_PER_USER
 
     requested_new_match = Column(Boolean, nullable=True)
 
@@ -62,58 +69,132 @@ class Response(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)  # Ensure ForeignKey is linked properly
-    question1 = Column(Integer) 
-    question2 = Column(Integer)  
-    question3 = Column(Integer)  
-    question4 = Column(Integer)
-    question5 = Column(Integer)
-    question6 = Column(Integer)
-    question7 = Column(Integer)
-    question8 = Column(Integer)
-    question9 = Column(Integer)
-    question10 = Column(Integer)
-    question11 = Column(Integer)
-    question12 = Column(Integer)
-    question13 = Column(Integer)
-    question14 = Column(Integer)
-    question15 = Column(Integer)
-    question16 = Column(Integer)
-    question17 = Column(Integer)
-    question18 = Column(Integer)
-    question19 = Column(Integer)
-    question20 = Column(Integer)
-    question21 = Column(Integer)
-    question22 = Column(Integer)
-    question23 = Column(Integer)
-    question24 = Column(Integer)
-    question25 = Column(Integer)
+    # All answers packed one signed byte per question (question1 first); 0 marks an unanswered question
+    answers = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationship with user
     user = relationship("User", back_populates="responses")
 
+    @staticmethod
+    def pack_answers(values) -> bytes:
+        """Pack answers for question1..questionN into the stored byte format."""
+        values = [MISSING_ANSWER if value is None else value for value in values]
+        if any(value != MISSING_ANSWER and not MIN_ANSWER <= value <= MAX_ANSWER for value in values):
+            raise ValueError(f"Answers must be between {MIN_ANSWER} and {MAX_ANSWER}")
+        return array("b", values).tobytes()
+
+    def answer_list(self):
+        """Unpacked answers, with None for unanswered questions."""
+        return [None if value == MISSING_ANSWER else value for value in array("b", self.answers)]
+
+    def as_dict(self):
+        """Answers keyed as question1..question25, the shape the API has always returned."""
+        return {f"question{i}": value for i, value in enumerate(self.answer_list(), 1)}
+
 class RevokedToken(Base):
     __tablename__ = "revoked_tokens"
 
     id = Column(Integer, primary_key=True, index=True)
     jti = Column(String, unique=True, index=True)  # JWT ID
-    revoked_at = Column(DateTime, default=datetime.utcnow)
+    revoked_at = Column(DateTime, default=datetime.utcnow, index=True)
+    expires_at = Column(DateTime, nullable=True, index=True)  # The token's own expiry; past it the row can be ignored
 
 class Match(Base):
     __tablename__ = "matches"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    match_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    match_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     similarity_score = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", foreign_keys=[user_id], backref="matched_users", overlaps="matches")
     matched_user = relationship("User", foreign_keys=[match_id], overlaps="matches")
+
+# Statement-level triggers keep users.match_count in step with matches in the same transaction,
+# including bulk inserts and cascaded deletes (mirrored in the Alembic migration)
+MATCH_COUNT_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION matches_adjust_count() RETURNS trigger AS $$
+    DECLARE
+        direction integer := CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END;
+    BEGIN
+        UPDATE users SET match_count = users.match_count + direction * delta.n
+        FROM (
+            SELECT id, count(*) AS n FROM (
+                SELECT user_id AS id FROM changed_matches UNION ALL SELECT match_id FROM changed_matches
+            ) ids GROUP BY id
+        ) delta
+        WHERE users.id = delta.id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER matches_count_insert AFTER INSERT ON matches
+    REFERENCING NEW TABLE AS changed_matches
+    FOR EACH STATEMENT EXECUTE PROCEDURE matches_adjust_count()
+    """,
+    """
+    CREATE TRIGGER matches_count_delete AFTER DELETE ON matches
+    REFERENCING OLD TABLE AS changed_matches
+    FOR EACH STATEMENT EXECUTE PROCEDURE matches_adjust_count()
+    """,
+]
+for statement in MATCH_COUNT_TRIGGERS:
+    event.listen(Match.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+# SQLite has no transition tables, so the dev database keeps the counter with row-level triggers instead
+SQLITE_MATCH_COUNT_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS matches_count_{operation} AFTER {operation.upper()} ON matches
+    FOR EACH ROW BEGIN
+        UPDATE users SET match_count = match_count {sign} 1 WHERE id = {row}.user_id;
+        UPDATE users SET match_count = match_count {sign} 1 WHERE id = {row}.match_id;
+    END
+    """
+    for operation, sign, row in (("insert", "+", "NEW"), ("delete", "-", "OLD"))
+]
+for statement in SQLITE_MATCH_COUNT_TRIGGERS:
+    event.listen(Match.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
     
 class Message(Base):
     __tablename__ = "messages"
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"))
     receiver_id = Column(Integer, ForeignKey("users.id"))
+    # Same value for both directions of a conversation, so a thread is one index range
+    conversation_key = Column(BigInteger)
     content = Column(String)
-    timestamp = Column(DateTime, default=func.now())
\ No newline at end of file
+    timestamp = Column(DateTime, default=func.now())
+
+    __table_args__ = (Index("ix_messages_conversation_key_id", "conversation_key", "id"),)
+
+    @staticmethod
+    def conversation_key_for(user_a: int, user_b: int) -> int:
+        """Order-independent key of the conversation between two users."""
+        low, high = (user_a, user_b) if user_a < user_b else (user_b, user_a)
+        return (low << 32) | high
+
+class MatchingJob(Base):
+    __tablename__ = "matching_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, nullable=False, default="queued", index=True)  # queued, running, completed, failed
+    strategy = Column(String, nullable=False, default="greedy")
+    max_rounds = Column(Integer, nullable=False)
+    rounds_completed = Column(Integer, nullable=False, default=0)
+    pairs_written = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # Updated periodically while the job runs
+    finished_at = Column(DateTime, nullable=True)
+
+    # At most one queued or running job: every active row indexes the same value, so a second one can't be inserted
+    __table_args__ = (
+        Index("uq_matching_jobs_active", status.in_(ACTIVE_JOB_STATUSES), unique=True,
+              postgresql_where=status.in_(ACTIVE_JOB_STATUSES), sqlite_where=status.in_(ACTIVE_JOB_STATUSES)),
+    )
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import database_metrics, get_db
 from app.auth import get_current_admin  
-from app.models import User, Response, Match
-from app.services.matching import get_best_matches
+from app.services.auth_cache import Principal
+from app.models import MAX_ROUNDS, User, Response, MatchingJob
+from app.services.chat_hub import hub
+from app.services.message_writer import message_writer
+from app.services.jobs import JobAlreadyActive, job_status, submit_matching_job
+from app.services.password_hashing import password_hasher
+from app.services.response_cache import response_cache
 
 router = APIRouter()
 
 @router.get("/admin/stats")
-def get_admin_stats(db: Session = Depends(get_db), current_admin: User = Depends(get_current_admin)):
+def get_admin_stats(db: Session = Depends(get_db), current_admin: Principal = Depends(get_current_admin)):
     """Only admins can view platform statistics."""
     user_count = db.query(User).count()
     response_count = db.query(Response).count()
@@ -19,110 +24,65 @@ def get_admin_stats(db: Session = Depends(get_db), current_admin: User = Depends
     }
 
 
+@router.get("/admin/metrics")
+def get_metrics(current_admin: Principal = Depends(get_current_admin)):
+    """Runtime metrics of in-process worker and connection pools."""
+    return {"password_hashing": password_hasher.metrics(), "chat": hub.metrics(), "message_writer": message_writer.metrics(),
+            "response_cache": response_cache.metrics(), "database": database_metrics()}
+
+
 @router.post("/admin/match-users")
-def match_users(db: Session = Depends(get_db)):
+def match_users(strategy: str = "greedy", db: Session = Depends(get_db)):
     """Match users based on similarity scores and store results in the database.
-    Continues matching until no more optimal matches can be found."""
-
-    # Track all matched pairs across all iterations
-    all_matched_pairs = []
-    
-    # Fetch all existing matches (in both directions)
-    existing_matches_query = db.query(Match.user_id, Match.match_id).all()
-    existing_matches = set()
-    
-    # Add both directions to the set to ensure we catch all previous matches
-    for user_id, match_id in existing_matches_query:
-        existing_matches.add((user_id, match_id))
-        existing_matches.add((match_id, user_id))
-
-    # Continue matching in iterations until no more matches can be made
-    iterations = 0
-    max_iterations = 10  # Safety limit to prevent infinite loops
-    
-    while iterations < max_iterations:
-        iterations += 1
-        
-        # Fetch users who are still unmatched
-        unmatched_users = db.query(User).filter(User.is_matched == False).all()
-        
-        if len(unmatched_users) < 2:
-            break  # Exit if not enough users to match
-            
-        # Keep track of users available in this iteration
-        available_users = {user.id: user for user in unmatched_users}
-        matched_this_round = []
-        matches_made_this_round = False
-        
-        # Convert available_users dict to list for iteration
-        users_to_check = list(available_users.values())
-        
-        for user in users_to_check:
-            if user.id not in available_users:
-                continue  # Skip if this user was matched in this iteration
-                
-            best_matches = get_best_matches(user.id, db, top_n=10)
-            
-            if not best_matches:
-                continue  # Skip if no valid matches
-                
-            for match in best_matches:
-                matched_user = db.query(User).filter(User.email == match["match"]).first()
-                
-                if (
-                    matched_user
-                    and matched_user.id in available_users
-                    and matched_user.id != user.id  # Ensure not matching with self
-                    and (user.id, matched_user.id) not in existing_matches  # Check if they've already matched
-                ):
-                    # Create a new match entry in the database
-                    new_match = Match(user_id=user.id, match_id=matched_user.id, similarity_score=match["score"])
-                    db.add(new_match)
-                    
-                    # Add to our local tracking of existing matches
-                    existing_matches.add((user.id, matched_user.id))
-                    existing_matches.add((matched_user.id, user.id))
-                    
-                    # Update match info for return data
-                    match_info = {"user1": user.email, "user2": matched_user.email, "score": match["score"]}
-                    matched_this_round.append(match_info)
-                    all_matched_pairs.append(match_info)
-                    
-                    # Update requested_new_match to False after matching
-                    user.requested_new_match = False
-                    matched_user.requested_new_match = False
-                    
-                    # Remove both users from available pool
-                    del available_users[user.id]
-                    del available_users[matched_user.id]
-                    
-                    matches_made_this_round = True
-                    break  # Move to the next user after a successful match
-        
-        # Commit after each round to save progress
-        db.commit()
-        
-        print(f"Round {iterations}: Matched {len(matched_this_round)} pairs")
-        
-        # If no matches were made this round, we're done
-        if not matches_made_this_round:
-            break
-    
-    # Final commit to ensure all changes are saved
-    db.commit()
-    
+    Runs global matching rounds over the whole unmatched pool until no more optimal matches can be found.
+    strategy=blocked pairs users within clusters of similar users instead of across the whole pool."""
+    from app.services.match_engine import run_matching  # Loads numpy on first use; /admin/match-jobs runs it in the worker pool
+
+    try:
+        all_matched_pairs = run_matching(db, strategy=strategy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     if not all_matched_pairs:
         return []
         
     return {"matches": all_matched_pairs}
 
 
+@router.post("/admin/match-jobs", status_code=202)
+def create_match_job(
+    strategy: str = "greedy",
+    max_rounds: int = Query(MAX_ROUNDS, ge=1),
+    db: Session = Depends(get_db),
+    current_admin: Principal = Depends(get_current_admin)
+):
+    """Run matching in the background worker pool and return the job to poll."""
+    try:
+        job = submit_matching_job(db, strategy=strategy, max_rounds=max_rounds)
+    except JobAlreadyActive as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return job_status(job)
+
+
+@router.get("/admin/match-jobs/{job_id}")
+def get_match_job(job_id: int, db: Session = Depends(get_db), current_admin: Principal = Depends(get_current_admin)):
+    """Report progress of a matching job: rounds, pairs written and elapsed time."""
+    job = db.query(MatchingJob).filter(MatchingJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Matching job not found")
+
+    return job_status(job)
+
+
 @router.get("/admin/user-status")
 def get_user_status(db: Session = Depends(get_db)):
-    unmatched_users = db.query(User).filter(User.is_matched == False).all()
-    matched_users = db.query(User).filter(User.is_matched == True).all()
+    unmatched_users = db.query(User.email).filter(User.is_matched == False).all()
+    matched_users = db.query(User.email).filter(User.is_matched == True).all()
 
     return {
-        "unmatched_users": [user.email for user in unmatched_users],
-        "matched_users": [user.email for user in matched_users],
+        "unmatched_users": [email for email, in unmatched_users],
+        "matched_users": [email for email, in matched_users],
     }
\ No newline at end of file
@@ -1,63 +1,108 @@
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import Message
-from app.schemas import MessageCreate
-from app.auth import get_current_user
-from typing import List
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+from app.database import run_db
+from app.schemas import MAX_MESSAGE_LENGTH, MessageCreate
+from app.auth import get_current_user_async
+from app.services.chat_history import MAX_MESSAGE_PAGE_SIZE, MESSAGE_PAGE_SIZE, conversation_page
+from app.services.chat_hub import hub
+from app.services.message_writer import message_writer
 
 
 router = APIRouter()
 
-active_connections: List[WebSocket] = []
+# Keeps ack/fan-out tasks referenced until they finish
+pending_deliveries = set()
 
 
-# In-memory active WebSocket connections
+def parse_incoming(data: str):
+    """(content, client_id) from a client frame: JSON like {"content": ..., "client_id": ...} or plain text.
+
+    Only clients that send a client_id get ack and error frames back.
+    """
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        return data, None
+    if isinstance(payload, dict) and "content" in payload:
+        return str(payload["content"]), payload.get("client_id")
+    return data, None
+
+
+def outgoing(message_id: int, sender_id: int, content: str, timestamp):
+    return {"type": "message", "id": message_id, "sender": sender_id, "content": content, "timestamp": timestamp.isoformat() if timestamp else None}
+
+
+async def deliver_when_stored(connection, stored, user_id: int, match_id: int, content: str, client_id):
+    """Acknowledge a WebSocket message to its sender once durable, then fan it out."""
+    try:
+        message_id, timestamp = await stored
+    except Exception:
+        if client_id is not None:
+            connection.offer({"type": "error", "client_id": client_id, "detail": "Message could not be saved"})
+        return
+
+    if client_id is not None:
+        connection.offer({"type": "ack", "client_id": client_id, "id": message_id})
+    message = outgoing(message_id, user_id, content, timestamp)
+    await hub.send_to_user(match_id, message)
+    await hub.send_to_user(user_id, message, exclude=connection)
+
 
 @router.get("/messages/{user_id}/{match_id}")
-def get_messages(user_id: int, match_id: int, db: Session = Depends(get_db)):
-    """Retrieve chat messages between two users."""
-    messages = db.query(Message).filter(
-        ((Message.sender_id == user_id) & (Message.receiver_id == match_id)) |
-        ((Message.sender_id == match_id) & (Message.receiver_id == user_id))
-    ).order_by(Message.timestamp).all()
-    return [{"sender": msg.sender_id, "content": msg.content, "timestamp": msg.timestamp} for msg in messages]
+async def get_messages(
+    user_id: int, match_id: int, response: Response,
+    before: Optional[int] = None, after: Optional[int] = None,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=MAX_MESSAGE_PAGE_SIZE)
+):
+    """Retrieve a page of chat messages between two users, oldest first.
+
+    Returns the newest messages by default; pass the first message's id as
+    ``before`` to load older ones, or the last id as ``after`` for newer ones.
+    X-Has-More tells whether another page exists in that direction.
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    messages, has_more = await run_db(
+        conversation_page, user_id, match_id, before=before, after=after, limit=limit, io_only=True
+    )
+    response.headers["X-Has-More"] = "true" if has_more else "false"
+    return [{"id": msg.id, "sender": msg.sender_id, "content": msg.content, "timestamp": msg.timestamp} for msg in messages]
 
 @router.post("/messages/{user_id}/{match_id}")
-def send_message(
-    user_id: int, match_id: int, message: MessageCreate, 
-    db: Session = Depends(get_db), current_user = Depends(get_current_user)
+async def send_message(
+    user_id: int, match_id: int, message: MessageCreate, current_user = Depends(get_current_user_async)
 ):
     """Send a message to a match."""
-    new_message = Message(sender_id=user_id, receiver_id=match_id, content=message.content)
-    db.add(new_message)
-    db.commit()
-    db.refresh(new_message)
+    message_id, timestamp = await message_writer.write(user_id, match_id, message.content)
 
-    # Send real-time update to WebSocket
-    if match_id in active_connections:
-        active_connections[match_id].send_json({"sender": user_id, "content": message.content})
+    # Send real-time update to every open socket of the receiver, on any worker
+    await hub.send_to_user(match_id, outgoing(message_id, user_id, message.content, timestamp))
 
-    return {"message": "Message sent"}
+    return {"message": "Message sent", "id": message_id}
 
-@router.websocket("/chat/{user_id}/{match_id}")
+@router.websocket("/{user_id}/{match_id}")
 async def websocket_chat(websocket: WebSocket, user_id: int, match_id: int):
     """WebSocket connection for real-time chat updates."""
-    await websocket.accept()
-    active_connections[user_id] = websocket
+    connection = await hub.connect(user_id, websocket)
 
     try:
         while True:
-            data = await websocket.receive_json()
-            message = Message(sender_id=user_id, receiver_id=match_id, content=data["content"])
-            
-            # Store message in DB
-            db = next(get_db())
-            db.add(message)
-            db.commit()
-
-            # Send message to receiver if connected
-            if match_id in active_connections:
-                await active_connections[match_id].send_json(data)
+            content, client_id = parse_incoming(await websocket.receive_text())
+            if len(content) > MAX_MESSAGE_LENGTH:
+                if client_id is not None:
+                    connection.offer({"type": "error", "client_id": client_id, "detail": "Message is too long"})
+                continue
+
+            # Queue for the batched writer; ack and fan-out happen once the message is stored,
+            # without holding up the next frame from this socket
+            stored = await message_writer.submit(user_id, match_id, content)
+            task = asyncio.create_task(deliver_when_stored(connection, stored, user_id, match_id, content, client_id))
+            pending_deliveries.add(task)
+            task.add_done_callback(pending_deliveries.discard)
     except WebSocketDisconnect:
-        del active_connections[user_id]
\ No newline at end of file
+        pass
+    finally:
+        hub.disconnect(connection)
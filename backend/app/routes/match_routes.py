@@ -1,14 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import case
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.auth import get_current_user
-from app.services.matching import get_best_matches
+from app.database import run_db
+from app.auth import get_current_user_async
+from app.services.auth_cache import Principal
 from app.schemas import MatchResponse
 from app.models import User, Match
 from typing import List
 
 router = APIRouter()
 
+def match_partner_id(user_id: int):
+    """SQL expression for the other user in a Match row involving ``user_id``."""
+    return case((Match.user_id == user_id, Match.match_id), else_=Match.user_id)
+
+def load_matched_users(db: Session, user_id: int):
+    # Fetch every matched user's id and email together with the score in one query
+    return db.query(User.id, User.email, Match.similarity_score).join(
+        Match, User.id == match_partner_id(user_id)
+    ).filter(
+        (Match.user_id == user_id) | (Match.match_id == user_id)
+    ).order_by(Match.id).all()
+
+def load_match_partner(db: Session, user_id: int):
+    return db.query(User.id, User.email).join(
+        Match, User.id == match_partner_id(user_id)
+    ).filter(
+        (Match.user_id == user_id) | (Match.match_id == user_id)
+    ).order_by(Match.id).first()
+
 @router.get(
     "/match-results",
     response_model=List[MatchResponse],
@@ -37,49 +57,29 @@ router = APIRouter()
     """
 )
 @router.get("/match-results", response_model=List[MatchResponse])
-def match_results(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def match_results(current_user=Depends(get_current_user_async)):
     """Retrieve matches from the `matches` table for the logged-in user."""
     
-    # Query the matches table for this user
-    matches = db.query(Match).filter(
-        (Match.user_id == current_user.id) | (Match.match_id == current_user.id)
-    ).all()
-
-    if not matches:
-        return []
-
-    match_results = []
-    for match in matches:
-        # Identify the matched user's ID
-        matched_user_id = match.match_id if match.user_id == current_user.id else match.user_id
+    matched_users = await run_db(load_matched_users, current_user.id, io_only=True)
 
-        # Fetch matched user details
-        matched_user = db.query(User).filter(User.id == matched_user_id).first()
-        if matched_user:
-            match_results.append({
-                "matchId": int(matched_user.id),  # Ensure numeric matchId
-                "match": matched_user.email,  # Display email as match name
-                "score": match.similarity_score,  # Score from DB
-            })
-
-    return match_results
+    return [
+        {
+            "matchId": int(matched_user_id),  # Ensure numeric matchId
+            "match": email,  # Display email as match name
+            "score": similarity_score,  # Score from DB
+        }
+        for matched_user_id, email, similarity_score in matched_users
+    ]
 
 @router.post("/match/notify")
-def notify_user_about_match(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
+async def notify_user_about_match(current_user: Principal = Depends(get_current_user_async)):
     """Notify a user when their match wants a new match."""
     
-    existing_match = db.query(Match).filter(
-        (Match.user_id == current_user.id) | (Match.match_id == current_user.id)
-    ).first()
+    match_partner = await run_db(load_match_partner, current_user.id, io_only=True)
 
-    if not existing_match:
+    if not match_partner:
         raise HTTPException(status_code=404, detail="No active match found.")
 
-    match_partner = db.query(User).filter(User.id == existing_match.match_id).first()
-
     return {
         "message": f"Your match {match_partner.email} wants a new match. Do you also want a new match?",
         "match_id": match_partner.id
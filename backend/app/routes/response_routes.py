@@ -2,8 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth import get_current_user
-from app.models import Response, User
+from app.services.auth_cache import Principal
+from app.models import Response
 from app.schemas import ResponseCreate
+from app.services.response_cache import QUESTIONNAIRES, response_cache
+from app.services.matching import response_changed
 
 
 router = APIRouter()
@@ -21,42 +24,43 @@ def submit_preferences(
 
     if existing_response:
         # If response exists, update it instead of adding a new one
-        for i in range(1, 26):
-            setattr(existing_response, f"question{i}", getattr(response_data, f"question{i}"))
-            db.commit()
-            db.refresh(existing_response)
+        existing_response.answers = Response.pack_answers(response_data.answer_list())
+        db.commit()
+        db.refresh(existing_response)
+        response_cache.invalidate(QUESTIONNAIRES, current_user.id)
+        response_changed(db, current_user.id)
         
         return {"message": "Preferences updated successfully!"}
 
 
     else:
         # Create new response
-        response_dict = response_data.dict()
-        response_dict["user_id"] = current_user.id
-        new_response = Response(**response_dict)
+        new_response = Response(user_id=current_user.id, answers=Response.pack_answers(response_data.answer_list()))
         
         db.add(new_response)
         db.commit()
         db.refresh(new_response)
+        response_cache.invalidate(QUESTIONNAIRES, current_user.id)
+        response_changed(db, current_user.id)
         return {"message": "Preferences saved successfully!"}
 
 
 @router.get("/responses")
 def get_user_responses(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Allow users to retrieve their own questionnaire responses."""
     responses = db.query(Response).filter(Response.user_id == current_user.id).all()
     if not responses:
         raise HTTPException(status_code=404, detail="No responses found")
-    return {"responses": responses}
+    return {"responses": [{"id": r.id, "user_id": r.user_id, **r.as_dict()} for r in responses]}
 
 @router.put("/responses/{response_id}")
 def update_response(
     response_data: ResponseCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     existing_response = db.query(Response).filter(Response.user_id == current_user.id).first()
     """Allow users to update their own roommate questionnaire responses."""
@@ -64,19 +68,19 @@ def update_response(
     if not response:
         raise HTTPException(status_code=404, detail="Response not found")
 
-    for i in range(1, 26):
-        if hasattr(existing_response, f"question{i}"):
-            setattr(existing_response, f"question{i}", getattr(response_data, f"question{i}", None))
+    existing_response.answers = Response.pack_answers(response_data.answer_list())
 
 
     db.commit()
     db.refresh(existing_response)
+    response_cache.invalidate(QUESTIONNAIRES, current_user.id)
+    response_changed(db, current_user.id)
     return {"message": "Response updated!"}
 
 @router.delete("/responses/{response_id}")
 def delete_response(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Allow users to delete their own responses."""
     response = db.query(Response).filter(Response.id == Response.user_id, Response.user_id == current_user.id).first()
@@ -85,6 +89,8 @@ def delete_response(
 
     db.delete(response)
     db.commit()
+    response_cache.invalidate(QUESTIONNAIRES, current_user.id)
+    response_changed(db, current_user.id)
     return {"message": "Response deleted!"}
 
 @router.post("/submit-preferences")
@@ -96,11 +102,13 @@ def submit_preferences(
     """Saves user questionnaire responses."""
     response = Response(
         user_id=current_user.id,
-        question1=response_data.question1,
-        question2=response_data.question2,
-        question3=response_data.question3
+        answers=Response.pack_answers(
+            [response_data.question1, response_data.question2, response_data.question3] + [None] * 22
+        )
     )
     db.add(response)
     db.commit()
     db.refresh(response)
+    response_cache.invalidate(QUESTIONNAIRES, current_user.id)
+    response_changed(db, current_user.id)
     return {"message": "Preferences saved successfully!"}
\ No newline at end of file
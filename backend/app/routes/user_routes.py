@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Form, UploadFile, File
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
-from app.database import get_db
+from app.database import get_db, run_db
 from app.models import User
-from app.auth import get_password_hash, authenticate_user, create_access_token
-from app.auth import get_current_user
+from fastapi.concurrency import run_in_threadpool
+from app.auth import get_password_hash_async, authenticate_user, create_access_token, revoke_token
+from app.auth import decode_access_token, get_current_user, get_current_user_async, oauth2_scheme
+from app.services.auth_cache import Principal
+from app.services.password_hashing import PasswordHasherBusy
+from app.services.profile_pictures import (
+    DEFAULT_PICTURE, InvalidPicture, delete_profile_picture, save_profile_picture, thumbnail_url,
+)
+from app.services.response_cache import PROFILES, CachedBody, conditional_response, response_cache
 from app.services.matching import get_best_matches
-import os
-import shutil
 import re
 
 router = APIRouter()
@@ -29,12 +34,68 @@ SCHOOL_EMAIL_DOMAINS = {
     # Add more schools and their domains as needed
 }
 
+PASSWORD_REGEX = r"^(?=.*[A-Z])(?=.*[a-z])(?=.*\d)(?=.*[@$!%*?&#])[A-Za-z\d@$!%*?&#]{8,}$"
 
-# Profile picture upload directory
-UPLOAD_DIR = "static/profile_pics"
-os.makedirs(UPLOAD_DIR, exist_ok=True)  # Ensure directory exists
+def hasher_busy_error():
+    """503 returned when the password-hashing pool is saturated, e.g. during a login burst."""
+    return HTTPException(
+        status_code=503, detail="Too many login attempts in progress, please retry shortly", headers={"Retry-After": "1"}
+    )
 
-PASSWORD_REGEX = r"^(?=.*[A-Z])(?=.*[a-z])(?=.*\d)(?=.*[@$!%*?&#])[A-Za-z\d@$!%*?&#]{8,}$"
+def email_registered(db: Session, email: str) -> bool:
+    registered = db.query(User.id).filter(User.email == email).first() is not None
+    db.rollback()  # Return the connection to the pool before waiting on bcrypt
+    return registered
+
+def save_new_user(db: Session, user: User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+def discard_unused_picture(db: Session, profile_picture: str):
+    """Delete a just-published picture after its user insert failed, unless someone else uses the same file."""
+    db.rollback()
+    in_use = db.query(User.id).filter(User.profile_picture == profile_picture).first() is not None
+    db.rollback()
+    if not in_use:
+        delete_profile_picture(profile_picture)
+
+def save_profile_fields(db: Session, user_id: int, fields: dict):
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        return None
+    for name, value in fields.items():
+        setattr(user, name, value)
+    db.commit()
+    db.refresh(user)
+    return user
+
+def profile_payload(user: User) -> dict:
+    """Profile fields shown to the user and their matches, with fallback values."""
+    return {
+        "email": user.email,
+        "school": user.school,
+        "hometown": user.hometown or "",
+        "major": user.major or "",
+        "graduation_year": user.graduation_year or "",
+        "interests": user.interests or "",
+        "profile_picture": user.profile_picture or DEFAULT_PICTURE,
+        "profile_picture_thumbnail": thumbnail_url(user.profile_picture),
+        "prompts": [
+            {"prompt": user.prompt1 or "", "response": user.response1 or ""},
+            {"prompt": user.prompt2 or "", "response": user.response2 or ""},
+            {"prompt": user.prompt3 or "", "response": user.response3 or ""},
+        ]
+    }
+
+def load_profile(db: Session, user_id: int) -> dict:
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return profile_payload(user)
+
+def cached_profile(db: Session, user_id: int) -> CachedBody:
+    return response_cache.get_or_build(PROFILES, user_id, lambda: load_profile(db, user_id))
 
 def validate_password(password: str):
     """Ensure password meets security criteria."""
@@ -54,7 +115,7 @@ def validate_password(password: str):
 # User Registration
 # -----------------------
 @router.post("/register")
-def register_user(
+async def register_user(
     email: str = Form(...),
     password: str = Form(...),
     school: str = Form(...),
@@ -93,25 +154,23 @@ def register_user(
         return JSONResponse(status_code=400, content={"success": False, "message": password_error})
 
     # 🔹 Check if email is already registered
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = await run_in_threadpool(email_registered, db, email)
     if existing_user:
         return JSONResponse(
             status_code=400,
             content={"success": False, "message": "This email is already registered. Try logging in."}
         )
 
+    profile_pic_path = None
     try:
-        hashed_password = get_password_hash(password)
+        hashed_password = await get_password_hash_async(password)
 
         # 🔹 Save profile picture if uploaded
-        profile_pic_path = None
         if profile_picture:
             try:
-                filename = f"user_{email.replace('@', '_').replace('.', '_')}.jpg"
-                file_path = os.path.join(UPLOAD_DIR, filename)
-                with open(file_path, "wb") as buffer:
-                    shutil.copyfileobj(profile_picture.file, buffer)
-                profile_pic_path = f"/static/profile_pics/{filename}"
+                profile_pic_path = await save_profile_picture(profile_picture)
+            except InvalidPicture as e:
+                return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
             except Exception as e:
                 return JSONResponse(
                     status_code=400,
@@ -137,24 +196,30 @@ def register_user(
             is_active=True
         )
 
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await run_in_threadpool(save_new_user, db, new_user)
 
         return JSONResponse(status_code=201, content={"success": True, "message": "User registered successfully! You can now log in."})
 
+    except PasswordHasherBusy:
+        raise hasher_busy_error()
     except Exception as e:
-        db.rollback()
+        await run_in_threadpool(db.rollback)
+        if profile_pic_path:
+            # The picture was published before the insert failed (e.g. the same email registered concurrently)
+            await run_in_threadpool(discard_unused_picture, db, profile_pic_path)
         return JSONResponse(status_code=500, content={"success": False, "message": f"Registration failed: {str(e)}"})
 
 # Login (Token Generation)
 @router.post("/token")
-def login_for_access_token(
+async def login_for_access_token(
     username: str = Form(...),  # OAuth expects "username"
     password: str = Form(...),
     db: Session = Depends(get_db)
 ):
-    user = authenticate_user(db, username, password)
+    try:
+        user = await authenticate_user(db, username, password)
+    except PasswordHasherBusy:
+        raise hasher_busy_error()
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
@@ -162,27 +227,25 @@ def login_for_access_token(
     
     return {"access_token": access_token, "user_id": user.id}  # Send user_id 
 
+@router.post("/logout")
+def logout(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+    """Revoke the presented access token."""
+    payload = decode_access_token(db, token)
+    if payload.get("jti"):
+        revoke_token(db, payload["jti"], payload.get("exp"))
+    return {"message": "Logged out"}
+
 # The rest of your routes remain unchanged
 # -----------------------
 # Retrieve User Profile
 # -----------------------
 @router.get("/user-profile")
-def get_user_profile(current_user: User = Depends(get_current_user)):
-    """Retrieve user profile information with fallback values."""
-    return {
-        "email": current_user.email,
-        "school": current_user.school,
-        "hometown": current_user.hometown or "",
-        "major": current_user.major or "",
-        "graduation_year": current_user.graduation_year or "",
-        "interests": current_user.interests or "",
-        "profile_picture": current_user.profile_picture or "/static/profile_pics/default-avatar.png",  
-        "prompts": [
-            {"prompt": current_user.prompt1 or "", "response": current_user.response1 or ""},
-            {"prompt": current_user.prompt2 or "", "response": current_user.response2 or ""},
-            {"prompt": current_user.prompt3 or "", "response": current_user.response3 or ""},
-        ]
-    }
+async def get_user_profile(request: Request, current_user: Principal = Depends(get_current_user_async)):
+    """Retrieve user profile information with fallback values.
+
+    Served from the response cache; a matching If-None-Match gets a 304.
+    """
+    return conditional_response(request, await run_db(cached_profile, current_user.id))
 # -----------------------
 # Update User Profile
 # -----------------------
@@ -199,42 +262,40 @@ async def update_profile(
     selected_prompt3: str = Form(""),
     response3: str = Form(""),
     profile_picture: UploadFile = File(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user_async)
 ):
-    user = db.query(User).filter(User.id == current_user.id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Update user profile fields
-    user.hometown = hometown
-    user.major = major
-    user.graduation_year = graduation_year
-    user.interests = interests
-    user.prompt1 = selected_prompt1
-    user.response1 = response1
-    user.prompt2 = selected_prompt2
-    user.response2 = response2
-    user.prompt3 = selected_prompt3
-    user.response3 = response3
-
-    # Handle profile picture upload
+    # Handle profile picture upload; the file is streamed to disk and resized off the event loop
+    profile_pic_path = None
     if profile_picture:
-        filename = f"user_{current_user.id}.jpg"
-        file_path = os.path.join(UPLOAD_DIR, filename)
-
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(profile_picture.file, buffer)
-        
-        user.profile_picture = f"/static/profile_pics/{filename}"  # Store relative path
+        try:
+            profile_pic_path = await save_profile_picture(profile_picture)
+        except InvalidPicture as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    fields = {
+        "hometown": hometown,
+        "major": major,
+        "graduation_year": graduation_year,
+        "interests": interests,
+        "prompt1": selected_prompt1,
+        "response1": response1,
+        "prompt2": selected_prompt2,
+        "response2": response2,
+        "prompt3": selected_prompt3,
+        "response3": response3,
+    }
+    if profile_pic_path:
+        fields["profile_picture"] = profile_pic_path  # Store relative path
 
-    # Save to database
-    db.commit()
-    db.refresh(user)
+    user = await run_db(save_profile_fields, current_user.id, fields, io_only=True)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    response_cache.invalidate(PROFILES, current_user.id)
 
     return {
         "message": "Profile updated successfully!",
         "profile_picture": user.profile_picture,
+        "profile_picture_thumbnail": thumbnail_url(user.profile_picture),
         "hometown": user.hometown,
         "major": user.major,
         "graduation_year": user.graduation_year,
@@ -248,47 +309,32 @@ async def update_profile(
 # -----------------------
 # Retrieve Available Prompts
 # -----------------------
+PROMPTS = [
+    "What's something unique about you?",
+    "What's your ideal weekend?",
+    "Describe your perfect roommate situation.",
+    "What's a fun fact about yourself?",
+    "What's your favorite hobby?",
+    "What's a dealbreaker in a roommate?",
+    "How do you handle conflict?",
+    "What's your sleep schedule like?",
+    "What's your go-to comfort meal?",
+    "Do you prefer a quiet or social living space?"
+]
+PROMPTS_BODY = CachedBody.from_payload(PROMPTS)  # Never changes while the process runs
+
 @router.get("/prompts", response_model=list[str])
-def get_available_prompts():
+def get_available_prompts(request: Request):
     """Returns a list of predefined prompt options."""
-    prompts = [
-        "What's something unique about you?",
-        "What's your ideal weekend?",
-        "Describe your perfect roommate situation.",
-        "What's a fun fact about yourself?",
-        "What's your favorite hobby?",
-        "What's a dealbreaker in a roommate?",
-        "How do you handle conflict?",
-        "What's your sleep schedule like?",
-        "What's your go-to comfort meal?",
-        "Do you prefer a quiet or social living space?"
-    ]
-    return prompts
+    return conditional_response(request, PROMPTS_BODY)
 
 @router.get("/user-profile/{user_id}")
-def get_match_profile(user_id: int, db: Session = Depends(get_db)):
+async def get_match_profile(user_id: int, request: Request):
     """Retrieve a matched user's profile using their email."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    return {
-        "email": user.email,
-        "school": user.school,
-        "hometown": user.hometown or "",
-        "major": user.major or "",
-        "graduation_year": user.graduation_year or "",
-        "interests": user.interests or "",
-        "profile_picture": user.profile_picture or "/static/profile_pics/default-avatar.png",
-        "prompts": [
-            {"prompt": user.prompt1 or "", "response": user.response1 or ""},
-            {"prompt": user.prompt2 or "", "response": user.response2 or ""},
-            {"prompt": user.prompt3 or "", "response": user.response3 or ""},
-        ]
-    }
+    return conditional_response(request, await run_db(cached_profile, user_id))
 @router.get("/matches")
 def get_matches(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Return roommate matches for the logged-in user."""
@@ -300,13 +346,13 @@ def get_matches(
 
     return {"matches": matches}
 
+def flag_new_match_request(db: Session, user_id: int):
+    db.query(User).filter(User.id == user_id).update({"requested_new_match": True})
+    db.commit()
+
 @router.post("/request-new-match")
-def request_new_match(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
+async def request_new_match(current_user: Principal = Depends(get_current_user_async)):
     """Allows a user to request a new match."""
     
-    current_user.requested_new_match = True
-    db.commit()
+    await run_db(flag_new_match_request, current_user.id, io_only=True)
     return {"message": "You have requested a new match."}
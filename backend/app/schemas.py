@@ -1,6 +1,11 @@
-from pydantic import BaseModel, EmailStr
-from typing import List
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field
+from typing import Annotated, List
+from app.models import MAX_ANSWER, MIN_ANSWER
+
+# One questionnaire answer; anything off the scale is rejected with a 422
+Answer = Annotated[int, Field(ge=MIN_ANSWER, le=MAX_ANSWER)]
+
+MAX_MESSAGE_LENGTH = 4000  # Characters per chat message
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -17,31 +22,34 @@ class UserCreate(BaseModel):
 
 class ResponseCreate(BaseModel):
     """Schema for user questionnaire responses."""
-    question1: int
-    question2: int
-    question3: int
-    question4: int
-    question5: int
-    question6: int
-    question7: int
-    question8: int
-    question9: int
-    question10: int
-    question11: int
-    question12: int
-    question13: int
-    question14: int
-    question15: int
-    question16: int
-    question17: int
-    question18: int
-    question19: int
-    question20: int
-    question21: int
-    question22: int
-    question23: int
-    question24: int
-    question25: int
+    question1: Answer
+    question2: Answer
+    question3: Answer
+    question4: Answer
+    question5: Answer
+    question6: Answer
+    question7: Answer
+    question8: Answer
+    question9: Answer
+    question10: Answer
+    question11: Answer
+    question12: Answer
+    question13: Answer
+    question14: Answer
+    question15: Answer
+    question16: Answer
+    question17: Answer
+    question18: Answer
+    question19: Answer
+    question20: Answer
+    question21: Answer
+    question22: Answer
+    question23: Answer
+    question24: Answer
+    question25: Answer
+
+    def answer_list(self):
+        return [getattr(self, f"question{i}") for i in range(1, 26)]
 
 
 class MatchResponse(BaseModel):
@@ -59,4 +67,4 @@ class MatchResponse(BaseModel):
         }
         
 class MessageCreate(BaseModel):
-    content: str
\ No newline at end of file
+    content: Annotated[str, Field(max_length=MAX_MESSAGE_LENGTH)]
\ No newline at end of file
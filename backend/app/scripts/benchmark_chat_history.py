@@ -0,0 +1,98 @@
+"""Benchmark the first page of chat history against the old full-thread load.
+
+Seeds one conversation of growing length (plus unrelated traffic) into a
+scratch database, then times the old OR-predicate query that loads the whole
+thread and the keyset-paginated first page, and compares response sizes.
+
+Usage (from backend/):
+    python -m app.scripts.benchmark_chat_history
+    python -m app.scripts.benchmark_chat_history --lengths 1000 100000 --database-url postgresql://.../scratch
+"""
+import argparse
+import json
+import time
+from sqlalchemy import create_engine, insert, inspect
+from sqlalchemy.orm import Session
+from app.models import Message, User
+from app.services.chat_history import conversation_page
+
+TABLES = [User.__table__, Message.__table__]
+
+
+def legacy_history(db: Session, user_id: int, match_id: int):
+    messages = db.query(Message).filter(
+        ((Message.sender_id == user_id) & (Message.receiver_id == match_id)) |
+        ((Message.sender_id == match_id) & (Message.receiver_id == user_id))
+    ).order_by(Message.timestamp).all()
+    return [{"sender": msg.sender_id, "content": msg.content, "timestamp": msg.timestamp} for msg in messages]
+
+
+def first_page(db: Session, user_id: int, match_id: int):
+    messages, _ = conversation_page(db, user_id, match_id)
+    return [{"id": msg.id, "sender": msg.sender_id, "content": msg.content, "timestamp": msg.timestamp} for msg in messages]
+
+
+def seed(engine, target: int, noise_users: int):
+    """Grow the conversation between users 1 and 2 to `target` messages, with traffic between other users mixed in."""
+    with Session(engine) as db:
+        current = db.query(Message).filter(Message.conversation_key == Message.conversation_key_for(1, 2)).count()
+        rows = []
+        for i in range(current, target):
+            sender, receiver = (1, 2) if i % 2 else (2, 1)
+            rows.append({"sender_id": sender, "receiver_id": receiver,
+                         "conversation_key": Message.conversation_key_for(sender, receiver), "content": f"message {i}"})
+            other = 3 + i % noise_users
+            rows.append({"sender_id": other, "receiver_id": other + 1,
+                         "conversation_key": Message.conversation_key_for(other, other + 1), "content": f"noise {i}"})
+            if len(rows) >= 20000:
+                db.execute(insert(Message), rows)
+                rows = []
+        if rows:
+            db.execute(insert(Message), rows)
+        db.commit()
+
+
+def timed(engine, func, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        with Session(engine) as db:
+            start = time.perf_counter()
+            result = func(db, 1, 2)
+            best = min(best, time.perf_counter() - start)
+    return best, len(json.dumps(result, default=str))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:////tmp/benchmark_chat_history.db",
+                        help="Scratch database; the users and messages tables are created and dropped")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--noise-users", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    existing = set(inspect(engine).get_table_names()) & {table.name for table in TABLES}
+    if existing:
+        parser.error(f"{args.database_url} already has tables {sorted(existing)}; point --database-url at a scratch database")
+
+    User.metadata.create_all(engine, tables=TABLES)
+    try:
+        with Session(engine) as db:
+            db.execute(insert(User), [{"id": i, "email": f"bench{i}@example.edu", "hashed_password": "-"}
+                                      for i in range(1, args.noise_users + 4)])
+            db.commit()
+
+        print(f"{'thread':>8} {'full load (ms)':>15} {'first page (ms)':>16} {'full KiB':>9} {'page KiB':>9}")
+        for length in sorted(args.lengths):
+            seed(engine, length, args.noise_users)
+            legacy_time, legacy_size = timed(engine, legacy_history, args.repeat)
+            page_time, page_size = timed(engine, first_page, args.repeat)
+            print(f"{length:>8} {legacy_time * 1000:>15.2f} {page_time * 1000:>16.2f} "
+                  f"{legacy_size / 1024:>9.1f} {page_size / 1024:>9.1f}")
+    finally:
+        User.metadata.drop_all(engine, tables=TABLES)
+
+
+if __name__ == "__main__":
+    main()
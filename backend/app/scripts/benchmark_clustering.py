@@ -0,0 +1,65 @@
+"""Compare the capped MiniBatchKMeans clustering against the old KMeans + full argsort pipeline.
+
+The legacy pipeline (KMeans with n_init=10 and a fixed k, a dense cosine
+matrix per cluster and a full argsort per user) is only run up to
+--legacy-max users, since its per-cluster matrices grow quadratically.
+
+Usage (from backend/):
+    python -m app.scripts.benchmark_clustering
+    python -m app.scripts.benchmark_clustering --sizes 20000 100000 --max-cluster-size 2000 --clusters 40
+"""
+import argparse
+import time
+import numpy as np
+from sklearn.cluster import KMeans
+from app.scripts.benchmark_neighbors import synthetic_answers
+from app.services.clustering import cluster_vectors
+from app.services.neighbor_index import normalize_rows
+
+
+def legacy_cluster(answers: np.ndarray, num_clusters: int):
+    """The previous cluster_users pipeline; returns (fit seconds, preference seconds, cluster sizes)."""
+    start = time.perf_counter()
+    labels = KMeans(n_clusters=num_clusters, random_state=42, n_init=10).fit_predict(answers)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for cluster in range(num_clusters):
+        vectors = normalize_rows(answers[labels == cluster])
+        similarities = vectors @ vectors.T
+        {i: [j for j in np.argsort(similarities[i])[::-1] if i != j] for i in range(len(vectors))}
+    return fit_seconds, time.perf_counter() - start, np.bincount(labels, minlength=num_clusters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 10000, 50000])
+    parser.add_argument("--max-cluster-size", type=int, default=4000)
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--legacy-clusters", type=int, default=3, help="The fixed k of the old pipeline")
+    parser.add_argument("--legacy-max", type=int, default=10000, help="Skip the legacy pipeline above this many users")
+    parser.add_argument("--clusters", type=int, default=20, help="Generate clustered answers around this many archetypes")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'users':>8} {'pipeline':>8} {'k':>5} {'fit (s)':>9} {'prefs (s)':>10} {'sizes (min/median/max)':>24} "
+          f"{'largest matrix':>15}")
+    for size in args.sizes:
+        answers = synthetic_answers(rng, size, args.clusters)
+
+        if size <= args.legacy_max:
+            fit_seconds, preference_seconds, sizes = legacy_cluster(answers, args.legacy_clusters)
+            spread = f"{sizes.min()}/{int(np.median(sizes))}/{sizes.max()}"
+            print(f"{size:>8} {'legacy':>8} {len(sizes):>5} {fit_seconds:>9.2f} {preference_seconds:>10.2f} {spread:>24} "
+                  f"{4 * sizes.max() ** 2 / 2 ** 20:>12.0f} MB")
+
+        clustering = cluster_vectors(np.arange(size), normalize_rows(answers), args.max_cluster_size, args.top_k)
+        report = clustering.report()
+        spread = f"{report['min_size']}/{int(report['median_size'])}/{report['max_size']}"
+        print(f"{size:>8} {'capped':>8} {report['clusters']:>5} {report['fit_seconds']:>9.2f} "
+              f"{report['preference_seconds']:>10.2f} {spread:>24} {4 * report['max_size'] ** 2 / 2 ** 20:>12.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Measure what dealbreaker constraints add to the exact top-K candidate search, and check the excluded pairs.
+
+"plain" is the cosine search with no constraints. "dealbreakers" folds the
+constraints into the same matrix product (see app.services.dealbreakers),
+including building the one-hot blocks. "mask" applies the same constraints
+as a boolean mask over every chunk of the score matrix, for reference.
+Overhead is relative to plain. Correctness is checked on a sample of rows
+against the masked search: both must return the same scores, and no
+returned pair may break a dealbreaker.
+
+Usage (from backend/):
+    python -m app.scripts.benchmark_dealbreakers
+    python -m app.scripts.benchmark_dealbreakers --sizes 20000 50000 --dealbreakers "question1<=1,question5<=2,question9<=3"
+"""
+import argparse
+import sys
+import time
+import numpy as np
+from app.scripts.benchmark_neighbors import synthetic_answers
+from app.services.dealbreakers import Dealbreakers
+from app.services.neighbor_index import SIMILARITY_CHUNK_SIZE, ExactIndex, _top_k_of_block, normalize_rows
+
+
+def masked_top_k(vectors: np.ndarray, answers: np.ndarray, rules: Dealbreakers, rows: np.ndarray, k: int):
+    """Top-k of the given rows with the constraints applied as a boolean mask over each score chunk."""
+    neighbors = np.empty((len(rows), k), dtype=np.int64)
+    scores = np.empty((len(rows), k), dtype=np.float32)
+    for start in range(0, len(rows), SIMILARITY_CHUNK_SIZE):
+        chunk = rows[start:start + SIMILARITY_CHUNK_SIZE]
+        block = vectors[chunk] @ vectors.T
+        block[~rules.allowed(answers[chunk], answers)] = -np.inf
+        block[np.arange(len(chunk)), chunk] = -np.inf
+        neighbors[start:start + len(chunk)], scores[start:start + len(chunk)] = _top_k_of_block(block, k)
+    return neighbors, scores
+
+
+def best_of(repeat: int, run):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000])
+    parser.add_argument("--dealbreakers", default="question1<=1,question5<=2",
+                        help="Constraints in MATCH_DEALBREAKERS format")
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--clusters", type=int, default=20, help="Generate clustered answers around this many archetypes")
+    parser.add_argument("--sample", type=int, default=500, help="Rows checked against the masked search")
+    parser.add_argument("--repeat", type=int, default=3, help="Report the best of this many runs")
+    parser.add_argument("--max-overhead", type=float, default=None,
+                        help="Exit with status 1 if the dealbreaker overhead exceeds this percentage")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rules = Dealbreakers.parse(args.dealbreakers)
+    rng = np.random.default_rng(args.seed)
+    print(f"{len(rules)} dealbreakers: {args.dealbreakers}")
+    print(f"{'users':>8} {'excluded':>9} {'plain (s)':>10} {'dealbreakers (s)':>17} {'overhead':>9} "
+          f"{'mask (s)':>9} {'overhead':>9} {'checked':>8}")
+    worst = 0.0
+    for size in args.sizes:
+        answers = synthetic_answers(rng, size, args.clusters)
+        vectors = normalize_rows(answers)
+
+        plain, _ = best_of(args.repeat, lambda: ExactIndex(vectors).top_k(args.top_k))
+        folded, (neighbors, scores) = best_of(
+            args.repeat, lambda: ExactIndex(vectors, constraints=rules.features(answers)).top_k(args.top_k)
+        )
+        masked, _ = best_of(1, lambda: masked_top_k(vectors, answers, rules, np.arange(size), args.top_k))
+
+        sample = rng.choice(size, size=min(args.sample, size), replace=False)
+        _, expected = masked_top_k(vectors, answers, rules, sample, args.top_k)
+        same_scores = np.allclose(scores[sample], expected, atol=1e-5)
+        allowed = rules.allowed(answers[sample], answers)
+        rows, positions = np.nonzero(np.isfinite(scores[sample]))
+        kept = allowed[rows, neighbors[sample][rows, positions]].all()
+        excluded = 1 - allowed.mean()
+
+        overhead = 100 * (folded / plain - 1)
+        worst = max(worst, overhead)
+        print(f"{size:>8} {excluded:>9.1%} {plain:>10.2f} {folded:>17.2f} {overhead:>8.1f}% "
+              f"{masked:>9.2f} {100 * (masked / plain - 1):>8.1f}% {'ok' if same_scores and kept else 'FAILED':>8}")
+
+    if args.max_overhead is not None and worst > args.max_overhead:
+        print(f"Dealbreaker overhead {worst:.1f}% is over the {args.max_overhead:.1f}% budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measure how long a fresh API worker takes to import the app, and what it loads.
+
+Each run imports the module in a new interpreter, so the numbers include
+everything a worker pays before it can serve its first request. The framework
+baseline (FastAPI + SQLAlchemy alone) shows how much of that is ours.
+
+Usage (from backend/):
+    python -m app.scripts.benchmark_import_time
+    python -m app.scripts.benchmark_import_time --runs 10 --top 30
+    python -m app.scripts.benchmark_import_time --fail-on-heavy   # Exit 1 if the ML stack loads at startup
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+BASELINE = "fastapi, sqlalchemy.orm"
+# Loaded lazily by the matching code and the picture upload path; none should appear at startup
+HEAVY_MODULES = ("numpy", "scipy", "pandas", "sklearn", "PIL")
+
+PROBE = """
+import json, sys, time
+began = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - began
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(module: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, top: int):
+    """(cumulative microseconds, module) of the slowest imports, from python -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True, capture_output=True, text=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def report(label: str, module: str, runs: int):
+    results = [time_import(module) for _ in range(runs)]
+    seconds = sorted(result["seconds"] for result in results)
+    print(f"{label:<10} median {statistics.median(seconds) * 1000:7.1f} ms   "
+          f"min {seconds[0] * 1000:7.1f} ms   max {seconds[-1] * 1000:7.1f} ms")
+    return results[-1]["heavy"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--fail-on-heavy", action="store_true")
+    args = parser.parse_args()
+
+    time_import(args.module)  # Warm the bytecode cache so the first run isn't compiling
+    report("baseline", BASELINE, args.runs)
+    heavy = report(args.module, args.module, args.runs)
+
+    print(f"\nSlowest imports of {args.module} (cumulative):")
+    for cumulative, name in slowest_imports(args.module, args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    print(f"\nHeavy modules loaded at import: {', '.join(heavy) if heavy else 'none'}")
+    if heavy and args.fail_on_heavy:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
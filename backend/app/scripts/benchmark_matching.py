@@ -0,0 +1,70 @@
+"""Benchmark the batched reciprocal top-N engine against the old per-user loop.
+
+Usage (from backend/):
+    python -m app.scripts.benchmark_matching
+    python -m app.scripts.benchmark_matching --sizes 1000 10000 50000 --legacy-max 1000
+"""
+import argparse
+import time
+import numpy as np
+from app.models import QUESTION_COUNT
+from app.services.neighbor_index import normalize_rows, top_k_neighbors
+from app.services.similarity import reciprocal_top_n
+
+
+def legacy_reciprocal_matches(answers: np.ndarray, top_n: int):
+    """The original get_best_matches loop: one full argsort per candidate."""
+    vectors = normalize_rows(answers).astype(np.float64)
+    similarity_matrix = vectors @ vectors.T
+    np.fill_diagonal(similarity_matrix, -np.inf)
+
+    reciprocal_matches = {user: [] for user in range(len(answers))}
+    for user in range(len(answers)):
+        similarity_scores = similarity_matrix[user]
+        for idx in np.argsort(similarity_scores)[::-1]:
+            if idx != user and len(reciprocal_matches[user]) < top_n:
+                match_sorted_indices = np.argsort(similarity_matrix[idx])[::-1]
+                if user in match_sorted_indices[:top_n]:
+                    reciprocal_matches[user].append((idx, similarity_scores[idx]))
+    return reciprocal_matches
+
+
+def batched_reciprocal_matches(answers: np.ndarray, top_n: int, top_k: int):
+    vectors = normalize_rows(answers)
+    neighbors, scores = top_k_neighbors(vectors, top_k)
+    return reciprocal_top_n(neighbors, scores, top_n)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 10000, 20000, 50000])
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--legacy-max", type=int, default=1000,
+                        help="Only run the legacy loop up to this many respondents (it is O(N^3 log N))")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'users':>8} {'batched (s)':>12} {'legacy (s)':>12} {'speedup':>9}")
+    for size in args.sizes:
+        answers = rng.integers(1, 8, size=(size, QUESTION_COUNT)).astype(np.float32)
+
+        start = time.perf_counter()
+        batched_reciprocal_matches(answers, args.top_n, args.top_k)
+        batched = time.perf_counter() - start
+
+        legacy = None
+        if size <= args.legacy_max:
+            start = time.perf_counter()
+            legacy_reciprocal_matches(answers, args.top_n)
+            legacy = time.perf_counter() - start
+
+        if legacy is None:
+            print(f"{size:>8} {batched:>12.3f} {'-':>12} {'-':>9}")
+        else:
+            print(f"{size:>8} {batched:>12.3f} {legacy:>12.3f} {legacy / batched:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
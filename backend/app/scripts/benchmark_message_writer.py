@@ -0,0 +1,114 @@
+"""Benchmark the batched chat message writer against one commit per message.
+
+Simulates many chat sockets whose frames all arrive at once. The per-message
+path commits every message synchronously on the event loop, as the WebSocket
+handler used to; the batched path goes through MessageWriter. A message's
+latency is the time from the burst until it is committed.
+
+Usage (from backend/):
+    python -m app.scripts.benchmark_message_writer
+    python -m app.scripts.benchmark_message_writer --producers 200 --messages 50 --database-url postgresql://...
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, create_engine, func, insert
+from sqlalchemy.orm import declarative_base, sessionmaker
+from app.models import Message
+from app.services.message_writer import MessageWriter
+
+BenchBase = declarative_base()
+
+
+class BenchMessage(BenchBase):
+    __tablename__ = "bench_messages"
+    id = Column(Integer, primary_key=True)
+    sender_id = Column(Integer)
+    receiver_id = Column(Integer)
+    conversation_key = Column(BigInteger)
+    content = Column(String)
+    timestamp = Column(DateTime, default=func.now())
+
+
+async def per_message(session_factory, producers: int, messages: int):
+    table = BenchMessage.__table__
+
+    async def producer(sender_id: int):
+        latencies = []
+        for i in range(messages):
+            db = session_factory()
+            try:
+                db.execute(insert(table), {
+                    "sender_id": sender_id, "receiver_id": sender_id + 1,
+                    "conversation_key": Message.conversation_key_for(sender_id, sender_id + 1), "content": f"message {i}",
+                })
+                db.commit()
+            finally:
+                db.close()
+            latencies.append(time.perf_counter() - began)
+            await asyncio.sleep(0)  # Let other sockets' frames in, as the old handler did between receives
+        return latencies
+
+    began = time.perf_counter()
+    return await asyncio.gather(*(producer(p) for p in range(producers)))
+
+
+async def batched(session_factory, producers: int, messages: int, batch_size: int, batch_delay: float):
+    writer = MessageWriter(session_factory, BenchMessage.__table__, batch_size=batch_size, batch_delay=batch_delay)
+    await writer.start()
+
+    async def producer(sender_id: int):
+        pending = []
+        for i in range(messages):
+            pending.append(await writer.submit(sender_id, sender_id + 1, f"message {i}"))
+            await asyncio.sleep(0)
+        latencies = []
+        for future in pending:
+            await future
+            latencies.append(time.perf_counter() - began)
+        return latencies
+
+    began = time.perf_counter()
+    try:
+        return await asyncio.gather(*(producer(p) for p in range(producers))), writer.metrics()
+    finally:
+        await writer.stop()
+
+
+def report(name: str, elapsed: float, latencies, total: int, extra: str = ""):
+    p50, p99 = np.percentile(np.concatenate(latencies), [50, 99]) * 1000
+    print(f"{name:<12} {total / elapsed:>10.0f} msg/s   committed p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:////tmp/benchmark_message_writer.db")
+    parser.add_argument("--producers", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=50, help="Messages sent by each producer")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--batch-delay-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    session_factory = sessionmaker(bind=engine)
+    total = args.producers * args.messages
+    BenchBase.metadata.drop_all(engine)
+    BenchBase.metadata.create_all(engine)
+    try:
+        start = time.perf_counter()
+        latencies = asyncio.run(per_message(session_factory, args.producers, args.messages))
+        report("per-message", time.perf_counter() - start, latencies, total)
+
+        start = time.perf_counter()
+        latencies, metrics = asyncio.run(
+            batched(session_factory, args.producers, args.messages, args.batch_size, args.batch_delay_ms / 1000)
+        )
+        report("batched", time.perf_counter() - start, latencies, total,
+               f"({metrics['batches']} batches, avg {metrics['avg_batch_size']})")
+    finally:
+        BenchBase.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare recall and speed of the approximate (LSH) neighbor index against the exact path.
+
+Usage (from backend/):
+    python -m app.scripts.benchmark_neighbors
+    python -m app.scripts.benchmark_neighbors --sizes 10000 100000 --tables 4 8 16 --clusters 40
+"""
+import argparse
+import time
+import numpy as np
+from app.services.neighbor_index import ExactIndex, RandomProjectionIndex, normalize_rows, top_k_rows
+from app.models import QUESTION_COUNT
+
+
+def synthetic_answers(rng, size: int, clusters: int):
+    """Likert answers (1-7); with clusters > 0, users are noisy copies of a few archetypes."""
+    if clusters <= 0:
+        return rng.integers(1, 8, size=(size, QUESTION_COUNT)).astype(np.float32)
+    centers = rng.integers(1, 8, size=(clusters, QUESTION_COUNT))
+    noise = rng.integers(-1, 2, size=(size, QUESTION_COUNT))
+    return np.clip(centers[rng.integers(0, clusters, size)] + noise, 1, 7).astype(np.float32)
+
+
+def recall_at_k(approximate: np.ndarray, exact: np.ndarray) -> float:
+    """Fraction of the exact top-k neighbors that the approximate index also returned."""
+    hits = sum(len(np.intersect1d(a, e, assume_unique=True)) for a, e in zip(approximate, exact))
+    return hits / exact.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--tables", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--bucket-size", type=int, default=512)
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--clusters", type=int, default=0, help="Generate clustered answers around this many archetypes")
+    parser.add_argument("--sample", type=int, default=2000, help="Rows used to measure recall and estimate exact time")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'users':>8} {'index':>10} {'time (s)':>10} {'recall@k':>9}")
+    for size in args.sizes:
+        vectors = normalize_rows(synthetic_answers(rng, size, args.clusters))
+        sample = rng.choice(size, size=min(args.sample, size), replace=False)
+
+        # Exact neighbors for the sample; full exact time is extrapolated beyond the sample
+        start = time.perf_counter()
+        exact_neighbors, _ = top_k_rows(vectors, sample, args.top_k)
+        sample_time = time.perf_counter() - start
+        if size <= args.sample:
+            start = time.perf_counter()
+            ExactIndex(vectors).top_k(args.top_k)
+            print(f"{size:>8} {'exact':>10} {time.perf_counter() - start:>10.2f} {1.0:>9.3f}")
+        else:
+            print(f"{size:>8} {'exact*':>10} {sample_time * size / len(sample):>10.2f} {1.0:>9.3f}")
+
+        for tables in args.tables:
+            start = time.perf_counter()
+            neighbors, _ = RandomProjectionIndex(vectors, n_tables=tables, bucket_size=args.bucket_size).top_k(args.top_k)
+            elapsed = time.perf_counter() - start
+            label = f"lsh x{tables}"
+            print(f"{size:>8} {label:>10} {elapsed:>10.2f} {recall_at_k(neighbors[sample], exact_neighbors):>9.3f}")
+
+    print("* extrapolated from the recall sample")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Benchmark the response loaders against the old 25-column ORM path.
+
+Builds two throwaway tables with identical synthetic answers, one with a column
+per question and one with a packed byte vector, and loads every row into an
+answer matrix three ways: hydrated ORM rows (legacy), one fetchall of packed
+rows, and the chunked server-side-cursor loader. Each load runs in a fresh
+process so peak RSS includes driver-side buffers, not just the Python heap.
+
+Usage (from backend/):
+    python -m app.scripts.benchmark_response_loader
+    python -m app.scripts.benchmark_response_loader --rows 200000 --chunk-size 5000 --database-url postgresql://...
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import Column, Integer, LargeBinary, create_engine, insert, select
+from sqlalchemy.orm import Session, declarative_base
+from app.models import QUESTION_COUNT, Response
+from app.services.response_loader import NEUTRAL_RESPONSE, fill_missing, load_answer_matrix, unpack_answers
+
+BenchBase = declarative_base()
+
+
+class LegacyResponse(BenchBase):
+    __tablename__ = "bench_legacy_responses"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+
+
+for _i in range(1, QUESTION_COUNT + 1):
+    setattr(LegacyResponse, f"question{_i}", Column(Integer))
+
+
+class PackedResponse(BenchBase):
+    __tablename__ = "bench_packed_responses"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    answers = Column(LargeBinary, nullable=False)
+
+
+def seed(engine, rows: int, seed: int):
+    rng = np.random.default_rng(seed)
+    answers = rng.integers(1, 8, size=(rows, QUESTION_COUNT))
+    answers[rng.random(answers.shape) < 0.02] = 0  # A few unanswered questions
+
+    BenchBase.metadata.drop_all(engine)
+    BenchBase.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for start in range(0, rows, 10000):
+            chunk = answers[start:start + 10000]
+            conn.execute(insert(LegacyResponse), [
+                {"user_id": start + i + 1, **{f"question{q + 1}": (int(v) or None) for q, v in enumerate(row)}}
+                for i, row in enumerate(chunk)
+            ])
+            conn.execute(insert(PackedResponse), [
+                {"user_id": start + i + 1, "answers": Response.pack_answers(row.tolist())}
+                for i, row in enumerate(chunk)
+            ])
+
+
+def load_legacy(db: Session):
+    """The old path: hydrate ORM rows, build a dict per row, then a DataFrame."""
+    responses = db.query(LegacyResponse).all()
+    data = [
+        {"user_id": r.user_id, **{f"question{i}": getattr(r, f"question{i}") for i in range(1, QUESTION_COUNT + 1)}}
+        for r in responses
+    ]
+    df = pd.DataFrame(data)
+    df.fillna(NEUTRAL_RESPONSE, inplace=True)
+    return df["user_id"].to_numpy(), df.drop(columns=["user_id"]).to_numpy(dtype=np.float32)
+
+
+def load_fetchall(db: Session):
+    """Packed answers fetched in one go, then joined into a matrix."""
+    rows = db.execute(select(PackedResponse.user_id, PackedResponse.answers).order_by(PackedResponse.id)).all()
+    user_ids = np.fromiter((user_id for user_id, _ in rows), dtype=np.int64, count=len(rows))
+    return user_ids, fill_missing(unpack_answers((answers for _, answers in rows), len(rows)))
+
+
+def load_streamed(db: Session, chunk_size: int):
+    user_ids, answers = load_answer_matrix(
+        db, chunk_size, select(PackedResponse.user_id, PackedResponse.answers).order_by(PackedResponse.id)
+    )
+    return user_ids, fill_missing(answers)
+
+
+LOADERS = {"legacy": load_legacy, "fetchall": load_fetchall, "streamed": load_streamed}
+
+
+def _peak_rss_bytes(reset: bool = False) -> int:
+    """Peak resident set size of this process (Linux); optionally reset the peak first."""
+    if reset:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _run_loader(database_url: str, name: str, repeat: int, chunk_size: int):
+    """Child process: best time over `repeat` loads, peak RSS growth and a checksum of the result."""
+    engine = create_engine(database_url)
+    loader = LOADERS[name]
+    args = (chunk_size,) if name == "streamed" else ()
+    # Measure memory on the first load, before earlier runs leave freed pages behind
+    with Session(engine) as db:
+        db.execute(select(1))  # Connect before taking the baseline
+        baseline = _peak_rss_bytes(reset=True)
+        user_ids, answers = loader(db, *args)
+        peak = _peak_rss_bytes() - baseline
+    checksum = (int(user_ids.sum()), float(answers.astype(np.float64).sum()))
+    del user_ids, answers
+
+    best = float("inf")
+    for _ in range(repeat):
+        with Session(engine) as db:
+            start = time.perf_counter()
+            loader(db, *args)
+            best = min(best, time.perf_counter() - start)
+    return best, peak, checksum
+
+
+def measure(pool, database_url: str, name: str, repeat: int, chunk_size: int):
+    return pool.apply(_run_loader, (database_url, name, repeat, chunk_size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:////tmp/benchmark_response_loader.db")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    context = multiprocessing.get_context("spawn")
+    print(f"{'rows':>8} " + " ".join(f"{name + ' (s)':>14}" for name in LOADERS)
+          + " " + " ".join(f"{name + ' MiB':>14}" for name in LOADERS))
+    try:
+        for rows in args.rows:
+            seed(engine, rows, args.seed)
+            results = {}
+            for name in LOADERS:
+                # A fresh process per loader so one run's peak does not hide the next
+                with context.Pool(1) as pool:
+                    results[name] = measure(pool, args.database_url, name, args.repeat, args.chunk_size)
+            checksums = {checksum for _, _, checksum in results.values()}
+            assert len(checksums) == 1, f"Loaders disagree: {results}"
+            print(f"{rows:>8} " + " ".join(f"{results[name][0]:>14.3f}" for name in LOADERS)
+                  + " " + " ".join(f"{results[name][1] / 2**20:>14.1f}" for name in LOADERS))
+    finally:
+        BenchBase.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark the stable-roommates solver against greedy pairing and check both for blocking pairs.
+
+Preference lists are every user's top-K over synthetic answers, either by
+plain cosine similarity (what the matching engine uses) or by a cosine
+weighted with per-user question weights, which makes preferences asymmetric.
+Weighted preferences share no common score, so the greedy baseline pairs by
+combined rank. Large weighted instances usually have no stable matching at
+all; "dropped" counts the users stable_matching had to take out to find one. Blocking pairs are counted over everyone, dropped users included.
+"mean rank" is the average position of a user's partner in their own list
+(0 is their first choice).
+
+Usage (from backend/):
+    python -m app.scripts.benchmark_stable_matching
+    python -m app.scripts.benchmark_stable_matching --sizes 1000 10000 50000 --top-k 30
+"""
+import argparse
+import time
+import numpy as np
+from app.scripts.benchmark_neighbors import synthetic_answers
+from app.services.neighbor_index import normalize_rows, top_k_neighbors
+from app.services.stable_roommates import blocking_pairs, mirror_positions, stable_matching
+
+
+def weighted_top_k(answers: np.ndarray, weights: np.ndarray, k: int, chunk_size: int = 1024):
+    """Top-k of each user by cosine similarity under that user's own question weights."""
+    n = len(answers)
+    squared_weights = weights ** 2
+    neighbors = np.empty((n, k), dtype=np.int64)
+    for start in range(0, n, chunk_size):
+        rows = np.arange(start, min(start + chunk_size, n))
+        numerator = (squared_weights[rows] * answers[rows]) @ answers.T
+        norms = np.sqrt(squared_weights[rows] @ (answers ** 2).T) * np.linalg.norm(weights[rows] * answers[rows], axis=1)[:, None]
+        scores = numerator / norms
+        scores[np.arange(len(rows)), rows] = -np.inf
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+        neighbors[rows] = np.take_along_axis(candidates, order, axis=1)
+    return neighbors
+
+
+def greedy_partners(preferences: np.ndarray, mirror: np.ndarray) -> np.ndarray:
+    """Pair mutually acceptable users best combined rank first, as the greedy engine does with scores."""
+    rows, positions = np.nonzero(mirror >= 0)
+    order = np.argsort(positions + mirror[rows, positions], kind="stable")
+    partner = [-1] * len(preferences)
+    for i, j in zip(rows[order].tolist(), preferences[rows[order], positions[order]].tolist()):
+        if partner[i] < 0 and partner[j] < 0:
+            partner[i], partner[j] = j, i
+    return np.array(partner)
+
+
+def mean_rank(preferences: np.ndarray, partner: np.ndarray) -> float:
+    rows, positions = np.nonzero((preferences == partner[:, None]) & (partner[:, None] >= 0))
+    return float(positions.mean()) if len(positions) else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--clusters", type=int, default=20, help="Generate clustered answers around this many archetypes")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'users':>7} {'preferences':>12} {'solver':>7} {'time (s)':>9} {'dropped':>8} {'paired':>7} "
+          f"{'blocking pairs':>15} {'mean rank':>10}")
+    for size in args.sizes:
+        answers = synthetic_answers(rng, size, args.clusters)
+        tables = {
+            "cosine": top_k_neighbors(normalize_rows(answers), args.top_k)[0],
+            "weighted": weighted_top_k(answers, rng.uniform(0.2, 2.0, size=answers.shape).astype(np.float32), args.top_k),
+        }
+        for name, preferences in tables.items():
+            mirror = mirror_positions(preferences)
+
+            start = time.perf_counter()
+            partner, removed = stable_matching(preferences)
+            elapsed = time.perf_counter() - start
+            if partner is None:
+                print(f"{size:>7} {name:>12} {'irving':>7} {elapsed:>9.2f} {len(removed):>8}  (gave up; engine pairs greedily)")
+            else:
+                print(f"{size:>7} {name:>12} {'irving':>7} {elapsed:>9.2f} {len(removed):>8} {int((partner >= 0).sum()):>7} "
+                      f"{blocking_pairs(preferences, partner, mirror):>15} {mean_rank(preferences, partner):>10.2f}")
+
+            start = time.perf_counter()
+            partner = greedy_partners(preferences, mirror)
+            elapsed = time.perf_counter() - start
+            print(f"{size:>7} {name:>12} {'greedy':>7} {elapsed:>9.2f} {'-':>8} {int((partner >= 0).sum()):>7} "
+                  f"{blocking_pairs(preferences, partner, mirror):>15} {mean_rank(preferences, partner):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Round-trip a row through a throwaway table on an engine built by the app's engine factory.
+
+Usage (from backend/):
+    python -m app.scripts.check_engine
+    python -m app.scripts.check_engine --database-url postgresql://.../scratch
+"""
+import argparse
+from sqlalchemy import Column, Integer, String, select
+from sqlalchemy.orm import Session, declarative_base
+from app.database import create_db_engine
+
+# Its own Base, so the check table never joins the app's metadata (create_all, Alembic autogenerate)
+Base = declarative_base()
+
+
+class CheckTable(Base):
+    __tablename__ = "check_table"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite://",
+                        help="Scratch database to use (default: in-memory SQLite, never the app's tables)")
+    args = parser.parse_args()
+
+    engine = create_db_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    try:
+        with Session(engine) as session:
+            session.add(CheckTable(name="check"))
+            session.commit()
+            assert session.scalar(select(CheckTable.name)) == "check"
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+    print("Engine round-trip OK")
+
+
+if __name__ == "__main__":
+    main()
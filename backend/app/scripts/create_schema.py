@@ -0,0 +1,26 @@
+"""Create any missing database tables, as the API used to do when it was imported.
+
+Run it once per release before starting workers with CREATE_SCHEMA_ON_STARTUP=false,
+then apply migrations for changes to existing tables.
+
+Usage (from backend/):
+    python -m app.scripts.create_schema
+    alembic upgrade head
+"""
+import argparse
+from sqlalchemy import inspect
+from app.database import Base, create_schema, engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    existing = set(inspect(engine).get_table_names())
+    create_schema()
+    created = sorted(set(Base.metadata.tables) - existing)
+    print(f"Created {len(created)} table(s): {', '.join(created)}" if created else "All tables already exist")
+
+
+if __name__ == "__main__":
+    main()
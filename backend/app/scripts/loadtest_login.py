@@ -0,0 +1,98 @@
+"""Load-test /token with a burst of concurrent logins against a running server.
+
+While the burst runs, a probe keeps calling a cheap endpoint to show whether
+the rest of the API stays responsive.
+
+Usage (from backend/, with the API running):
+    python -m app.scripts.loadtest_login --base-url http://localhost:8000
+    python -m app.scripts.loadtest_login --concurrency 500 --users 50 --probe-path /prompts
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+import httpx
+import numpy as np
+
+PASSWORD = "Loadtest1!"
+
+
+def percentiles(latencies):
+    if not latencies:
+        return "-"
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return f"p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  p99 {p99:8.1f} ms  max {max(latencies) * 1000:8.1f} ms"
+
+
+async def ensure_users(client: httpx.AsyncClient, count: int):
+    emails = [f"loadtest{i}@mymail.pomona.edu" for i in range(count)]
+    for email in emails:
+        # 400 means the account already exists from an earlier run
+        await client.post("/register", data={"email": email, "password": PASSWORD, "school": "Pomona College"})
+    return emails
+
+
+async def login(client: httpx.AsyncClient, email: str, start: asyncio.Event):
+    await start.wait()
+    began = time.perf_counter()
+    try:
+        response = await client.post("/token", data={"username": email, "password": PASSWORD})
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    return status, time.perf_counter() - began
+
+
+async def probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, interval: float):
+    latencies = []
+    while not stop.is_set():
+        began = time.perf_counter()
+        try:
+            await client.get(path)
+        except httpx.HTTPError:
+            pass  # Counted by its latency all the same
+        latencies.append(time.perf_counter() - began)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 1, max_keepalive_connections=args.concurrency + 1)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+        emails = await ensure_users(client, args.users)
+
+        start, stop = asyncio.Event(), asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, args.probe_path, stop, args.probe_interval))
+        tasks = [asyncio.create_task(login(client, emails[i % len(emails)], start)) for i in range(args.concurrency)]
+        await asyncio.sleep(0.5)  # Let the probe settle before the burst
+
+        began = time.perf_counter()
+        start.set()
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - began
+        stop.set()
+        probe_latencies = await probe_task
+
+    statuses = Counter(status for status, _ in results)
+    ok = [latency for status, latency in results if status == 200]
+    print(f"{args.concurrency} concurrent logins in {elapsed:.2f}s, statuses {dict(statuses)}")
+    print(f"/token (200)       {percentiles(ok)}")
+    print(f"/token (all)       {percentiles([latency for _, latency in results])}")
+    print(f"{args.probe_path:<18} {percentiles(probe_latencies)}  ({len(probe_latencies)} probes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--users", type=int, default=50, help="Distinct accounts to log in as")
+    parser.add_argument("--probe-path", default="/prompts")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Load-test the profile, match and chat read routes against a running server.
+
+Run it once with the server in sync mode and once with DB_ASYNC_ENABLED=true
+to compare requests per second and tail latency. Keep the response cache out
+of the picture so every request reaches the database:
+
+    RESPONSE_CACHE_TTL_SECONDS=0 uvicorn app.main:app --port 8000
+    RESPONSE_CACHE_TTL_SECONDS=0 DB_ASYNC_ENABLED=true uvicorn app.main:app --port 8000
+
+Usage (from backend/, with the API running):
+    python -m app.scripts.loadtest_routes --base-url http://localhost:8000 --label sync
+    python -m app.scripts.loadtest_routes --concurrency 200 --duration 30 --label async
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+import httpx
+import numpy as np
+
+PASSWORD = "Loadtest1!"
+
+
+async def ensure_sessions(client: httpx.AsyncClient, count: int):
+    """Register (if needed) and log in ``count`` accounts; return [(user_id, auth headers)]."""
+    sessions = []
+    for i in range(count):
+        email = f"loadtest{i}@mymail.pomona.edu"
+        # 400 means the account already exists from an earlier run
+        await client.post("/register", data={"email": email, "password": PASSWORD, "school": "Pomona College"})
+        response = await client.post("/token", data={"username": email, "password": PASSWORD})
+        response.raise_for_status()
+        token = response.json()
+        sessions.append((token["user_id"], {"Authorization": f"Bearer {token['access_token']}"}))
+    return sessions
+
+
+async def seed_chat(client: httpx.AsyncClient, sessions, messages: int):
+    """Give consecutive accounts a short conversation so history pages are not empty."""
+    for (user_id, headers), (match_id, _) in zip(sessions, sessions[1:]):
+        for i in range(messages):
+            await client.post(f"/chat/messages/{user_id}/{match_id}", json={"content": f"load test {i}"}, headers=headers)
+
+
+def pick_request(sessions):
+    user_id, headers = random.choice(sessions)
+    other_id, _ = random.choice(sessions)
+    return random.choice([
+        ("/user-profile", "/user-profile", headers),
+        ("/user-profile/{id}", f"/user-profile/{other_id}", headers),
+        ("/match-results", "/match-results", headers),
+        ("/chat/messages", f"/chat/messages/{user_id}/{other_id}", headers),
+    ])
+
+
+async def worker(client: httpx.AsyncClient, sessions, deadline: float, results):
+    while time.perf_counter() < deadline:
+        name, path, headers = pick_request(sessions)
+        began = time.perf_counter()
+        try:
+            status = (await client.get(path, headers=headers)).status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        results[name].append((status, time.perf_counter() - began))
+
+
+def summary(label: str, samples, elapsed: float):
+    latencies = np.array([latency for _, latency in samples])
+    statuses = Counter(status for status, _ in samples)
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return (f"{label:<20} {len(samples) / elapsed:>8.1f} req/s   p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  "
+            f"max {latencies.max() * 1000:8.1f} ms  {dict(statuses)}")
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=httpx.Timeout(args.timeout)) as client:
+        sessions = await ensure_sessions(client, args.users)
+        await seed_chat(client, sessions, args.messages)
+
+        # Warm the server's principal cache and connection pool before measuring
+        await asyncio.gather(*(client.get("/user-profile", headers=headers) for _, headers in sessions))
+
+        results = defaultdict(list)
+        began = time.perf_counter()
+        deadline = began + args.duration
+        await asyncio.gather(*(worker(client, sessions, deadline, results) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - began
+
+    print(f"[{args.label}] {args.concurrency} concurrent clients for {elapsed:.1f}s")
+    for name in sorted(results):
+        print(summary(name, results[name], elapsed))
+    print(summary("all", [sample for samples in results.values() for sample in samples], elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to keep the load up")
+    parser.add_argument("--users", type=int, default=20, help="Distinct accounts to spread requests over")
+    parser.add_argument("--messages", type=int, default=20, help="Chat messages seeded per conversation")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--label", default="run")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models import RevokedToken, User
+
+# How long a cached principal is trusted, and how stale the revoked-token set may get
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "5"))
+REVOCATION_LOOKBACK = timedelta(minutes=1)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as seen by route handlers.
+
+    Only identity fields are cached; handlers that need the rest of the
+    profile, or want to change it, load the User row themselves.
+    """
+    id: int
+    email: str
+    is_admin: bool
+
+
+class PrincipalCache:
+    """Thread-safe LRU of email -> Principal whose entries expire after a TTL."""
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS, maxsize: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, email: str):
+        """Cached principal for an email, loading it from the DB on a miss. None if no such user."""
+        cached = self.peek(email)
+        if cached is not None:
+            return cached
+
+        now = time.monotonic()
+        row = db.execute(select(User.id, User.email, User.is_admin).where(User.email == email)).first()
+        if row is None:
+            return None
+        principal = Principal(id=row.id, email=row.email, is_admin=bool(row.is_admin))
+
+        with self._lock:
+            self._entries[email] = (principal, now + self.ttl)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return principal
+
+    def peek(self, email: str):
+        """Cached principal for an email without touching the DB; None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(email)
+                return entry[0]
+        return None
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RevokedTokenSet:
+    """In-memory copy of the revoked_tokens table, refreshed incrementally.
+
+    Rows are only ever appended, so each refresh fetches just the JTIs revoked
+    since the previous refresh, looking back REVOCATION_LOOKBACK extra to cover
+    transactions that committed late or clocks that disagree. Revocations made
+    by other processes take effect here within REVOCATION_REFRESH_SECONDS.
+    An expired token is rejected by its signature check anyway, so each JTI is
+    kept only until its token's expiry and pruned on the next refresh.
+    """
+
+    def __init__(self, refresh_interval: float = REVOCATION_REFRESH_SECONDS):
+        self.refresh_interval = refresh_interval
+        self._jtis = {}  # jti -> token expiry (None for rows revoked before expiries were stored)
+        self._since = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _refresh(self, db: Session):
+        started = datetime.utcnow()
+        query = select(RevokedToken.jti, RevokedToken.expires_at).where(
+            RevokedToken.expires_at.is_(None) | (RevokedToken.expires_at > started)
+        )
+        if self._since is not None:
+            query = query.where(RevokedToken.revoked_at >= self._since - REVOCATION_LOOKBACK)
+        self._jtis.update(db.execute(query).all())
+        for jti, expires_at in list(self._jtis.items()):
+            if expires_at is not None and expires_at <= started:
+                self._jtis.pop(jti, None)
+        self._since = started
+        self._checked_at = time.monotonic()
+
+    def contains(self, db: Session, jti: str) -> bool:
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.refresh_interval:
+            # Whoever gets the lock refreshes; other requests use the current set meanwhile
+            first_load = self._checked_at is None
+            if self._lock.acquire(blocking=first_load):
+                try:
+                    if self._checked_at is None or now - self._checked_at >= self.refresh_interval:
+                        self._refresh(db)
+                finally:
+                    self._lock.release()
+        return jti in self._jtis
+
+    def cached_contains(self, jti):
+        """Answer from the in-memory set if it is fresh enough; None when a refresh is due."""
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.refresh_interval:
+            return None
+        return jti is not None and jti in self._jtis
+
+    def add(self, jti: str, expires_at: datetime = None):
+        """Record a revocation made by this process without waiting for the next refresh."""
+        self._jtis[jti] = expires_at
+
+    def __len__(self):
+        return len(self._jtis)
+
+
+principal_cache = PrincipalCache()
+revoked_tokens = RevokedTokenSet()
@@ -0,0 +1,34 @@
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models import Message
+
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+
+def conversation_page(db: Session, user_id: int, match_id: int, before: Optional[int] = None,
+                      after: Optional[int] = None, limit: int = MESSAGE_PAGE_SIZE):
+    """One page of a conversation in chronological order, plus whether more messages lie beyond it.
+
+    Without a cursor the page holds the newest messages. ``before`` pages
+    towards older messages and ``after`` towards newer ones. Each page is a
+    single range scan of the (conversation_key, id) index, so its cost does
+    not depend on how long the thread is.
+    """
+    query = select(Message.id, Message.sender_id, Message.content, Message.timestamp).where(
+        Message.conversation_key == Message.conversation_key_for(user_id, match_id)
+    )
+    if after is not None:
+        query = query.where(Message.id > after).order_by(Message.id)
+    else:
+        if before is not None:
+            query = query.where(Message.id < before)
+        query = query.order_by(Message.id.desc())
+
+    rows = db.execute(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after is None:
+        rows.reverse()
+    return rows, has_more
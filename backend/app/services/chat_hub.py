@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Dict, Set
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+CHAT_SEND_QUEUE_SIZE = int(os.getenv("CHAT_SEND_QUEUE_SIZE", "64"))  # Messages buffered per socket before it counts as slow
+CHAT_BROKER = os.getenv("CHAT_BROKER", "memory")  # memory | unix
+CHAT_BROKER_DIR = os.getenv("CHAT_BROKER_DIR", "/tmp/roommatch-chat")
+
+SLOW_CONSUMER_CLOSE_CODE = 1013  # "Try again later": the client should reconnect and refetch history
+# Largest envelope UnixDatagramBroker sends or receives; chat messages are length-limited so they fit well within it
+MAX_DATAGRAM_SIZE = 65536
+
+
+class Connection:
+    """One WebSocket with its own bounded outgoing queue, drained by a sender task."""
+
+    def __init__(self, user_id: int, websocket: WebSocket, queue_size: int = CHAT_SEND_QUEUE_SIZE):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self._sender = None
+
+    def start(self):
+        self._sender = asyncio.create_task(self._drain())
+
+    def offer(self, message: dict) -> bool:
+        """Queue a message without waiting; False if this socket has fallen behind."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _drain(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                await self.websocket.send_json(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            pass  # The receive loop notices the disconnect and unregisters the socket
+
+    def cancel(self):
+        """Stop sending; messages still queued are discarded."""
+        if self._sender is not None:
+            self._sender.cancel()
+
+    async def close(self, code: int = 1000):
+        self.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class MemoryBroker:
+    """Delivers published messages within this process only."""
+
+    def __init__(self):
+        self._deliver = None
+
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    async def publish(self, user_id: int, message: dict, exclude: str = None):
+        self._deliver(user_id, message, exclude)
+
+    async def stop(self):
+        self._deliver = None
+
+
+class UnixDatagramBroker(MemoryBroker):
+    """Fans messages out to every worker on this host through unix datagram sockets.
+
+    Each process binds its own socket in ``directory`` and publishing sends one
+    datagram to every other socket found there. It stands in for a real
+    broker (e.g. Redis pub/sub) when several uvicorn workers share a machine.
+    """
+
+    def __init__(self, directory: str = CHAT_BROKER_DIR):
+        super().__init__()
+        self.directory = directory
+        self.path = None
+        self._socket = None
+
+    async def start(self, deliver):
+        await super().start(deliver)
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock")
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._socket.bind(self.path)
+        asyncio.get_running_loop().add_reader(self._socket.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        while True:
+            try:
+                data = self._socket.recv(MAX_DATAGRAM_SIZE)
+            except BlockingIOError:
+                return
+            try:
+                envelope = json.loads(data)
+                self._deliver(envelope["user_id"], envelope["message"], envelope.get("exclude"))
+            except (ValueError, KeyError):
+                logger.warning("Ignoring malformed chat datagram")
+
+    def _peers(self):
+        with os.scandir(self.directory) as entries:
+            return [entry.path for entry in entries if entry.name.endswith(".sock") and entry.path != self.path]
+
+    async def publish(self, user_id: int, message: dict, exclude: str = None):
+        self._deliver(user_id, message, exclude)
+        data = json.dumps({"user_id": user_id, "message": message, "exclude": exclude}, default=str).encode()
+        if len(data) > MAX_DATAGRAM_SIZE:
+            # A bigger datagram would arrive truncated (or not at all), so other workers don't get it
+            logger.warning("Chat message of %d bytes is too large for other workers; delivered locally only", len(data))
+            return
+        for peer in self._peers():
+            try:
+                self._socket.sendto(data, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a worker that exited without cleaning up
+                try:
+                    os.unlink(peer)
+                except FileNotFoundError:
+                    pass
+            except (BlockingIOError, OSError) as e:
+                logger.warning("Dropped chat message for worker %s: %s", peer, e)
+
+    async def stop(self):
+        if self._socket is not None:
+            asyncio.get_running_loop().remove_reader(self._socket.fileno())
+            self._socket.close()
+            self._socket = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        await super().stop()
+
+
+BROKERS = {"memory": MemoryBroker, "unix": UnixDatagramBroker}
+
+
+class ConnectionManager:
+    """Tracks every open chat socket per user and routes messages to them.
+
+    Messages always go through the broker, so a message published by one
+    worker reaches the recipient's sockets on whichever worker holds them.
+    Local delivery never waits on a socket: each one has a bounded queue and
+    a socket whose queue is full is disconnected as a slow consumer.
+    """
+
+    def __init__(self, broker=None, queue_size: int = CHAT_SEND_QUEUE_SIZE):
+        self.broker = broker or MemoryBroker()
+        self.queue_size = queue_size
+        self.connections: Dict[int, Set[Connection]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.slow_disconnects = 0
+        self._closing = set()  # Keeps slow-consumer close tasks referenced until they finish
+
+    async def start(self):
+        await self.broker.start(self._deliver_local)
+
+    async def stop(self):
+        for connections in list(self.connections.values()):
+            for connection in list(connections):
+                await connection.close(code=1001)
+        self.connections.clear()
+        await self.broker.stop()
+
+    async def connect(self, user_id: int, websocket: WebSocket) -> Connection:
+        await websocket.accept()
+        connection = Connection(user_id, websocket, self.queue_size)
+        self.connections.setdefault(user_id, set()).add(connection)
+        connection.start()
+        return connection
+
+    def disconnect(self, connection: Connection):
+        connections = self.connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.connections[connection.user_id]
+        connection.cancel()
+
+    async def send_to_user(self, user_id: int, message: dict, exclude: Connection = None):
+        """Deliver a message to every socket of a user, on any worker."""
+        self.published += 1
+        await self.broker.publish(user_id, message, exclude.id if exclude else None)
+
+    def _deliver_local(self, user_id: int, message: dict, exclude: str = None):
+        for connection in list(self.connections.get(user_id, ())):
+            if connection.id == exclude:
+                continue
+            if connection.offer(message):
+                self.delivered += 1
+                continue
+            logger.info("Disconnecting slow chat consumer for user %d", user_id)
+            self.slow_disconnects += 1
+            self.disconnect(connection)
+            task = asyncio.create_task(connection.close(code=SLOW_CONSUMER_CLOSE_CODE))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    def metrics(self) -> dict:
+        return {
+            "broker": type(self.broker).__name__,
+            "users": len(self.connections),
+            "connections": sum(len(connections) for connections in self.connections.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "slow_disconnects": self.slow_disconnects,
+        }
+
+
+hub = ConnectionManager(BROKERS[CHAT_BROKER]())
@@ -1,56 +1,160 @@
+import logging
+import math
+import os
+import time
 import numpy as np
-import pandas as pd
 from sqlalchemy.orm import Session
-from sklearn.cluster import KMeans
-from sklearn.metrics.pairwise import cosine_similarity
-from app.models import Response
-
-def generate_preference_lists(cluster_users):
-    """Create ranked preference lists using cosine similarity."""
-    similarities = cosine_similarity(cluster_users)
-    user_ids = cluster_users.index.tolist()
-
-    # Rank users by similarity
-    preference_lists = {
-        user_ids[i]: [user_ids[j] for j in np.argsort(similarities[i])[::-1] if i != j]
-        for i in range(len(user_ids))
-    }
-    
-    return preference_lists
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from app.services.dealbreakers import dealbreakers, select_rows
+from app.services.neighbor_index import normalize_rows, score_matrices, top_k_neighbors
+from app.services.preprocessing import feature_pipelines
+from app.services.response_loader import load_answer_matrix, responses_fingerprint
 
-def cluster_users(db: Session, num_clusters=3):
-    """Clusters users and generates preference lists."""
-    if not isinstance(db, Session):
-        raise ValueError("Invalid database session passed to cluster_users.")
+logger = logging.getLogger(__name__)
+
+# Upper bound on users per cluster; a cluster's dense float32 similarity matrix takes 4 * size^2 bytes (64 MB at 4000)
+CLUSTER_MAX_SIZE = int(os.getenv("CLUSTER_MAX_SIZE", "4000"))
+CLUSTER_PREFERENCE_TOP_K = int(os.getenv("CLUSTER_PREFERENCE_TOP_K", "50"))
+# Cohorts at least this large are fit with MiniBatchKMeans, which updates centers from small batches
+MINI_BATCH_MIN_USERS = int(os.getenv("CLUSTER_MINI_BATCH_MIN_USERS", "10000"))
+MINI_BATCH_SIZE = 4096
+RANDOM_STATE = 42
+
+
+def choose_k(n_users: int, max_cluster_size: int = CLUSTER_MAX_SIZE, num_clusters: int = None) -> int:
+    """Fewest clusters that can keep every cluster under the size cap, or num_clusters if that is more."""
+    k = max(math.ceil(n_users / max_cluster_size), num_clusters or 1)
+    return max(1, min(k, n_users))
+
+
+def _kmeans(n_users: int, k: int):
+    if n_users >= MINI_BATCH_MIN_USERS:
+        return MiniBatchKMeans(n_clusters=k, batch_size=MINI_BATCH_SIZE, n_init=3, random_state=RANDOM_STATE)
+    return KMeans(n_clusters=k, n_init="auto", random_state=RANDOM_STATE)
+
+
+def fit_labels(vectors: np.ndarray, max_cluster_size: int = CLUSTER_MAX_SIZE, num_clusters: int = None) -> np.ndarray:
+    """Cluster label of every row, with no cluster larger than max_cluster_size.
+
+    k-means does not balance cluster sizes, so clusters that come out over
+    the cap are split again with their own k until they fit.
+    """
+    n = len(vectors)
+    k = choose_k(n, max_cluster_size, num_clusters)
+    labels = _kmeans(n, k).fit_predict(vectors) if k > 1 else np.zeros(n, dtype=np.int64)
+
+    next_label = labels.max() + 1
+    pending = list(np.unique(labels))
+    while pending:
+        members = np.flatnonzero(labels == pending.pop())
+        if len(members) <= max_cluster_size:
+            continue
+        k = choose_k(len(members), max_cluster_size)
+        sub_labels = _kmeans(len(members), k).fit_predict(vectors[members])
+        if len(np.unique(sub_labels)) == 1:
+            # Identical answers can't be separated, so cut the cluster into even chunks instead
+            sub_labels = np.arange(len(members)) * k // len(members)
+        new_labels = np.unique(sub_labels)
+        labels[members] = next_label + np.searchsorted(new_labels, sub_labels)
+        pending.extend(range(next_label, next_label + len(new_labels)))
+        next_label += len(new_labels)
+
+    return np.unique(labels, return_inverse=True)[1]
+
+
+class Clustering:
+    """Cluster assignment of a cohort and every cluster's top-K preference lists.
 
-    responses = db.query(Response).all()
-    if not responses:
-        return None  
+    ``members[c]`` holds the row indices of cluster ``c``; ``neighbors[c]``
+    and ``scores[c]`` hold each member's most similar fellow members (as
+    positions in ``members[c]``), best first; lists short of allowed
+    members are padded with -inf scores.
+    """
 
-    # Convert responses into a DataFrame
-    response_data = [
-        {
-            "user_id": r.user_id,
-            **{f"question{i}": getattr(r, f"question{i}") for i in range(1, 26)}
+    def __init__(self, user_ids: np.ndarray, labels: np.ndarray, members: list, neighbors: list, scores: list,
+                 fit_seconds: float, preference_seconds: float):
+        self.user_ids = user_ids
+        self.labels = labels
+        self.members = members
+        self.neighbors = neighbors
+        self.scores = scores
+        self.fit_seconds = fit_seconds
+        self.preference_seconds = preference_seconds
+
+    @property
+    def sizes(self) -> np.ndarray:
+        return np.array([len(members) for members in self.members], dtype=np.int64)
+
+    def preference_lists(self, cluster: int) -> dict:
+        """{user_id: [user_id, ...]} of one cluster, most similar first."""
+        ids = self.user_ids[self.members[cluster]]
+        return {
+            int(user_id): ids[row[np.isfinite(scores)]].tolist()
+            for user_id, row, scores in zip(ids, self.neighbors[cluster], self.scores[cluster])
+        }
+
+    def report(self) -> dict:
+        sizes = self.sizes
+        return {
+            "users": int(sizes.sum()),
+            "clusters": len(sizes),
+            "min_size": int(sizes.min()),
+            "median_size": float(np.median(sizes)),
+            "max_size": int(sizes.max()),
+            "fit_seconds": round(self.fit_seconds, 3),
+            "preference_seconds": round(self.preference_seconds, 3),
         }
-        for r in responses
-    ]
 
-    df = pd.DataFrame(response_data).set_index("user_id")
-    df.fillna(4, inplace=True)  # Fill missing values with a neutral response
 
-    # Apply k-Means Clustering
-    kmeans = KMeans(n_clusters=num_clusters, random_state=42, n_init=10)
-    df["cluster"] = kmeans.fit_predict(df)
+def cluster_vectors(user_ids: np.ndarray, vectors: np.ndarray, max_cluster_size: int = CLUSTER_MAX_SIZE,
+                    top_k: int = CLUSTER_PREFERENCE_TOP_K, num_clusters: int = None, constraints=None) -> Clustering:
+    """Cluster L2-normalized answer vectors and rank each user's top-K within their cluster.
+
+    Clustering the normalized vectors groups users by the same cosine
+    similarity the preference lists are ranked by. Dealbreakers
+    (``constraints``) only shape the lists, not the clusters.
+    """
+    start = time.perf_counter()
+    labels = fit_labels(vectors, max_cluster_size, num_clusters)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    members = [np.flatnonzero(labels == cluster) for cluster in range(labels.max() + 1)]
+    lists = []
+    for rows in members:
+        queries, keys = score_matrices(vectors[rows], select_rows(constraints, rows))
+        lists.append(top_k_neighbors(queries, top_k, keys=keys))
+    neighbors, scores = zip(*lists)
+    preference_seconds = time.perf_counter() - start
+
+    return Clustering(user_ids, labels, members, list(neighbors), list(scores), fit_seconds, preference_seconds)
 
-    # Store cluster assignments
-    clusters = {user_id: cluster for user_id, cluster in zip(df.index, df["cluster"])}
 
-    # Generate preference lists for each cluster
-    preferences_by_cluster = {}
-    for cluster in range(num_clusters):
-        cluster_users = df[df["cluster"] == cluster].drop(columns=["cluster"])
-        if len(cluster_users) >= 2:
-            preferences_by_cluster[cluster] = generate_preference_lists(cluster_users)
+def cluster_users(db: Session, num_clusters=None, top_k: int = CLUSTER_PREFERENCE_TOP_K):
+    """Clusters users and generates top-K preference lists within each cluster.
+
+    Returns ``(clusters, preferences_by_cluster)``: each user's cluster, and
+    for every cluster with at least two users a ``{user_id: [user_id, ...]}``
+    dict ranked by similarity. k is chosen from CLUSTER_MAX_SIZE unless
+    ``num_clusters`` asks for more.
+    """
+    if not isinstance(db, Session):
+        raise ValueError("Invalid database session passed to cluster_users.")
+
+    user_ids, answers = load_answer_matrix(db)
+    if len(user_ids) == 0:
+        return None
+
+    pipeline = feature_pipelines.get(responses_fingerprint(db), answers)
+    clustering = cluster_vectors(user_ids, normalize_rows(pipeline.transform(answers)), top_k=top_k,
+                                 num_clusters=num_clusters, constraints=dealbreakers.features(answers))
+    logger.info("Clustered users: %s", clustering.report())
+
+    clusters = {int(user_id): int(cluster) for user_id, cluster in zip(user_ids, clustering.labels)}
+    preferences_by_cluster = {
+        cluster: clustering.preference_lists(cluster)
+        for cluster, size in enumerate(clustering.sizes)
+        if size >= 2
+    }
 
-    return clusters, preferences_by_cluster
\ No newline at end of file
+    return clusters, preferences_by_cluster
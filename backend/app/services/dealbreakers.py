@@ -0,0 +1,78 @@
+import os
+import re
+import numpy as np
+from app.models import MAX_ANSWER, MISSING_ANSWER, QUESTION_COUNT
+
+# Hard constraints as comma-separated "questionN<=D": answers to question N may differ by at most D,
+# e.g. "question3<=1,question8<=2". Pairs that break one are never candidates.
+MATCH_DEALBREAKERS = os.getenv("MATCH_DEALBREAKERS", "")
+DEALBREAKER_PENALTY = 1e4  # Subtracted from a pair's score for every dealbreaker it breaks
+
+
+class Dealbreakers:
+    """Hard constraints on answer differences, evaluated inside the similarity matrix product.
+
+    Each constraint becomes two one-hot blocks over the possible answers: a
+    query block marking the user's own answer (scaled by -DEALBREAKER_PENALTY)
+    and a key block marking the answers that would break the constraint with
+    it. ``query_i @ key_j`` is then -DEALBREAKER_PENALTY per constraint ``i``
+    and ``j`` break, so appending the blocks to the feature vectors pushes every
+    excluded pair far below any cosine score in the same product that scores
+    everyone else, and leaves allowed pairs' scores exactly as they were.
+    Unanswered questions break nothing.
+    """
+
+    def __init__(self, questions: np.ndarray, max_differences: np.ndarray):
+        self.questions = questions
+        self.max_differences = max_differences
+        values = np.arange(MAX_ANSWER + 1)
+        # breaks[c, v, w]: answers v and w break constraint c
+        breaks = np.abs(values[:, None] - values[None, :]) > max_differences[:, None, None]
+        breaks[:, MISSING_ANSWER, :] = breaks[:, :, MISSING_ANSWER] = False
+        self._breaks = breaks.astype(np.float32)
+
+    @classmethod
+    def parse(cls, spec: str):
+        questions, max_differences = [], []
+        for rule in filter(None, (rule.strip() for rule in (spec or "").split(","))):
+            match = re.fullmatch(r"question(\d+)\s*<=\s*(\d+)", rule)
+            if match is None or not 1 <= int(match[1]) <= QUESTION_COUNT:
+                raise ValueError(f"Dealbreakers look like question3<=1 (questions 1-{QUESTION_COUNT}), got {rule!r}")
+            questions.append(int(match[1]) - 1)
+            max_differences.append(int(match[2]))
+        return cls(np.array(questions, dtype=np.intp), np.array(max_differences, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.questions)
+
+    def _values(self, answers: np.ndarray) -> np.ndarray:
+        return np.clip(answers[:, self.questions], MISSING_ANSWER, MAX_ANSWER).astype(np.intp)
+
+    def features(self, answers: np.ndarray):
+        """(query, key) blocks of packed answers, one row per user, or None without dealbreakers."""
+        if not len(self):
+            return None
+        values = self._values(answers)
+        queries = np.zeros((len(answers), len(self), MAX_ANSWER + 1), dtype=np.float32)
+        np.put_along_axis(queries, values[:, :, None], -DEALBREAKER_PENALTY, axis=2)
+        keys = self._breaks[np.arange(len(self)), values]
+        return queries.reshape(len(answers), -1), keys.reshape(len(answers), -1)
+
+    def allowed(self, answers_a: np.ndarray, answers_b: np.ndarray) -> np.ndarray:
+        """Boolean (len(a), len(b)) matrix of pairs that keep every dealbreaker, checked directly."""
+        values_a, values_b = self._values(answers_a), self._values(answers_b)
+        allowed = np.ones((len(answers_a), len(answers_b)), dtype=bool)
+        for c in range(len(self)):
+            allowed &= self._breaks[c][values_a[:, c][:, None], values_b[:, c][None, :]] == 0
+        return allowed
+
+
+def select_rows(constraints, rows):
+    """Query and key blocks of a subset of users; None (no dealbreakers) stays None."""
+    if constraints is None:
+        return None
+    queries, keys = constraints
+    return queries[rows], keys[rows]
+
+
+dealbreakers = Dealbreakers.parse(MATCH_DEALBREAKERS)
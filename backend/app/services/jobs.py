@@ -0,0 +1,322 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import ACTIVE_JOB_STATUSES, MATCH_STRATEGIES, MAX_ROUNDS, MatchingJob
+
+logger = logging.getLogger(__name__)
+
+MATCHING_WORKERS = int(os.getenv("MATCHING_WORKERS", "1"))
+JOB_STALE_SECONDS = int(os.getenv("MATCHING_JOB_STALE_SECONDS", "300"))  # No heartbeat for this long means the worker died
+JOB_HEARTBEAT_SECONDS = JOB_STALE_SECONDS / 5  # How often a running job refreshes its heartbeat, even mid-round
+MAX_JOB_ATTEMPTS = 3
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class JobAlreadyActive(Exception):
+    """Raised when another matching job is already queued or running; callers should answer 409."""
+
+
+def _get_executor(reset: bool = False) -> ProcessPoolExecutor:
+    """Lazily create the worker pool; a pool broken by a dead worker is replaced."""
+    global _executor
+    with _executor_lock:
+        if reset and _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        if _executor is None:
+            # Spawn so workers never inherit the server's open DB connections or threads
+            _executor = ProcessPoolExecutor(max_workers=MATCHING_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _fail_exhausted_jobs(db: Session, *criteria):
+    """Fail stale running jobs that already used MAX_JOB_ATTEMPTS, so a job that keeps killing its worker stops."""
+    now = datetime.utcnow()
+    db.execute(
+        update(MatchingJob)
+        .where(
+            MatchingJob.status == "running",
+            MatchingJob.heartbeat_at < now - timedelta(seconds=JOB_STALE_SECONDS),
+            MatchingJob.attempts >= MAX_JOB_ATTEMPTS,
+            *criteria,
+        )
+        .values(status="failed", error="Worker process died", finished_at=now)
+    )
+    db.commit()
+
+
+def _claim_job(db: Session, job_id: int) -> bool:
+    """Atomically mark a job as running so only one worker executes it, up to MAX_JOB_ATTEMPTS times."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=JOB_STALE_SECONDS)
+    result = db.execute(
+        update(MatchingJob)
+        .where(
+            MatchingJob.id == job_id,
+            MatchingJob.attempts < MAX_JOB_ATTEMPTS,
+            or_(
+                MatchingJob.status == "queued",
+                (MatchingJob.status == "running") & (MatchingJob.heartbeat_at < stale),
+            ),
+        )
+        .values(status="running", heartbeat_at=now, attempts=MatchingJob.attempts + 1)
+    )
+    db.commit()
+    if result.rowcount == 1:
+        return True
+    _fail_exhausted_jobs(db, MatchingJob.id == job_id)
+    return False
+
+
+class _Heartbeat(threading.Thread):
+    """Refresh a running job's heartbeat on a timer, so a long round doesn't look like a dead worker."""
+
+    def __init__(self, job_id: int, interval: float = JOB_HEARTBEAT_SECONDS):
+        super().__init__(name=f"job-{job_id}-heartbeat", daemon=True)
+        self.job_id = job_id
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            db = SessionLocal()
+            try:
+                db.execute(
+                    update(MatchingJob)
+                    .where(MatchingJob.id == self.job_id, MatchingJob.status == "running")
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                db.commit()
+            except Exception:
+                logger.exception("Could not refresh the heartbeat of matching job %d", self.job_id)
+            finally:
+                db.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def run_matching_job(job_id: int):
+    """Worker entry point: run the remaining rounds of a job, committing after each one.
+
+    Each round's Match rows and the job's progress are committed together, so a
+    job picked up again after a crash continues from its last committed round.
+    """
+    # Imported here so numpy and the matching engine load in the worker process, not the API server
+    from app.services.match_engine import load_existing_matches, plan_rounds, write_matches
+    from app.services.similarity import similarity_store
+
+    db = SessionLocal()
+    heartbeat = None
+    try:
+        if not _claim_job(db, job_id):
+            return
+        heartbeat = _Heartbeat(job_id)
+        heartbeat.start()
+
+        job = db.query(MatchingJob).filter(MatchingJob.id == job_id).first()
+        job.started_at = job.started_at or datetime.utcnow()
+        db.commit()
+
+        snapshot = similarity_store.snapshot(db)
+        remaining_rounds = job.max_rounds - job.rounds_completed
+        if snapshot is not None and remaining_rounds > 0:
+            existing_pairs, match_counts = load_existing_matches(db)
+            for round_pairs in plan_rounds(snapshot, existing_pairs, match_counts, remaining_rounds, job.strategy):
+                write_matches(db, round_pairs)
+                job.rounds_completed += 1
+                job.pairs_written += len(round_pairs)
+                job.heartbeat_at = datetime.utcnow()
+                db.commit()
+                logger.info("Job %d round %d: Matched %d pairs", job_id, job.rounds_completed, len(round_pairs))
+
+        job.status = "completed"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.exception("Matching job %d failed", job_id)
+        db.execute(
+            update(MatchingJob)
+            .where(MatchingJob.id == job_id)
+            .values(status="failed", error=str(e), finished_at=datetime.utcnow())
+        )
+        db.commit()
+    finally:
+        if heartbeat is not None:
+            heartbeat.stop()
+        db.close()
+
+
+def _on_job_done(job_id: int, future):
+    """Requeue a job whose worker process died, up to MAX_JOB_ATTEMPTS."""
+    if future.cancelled() or not isinstance(future.exception(), BrokenProcessPool):
+        return
+
+    db = SessionLocal()
+    try:
+        job = db.query(MatchingJob).filter(MatchingJob.id == job_id).first()
+        if job is None or job.status not in ("queued", "running"):
+            return
+        if job.status == "queued" or job.attempts >= MAX_JOB_ATTEMPTS:
+            # A job that was never claimed means the worker could not even start
+            job.status = "failed"
+            job.error = "Worker process died"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            return
+        rounds_completed = job.rounds_completed
+        job.status = "queued"
+        db.commit()
+    finally:
+        db.close()
+
+    logger.warning("Matching job %d lost its worker, resuming after round %d", job_id, rounds_completed)
+    _dispatch(job_id, reset=True)
+
+
+def _dispatch(job_id: int, reset: bool = False):
+    try:
+        future = _get_executor(reset).submit(run_matching_job, job_id)
+    except BrokenProcessPool:
+        future = _get_executor(reset=True).submit(run_matching_job, job_id)
+    future.add_done_callback(lambda f: _on_job_done(job_id, f))
+
+
+def active_job(db: Session):
+    """The job that is currently queued or running, if any."""
+    return db.query(MatchingJob).filter(MatchingJob.status.in_(ACTIVE_JOB_STATUSES)).first()
+
+
+def submit_matching_job(db: Session, strategy: str = "greedy", max_rounds: int = MAX_ROUNDS) -> MatchingJob:
+    """Record a new matching job and hand it to the worker pool.
+
+    The unique index on active jobs makes the insert itself the check, so two
+    concurrent submissions can't both start a job.
+    """
+    if strategy not in MATCH_STRATEGIES:
+        raise ValueError(f"Unknown matching strategy: {strategy}")
+    if max_rounds < 1:
+        raise ValueError("max_rounds must be at least 1")
+
+    # A job whose worker died still holds the active-job index; resume or fail it before checking for one
+    _resume_stale_jobs(db)
+    job = MatchingJob(status="queued", strategy=strategy, max_rounds=max_rounds)
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        running_job = active_job(db)
+        if running_job is None:
+            raise JobAlreadyActive("Another matching job is already active")
+        raise JobAlreadyActive(f"Matching job {running_job.id} is already {running_job.status}")
+    db.refresh(job)
+    _dispatch(job.id)
+    return job
+
+
+def _resume_stale_jobs(db: Session, all_queued: bool = False):
+    """Fail stale jobs out of attempts and re-dispatch the other stale ones.
+
+    A job is stale when its worker stopped heartbeating, or when it has been
+    queued for JOB_STALE_SECONDS without a worker claiming it. ``all_queued``
+    resumes every queued job, for startup, when none can be in this process's pool.
+    """
+    _fail_exhausted_jobs(db)
+    stale = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    queued = MatchingJob.status == "queued"
+    if not all_queued:
+        queued &= MatchingJob.created_at < stale
+    jobs = db.query(MatchingJob.id).filter(
+        or_(queued, (MatchingJob.status == "running") & (MatchingJob.heartbeat_at < stale))
+    ).all()
+    db.rollback()
+
+    for (job_id,) in jobs:
+        logger.info("Resuming matching job %d", job_id)
+        _dispatch(job_id)
+
+
+def resume_stale_jobs(all_queued: bool = True):
+    """Re-dispatch jobs left unfinished by a previous server or a dead worker process."""
+    db = SessionLocal()
+    try:
+        _resume_stale_jobs(db, all_queued)
+    finally:
+        db.close()
+
+
+class _StaleJobSweeper(threading.Thread):
+    """Resume stale jobs on a timer, so a worker that dies while the server keeps running can't stall matching."""
+
+    def __init__(self, interval: float = JOB_HEARTBEAT_SECONDS):
+        super().__init__(name="matching-job-sweeper", daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                resume_stale_jobs(all_queued=False)
+            except Exception:
+                logger.exception("Could not resume stale matching jobs")
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+_sweeper = None
+
+
+def start_job_sweeper():
+    global _sweeper
+    with _executor_lock:
+        if _sweeper is None:
+            _sweeper = _StaleJobSweeper()
+            _sweeper.start()
+
+
+def stop_job_sweeper():
+    global _sweeper
+    with _executor_lock:
+        sweeper, _sweeper = _sweeper, None
+    if sweeper is not None:
+        sweeper.stop()
+
+
+def job_status(job: MatchingJob) -> dict:
+    """Progress report for the job-status endpoint."""
+    end = job.finished_at or datetime.utcnow()
+    elapsed = (end - job.started_at).total_seconds() if job.started_at else 0.0
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "strategy": job.strategy,
+        "rounds_completed": job.rounds_completed,
+        "max_rounds": job.max_rounds,
+        "pairs_written": job.pairs_written,
+        "attempts": job.attempts,
+        "elapsed_seconds": round(elapsed, 3),
+        "error": job.error,
+    }
@@ -1,85 +1,47 @@
-import numpy as np
-import pandas as pd
+import sys
 from sqlalchemy.orm import Session
-from sklearn.metrics.pairwise import cosine_similarity
-from scipy.optimize import linear_sum_assignment
-from app.models import Response, User
+from app.models import User
 
-def get_best_matches(user_id: int, db: Session, top_n=5):
-    """Find the top N best reciprocal roommate matches for a user using bipartite matching."""
-
-    # Fetch all responses from the database
-    responses = db.query(Response).all()
-    if not responses:
-        return None  # No responses in DB
-
-    # Convert responses into a DataFrame
-    response_data = [
-        {
-            "user_id": r.user_id,
-            **{f"question{i}": getattr(r, f"question{i}") for i in range(1, 26)}
-        }
-        for r in responses
-    ]
-    
-    df = pd.DataFrame(response_data).set_index("user_id")
-    df = df.groupby("user_id").last()  # Ensure we get the latest responses
-
-
-    # Fill missing values with 4 (neutral response)
-    df.fillna(4, inplace=True)
+# The similarity store (and numpy with it) is imported on the first match lookup rather than at startup,
+# so API workers that never serve one stay light.
+SIMILARITY_MODULE = "app.services.similarity"
 
 
-    # Compute cosine similarity between all users
-    similarity_matrix = cosine_similarity(df.values)
+def response_changed(db: Session, user_id: int):
+    """Patch the similarity store after a user's response was written or deleted.
 
-    # Set diagonal (self-matching) to a low value to prevent self-matching
-    np.fill_diagonal(similarity_matrix, -np.inf)
+    A process that has not loaded the store has no snapshot to patch; it reads
+    the current responses when the store is first used.
+    """
+    store = getattr(sys.modules.get(SIMILARITY_MODULE), "similarity_store", None)
+    if store is not None:
+        store.update_user(db, user_id)
 
-    # Convert to a cost matrix for Hungarian algorithm (we minimize cost, so we negate similarity)
-    cost_matrix = -similarity_matrix
 
-    # Solve the bipartite matching problem (optimal one-to-one pairing)
-    row_ind, col_ind = linear_sum_assignment(cost_matrix)
-
-    # Create match pairs (ensure no self-matching)
-    matches_dict = {}
-    for row, col in zip(row_ind, col_ind):
-        if df.index[row] != df.index[col]:  # Prevent self-matching
-            matches_dict[df.index[row]] = df.index[col]
-
-    # Ensure reciprocal matching for top-N
-    reciprocal_matches = {user: [] for user in df.index}
-
-    for user in df.index:
-        user_idx = df.index.get_loc(user)
-        similarity_scores = similarity_matrix[user_idx]
-
-        # Get the top N highest similarity scores (excluding self)
-        sorted_indices = np.argsort(similarity_scores)[::-1]  # Sort in descending order
+def get_best_matches(user_id: int, db: Session, top_n=5):
+    """Find the top N best reciprocal roommate matches for a user.
 
-        for idx in sorted_indices:
-            match_id = df.index[idx]
-            if match_id != user and len(reciprocal_matches[user]) < top_n:
-                # Ensure that the match is also listing this user in their top-N
-                match_idx = df.index.get_loc(match_id)
-                match_scores = similarity_matrix[match_idx]
-                match_sorted_indices = np.argsort(match_scores)[::-1]
+    Looks the user up in the shared similarity store instead of recomputing
+    the full similarity matrix on every call.
+    """
+    from app.services.similarity import similarity_store
 
-                if user in df.index[match_sorted_indices[:top_n]]:  # Check if user is in match's top-N
-                    reciprocal_matches[user].append((match_id, similarity_scores[idx]))
+    snapshot = similarity_store.snapshot(db)
+    if snapshot is None:
+        return None  # No responses in DB
 
-    # Get the best reciprocal matches for the given user
-    if user_id not in reciprocal_matches or not reciprocal_matches[user_id]:
+    # Candidates ranked by similarity who also list this user in their top-N
+    reciprocal_matches = snapshot.reciprocal_matches(user_id, top_n)
+    if not reciprocal_matches:
         return None  # No matches
 
-    best_matches = []
-    for match_id, score in reciprocal_matches[user_id]:
-        matched_user = db.query(User).filter(User.id == int(match_id)).first()
-        if matched_user:
-            best_matches.append({
-                "match": matched_user.email,
-                "score": float(score)
-            })
+    emails = dict(
+        db.query(User.id, User.email).filter(User.id.in_([match_id for match_id, _ in reciprocal_matches]))
+    )
+    best_matches = [
+        {"match": emails[match_id], "score": float(score)}
+        for match_id, score in reciprocal_matches
+        if match_id in emails
+    ]
 
-    return best_matches if best_matches else None
\ No newline at end of file
+    return best_matches if best_matches else None
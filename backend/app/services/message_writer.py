@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError, InterfaceError, OperationalError
+from app.database import SessionLocal
+from app.models import Message
+
+logger = logging.getLogger(__name__)
+
+# A batch is flushed once it holds MESSAGE_BATCH_SIZE messages or its oldest message has waited MESSAGE_BATCH_DELAY_MS
+MESSAGE_BATCH_SIZE = int(os.getenv("MESSAGE_BATCH_SIZE", "200"))
+MESSAGE_BATCH_DELAY_MS = float(os.getenv("MESSAGE_BATCH_DELAY_MS", "20"))
+MESSAGE_QUEUE_SIZE = int(os.getenv("MESSAGE_QUEUE_SIZE", "10000"))  # Producers wait once this many messages are pending
+# A batch that fails because the database is unreachable is retried whole, this many times, waiting longer each time
+MESSAGE_WRITE_RETRIES = int(os.getenv("MESSAGE_WRITE_RETRIES", "5"))
+MESSAGE_RETRY_DELAY_MS = float(os.getenv("MESSAGE_RETRY_DELAY_MS", "200"))  # Doubles after every failed attempt
+
+ROW_ERRORS = (IntegrityError, DataError)  # Caused by a row's own content; the rest of its batch can still be stored
+
+
+class MessageWriter:
+    """Write-behind pipeline that persists chat messages in small batches.
+
+    Producers enqueue a message and get a future that resolves to the stored
+    row's (id, timestamp) once its batch is committed, so they can acknowledge
+    a message only when it is durable. One background task drains the queue and
+    bulk-inserts each batch on a dedicated thread; while a batch commits, the
+    next one accumulates. If a batch fails on a row's content, it is split
+    until the messages that fail on their own are found, and only their
+    senders get the error. If it fails because the database is unreachable,
+    the whole batch is retried with backoff instead.
+    """
+
+    def __init__(self, session_factory=SessionLocal, table=Message.__table__,
+                 batch_size: int = MESSAGE_BATCH_SIZE, batch_delay: float = MESSAGE_BATCH_DELAY_MS / 1000,
+                 queue_size: int = MESSAGE_QUEUE_SIZE, retries: int = MESSAGE_WRITE_RETRIES,
+                 retry_delay: float = MESSAGE_RETRY_DELAY_MS / 1000):
+        self.session_factory = session_factory
+        self.table = table
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.queue_size = queue_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._queue = None
+        self._batch_full = None
+        self._task = None
+        self._executor = None
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._batch_full = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="message-writer")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything already queued, then stop."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        self._batch_full.set()
+        await self._task
+        self._task = None
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, sender_id: int, receiver_id: int, content: str) -> asyncio.Future:
+        """Queue a message; the returned future resolves to (id, timestamp) once it is committed."""
+        future = asyncio.get_running_loop().create_future()
+        row = {
+            "sender_id": sender_id,
+            "receiver_id": receiver_id,
+            "conversation_key": Message.conversation_key_for(sender_id, receiver_id),
+            "content": content,
+        }
+        await self._queue.put((row, future))
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_full.set()
+        return future
+
+    async def write(self, sender_id: int, receiver_id: int, content: str):
+        """Queue a message and wait until it is durable."""
+        return await (await self.submit(sender_id, receiver_id, content))
+
+    def _drain_into(self, batch: list) -> bool:
+        """Move queued messages into the batch without waiting; True if the stop sentinel was reached."""
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return False
+            if item is None:
+                return True
+            batch.append(item)
+        return False
+
+    async def _next_batch(self):
+        """Block for the first message, then gather more until the batch is full or its delay has passed."""
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        stopping = self._drain_into(batch)
+        if not stopping and len(batch) < self.batch_size:
+            self._batch_full.clear()
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), self.batch_delay)
+            except asyncio.TimeoutError:
+                pass
+            stopping = self._drain_into(batch)
+        return batch, stopping
+
+    def _insert(self, rows):
+        db = self.session_factory()
+        try:
+            result = db.execute(
+                insert(self.table).returning(self.table.c.id, self.table.c.timestamp, sort_by_parameter_order=True),
+                rows,
+            )
+            stored = result.all()
+            db.commit()
+            return stored
+        finally:
+            db.close()
+
+    def _store(self, rows):
+        """Insert rows, bisecting a batch that hit a row error so only the rows that fail on their own get it.
+
+        Returns one (id, timestamp) or exception per row, in order. Any other
+        error (a lost connection, an outage) is raised for the whole batch.
+        """
+        try:
+            return self._insert(rows)
+        except ROW_ERRORS as e:
+            if len(rows) == 1:
+                return [e]
+            middle = len(rows) // 2
+            return self._store(rows[:middle]) + self._store(rows[middle:])
+
+    async def _store_batch(self, loop, rows):
+        """Store a batch on the writer thread, retrying it whole while the database is unreachable."""
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                return await loop.run_in_executor(self._executor, self._store, rows)
+            except DBAPIError as e:
+                transient = isinstance(e, (OperationalError, InterfaceError)) or e.connection_invalidated
+                if not transient or attempt == self.retries:
+                    return [e] * len(rows)
+                self.retried += 1
+                logger.warning("Storing %d chat messages failed (%s); retrying in %.2fs", len(rows), e, delay)
+                await asyncio.sleep(delay)
+                delay *= 2
+            except Exception as e:
+                return [e] * len(rows)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if not batch:
+                continue
+            stored = await self._store_batch(loop, [row for row, _ in batch])
+
+            self.batches += 1
+            for (_, future), result in zip(batch, stored):
+                if isinstance(result, Exception):
+                    logger.error("Failed to store a chat message: %s", result)
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(result)
+                    continue
+                self.written += 1
+                if not future.done():
+                    future.set_result(tuple(result))
+
+    def metrics(self) -> dict:
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "written": self.written,
+            "failed": self.failed,
+            "retried_batches": self.retried,
+            "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+message_writer = MessageWriter()
@@ -0,0 +1,242 @@
+import os
+import numpy as np
+
+# "exact" scans every pair in row blocks; "lsh" only compares users that share a random-projection bucket
+SIMILARITY_INDEX = os.getenv("SIMILARITY_INDEX", "exact")
+SIMILARITY_CHUNK_SIZE = 2048
+LSH_TABLES = int(os.getenv("SIMILARITY_LSH_TABLES", "8"))
+LSH_BUCKET_SIZE = int(os.getenv("SIMILARITY_LSH_BUCKET_SIZE", "512"))
+# Cosine scores are at least -1; candidates scored below this were excluded by a dealbreaker penalty
+EXCLUDED_SCORE = -2.0
+# Larger than float32 rounding in a block product; candidates this close to a row's cut are rescored exactly
+SCORE_TOLERANCE = 1e-5
+TIE_MARGIN = 16  # Extra candidates per row kept for ties at the cut
+PAIR_BATCH_SIZE = 65536
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so a dot product equals cosine similarity."""
+    vectors = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0  # Zero vectors stay zero, like sklearn's cosine_similarity
+    return vectors / norms
+
+
+def score_matrices(vectors: np.ndarray, constraints=None):
+    """(queries, keys) whose products are candidate scores.
+
+    Without ``constraints`` both are the vectors themselves (cosine
+    similarity); otherwise the query and key blocks from
+    ``Dealbreakers.features`` are appended so excluded pairs score below
+    EXCLUDED_SCORE in the same matrix product.
+    """
+    if constraints is None:
+        return vectors, vectors
+    queries, keys = constraints
+    return np.hstack([vectors, queries]), np.hstack([vectors, keys])
+
+
+def pair_scores(queries: np.ndarray, keys: np.ndarray, rows: np.ndarray, cols: np.ndarray,
+                batch_size: int = PAIR_BATCH_SIZE) -> np.ndarray:
+    """Scores of the pairs ``(queries[rows[i]], keys[cols[i]])``, summed in float64 and rounded once to float32.
+
+    float32 matrix products sum in an order that depends on the shape of the
+    batch, so the same pair can come out a few ulps apart in a block and on
+    its own. Rounded this way, exact ties stay ties wherever they're computed.
+    """
+    scores = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), batch_size):
+        batch_rows, batch_cols = rows[start:start + batch_size], cols[start:start + batch_size]
+        scores[start:start + len(batch_rows)] = np.einsum(
+            "ij,ij->i", queries[batch_rows].astype(np.float64), keys[batch_cols].astype(np.float64)
+        )
+    return scores
+
+
+def _candidate_keys(block: np.ndarray, rows: np.ndarray, cols: np.ndarray, ids, exact):
+    """(scores, tie keys) of candidate entries; rows and cols are same-shaped arrays of positions in the block."""
+    scores = np.take_along_axis(block, cols, axis=1) if cols.ndim == 2 else block[rows, cols]
+    if exact is not None:
+        rescored = exact(rows.ravel(), cols.ravel()).reshape(cols.shape)
+        scores = np.where(np.isneginf(scores), scores, rescored)
+    if ids is None:
+        return scores, cols
+    return scores, ids[cols] if ids.ndim == 1 else ids[rows, cols]
+
+
+def rank_rows(scores: np.ndarray, tie_keys: np.ndarray) -> np.ndarray:
+    """Order of each row by score, highest first, then by lowest tie key."""
+    order = np.argsort(-scores, axis=1, kind="stable")
+    ranked = np.take_along_axis(scores, order, axis=1)
+    tied = np.flatnonzero((ranked[:, 1:] == ranked[:, :-1]).any(axis=1))
+    if len(tied):
+        # Two stable sorts, key then score; much faster than a 2-D lexsort
+        by_key = np.argsort(tie_keys[tied], axis=1, kind="stable")
+        by_score = np.argsort(-np.take_along_axis(scores[tied], by_key, axis=1), axis=1, kind="stable")
+        order[tied] = np.take_along_axis(by_key, by_score, axis=1)
+    return order
+
+
+def _top_k_of_block(block: np.ndarray, k: int, ids: np.ndarray = None, exact=None):
+    """Sorted top-k (indices, scores) of each row of a block of similarity scores.
+
+    Equal scores go to the lowest of ``ids`` (one per column, or one per
+    entry), defaulting to the column index. Integer answers tie often, so this
+    keeps the lists independent of the order users were added in. With
+    ``exact(rows, cols)``, the kept scores come from it, and every column
+    within SCORE_TOLERANCE of a row's k-th score is rescored before ranking,
+    so rounding in the block can't reorder ties either.
+    """
+    # A few spare candidates per row cover the columns that tie with the k-th, in the same partition
+    width = min(k + TIE_MARGIN, block.shape[1])
+    candidates = np.argpartition(-block, width - 1, axis=1)[:, :width]
+    rows = np.broadcast_to(np.arange(len(block))[:, None], candidates.shape)
+    scores, tie_keys = _candidate_keys(block, rows, candidates, ids, exact)
+    order = rank_rows(scores, tie_keys)[:, :k]
+    neighbors, scores = np.take_along_axis(candidates, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+    # Rows whose spare candidates are all still within reach of the k-th may have more ties; rank all of them
+    floor = block[rows[:, :1], neighbors[:, -1:]] - (SCORE_TOLERANCE if exact is not None else 0.0)
+    wide = np.flatnonzero(block[rows[:, 0], candidates[:, -1]] >= floor[:, 0]) if width < block.shape[1] else []
+    if len(wide):
+        wide_rows, cols = np.nonzero(block[wide] >= floor[wide])
+        rows = wide[wide_rows]
+        wide_scores, tie_keys = _candidate_keys(block, rows, cols, ids, exact)
+        order = np.lexsort((tie_keys, -wide_scores, wide_rows))
+        keep = order[np.arange(len(order)) - np.searchsorted(wide_rows[order], wide_rows[order]) < k]
+        neighbors[wide], scores[wide] = cols[keep].reshape(-1, k), wide_scores[keep].reshape(-1, k)
+
+    scores[scores < EXCLUDED_SCORE] = -np.inf  # Rows with too few allowed candidates end in -inf
+    return neighbors, scores
+
+
+def top_k_rows(vectors: np.ndarray, rows: np.ndarray, k: int, chunk_size: int = SIMILARITY_CHUNK_SIZE,
+               keys: np.ndarray = None, ids: np.ndarray = None, rescore: bool = True):
+    """Top-k neighbor lists for a subset of rows of a normalized matrix.
+
+    With ``keys``, ``vectors`` and ``keys`` are the two sides of
+    score_matrices and excluded pairs come back as -inf. Ties go to the
+    lowest of ``ids`` (one per row, e.g. user ids). Without ``rescore`` the
+    block's float32 scores are kept as they are, for callers that rescore
+    their final candidates themselves.
+    """
+    keys = vectors if keys is None else keys
+    neighbors = np.empty((len(rows), k), dtype=np.int64)
+    scores = np.empty((len(rows), k), dtype=np.float32)
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        block = vectors[chunk] @ keys.T
+        block[np.arange(len(chunk)), chunk] = -np.inf  # Never match with self
+
+        def exact(block_rows, cols, chunk=chunk):
+            return pair_scores(vectors, keys, chunk[block_rows], cols)
+
+        neighbors[start:start + len(chunk)], scores[start:start + len(chunk)] = _top_k_of_block(
+            block, k, ids, exact if rescore else None
+        )
+    return neighbors, scores
+
+
+def top_k_neighbors(vectors: np.ndarray, k: int, chunk_size: int = SIMILARITY_CHUNK_SIZE, keys: np.ndarray = None,
+                    ids: np.ndarray = None):
+    """Return the k most similar rows for every row of a normalized matrix.
+
+    Works through the matrix in row blocks so memory stays O(chunk_size * N)
+    instead of materializing the full N x N similarity matrix.
+    """
+    n = len(vectors)
+    k = max(0, min(k, n - 1))
+    if k == 0:
+        return np.empty((n, 0), dtype=np.int64), np.empty((n, 0), dtype=np.float32)
+    return top_k_rows(vectors, np.arange(n), k, chunk_size, keys, ids)
+
+
+class ExactIndex:
+    """Brute-force top-K over all pairs: O(N^2) time, O(chunk * N) memory."""
+
+    def __init__(self, vectors: np.ndarray, constraints=None, ids: np.ndarray = None):
+        self.vectors = vectors
+        self.ids = ids
+        self.queries, self.keys = score_matrices(vectors, constraints)
+
+    def top_k(self, k: int):
+        return top_k_neighbors(self.queries, k, keys=self.keys, ids=self.ids)
+
+
+class RandomProjectionIndex:
+    """Random-hyperplane LSH for cosine similarity, in pure NumPy.
+
+    Each of ``n_tables`` hash tables buckets users by the signs of their
+    (mean-centered) vectors against random hyperplanes. Exact scores are only
+    computed inside buckets, and the candidates from all tables are merged into
+    one top-K list per user. Users left with fewer than K candidates fall back
+    to an exact scan. Buckets come from the vectors alone; dealbreakers
+    (``constraints``) only apply when candidates are scored.
+    """
+
+    def __init__(self, vectors: np.ndarray, n_tables: int = LSH_TABLES,
+                 bucket_size: int = LSH_BUCKET_SIZE, seed: int = 0, constraints=None, ids: np.ndarray = None):
+        self.vectors = vectors
+        self.queries, self.keys = score_matrices(vectors, constraints)
+        n, dims = vectors.shape
+        self.ids = np.arange(n) if ids is None else ids
+        bits = int(np.clip(np.round(np.log2(max(n / bucket_size, 1))), 1, 30))
+        planes = np.random.default_rng(seed).standard_normal((n_tables, dims, bits)).astype(np.float32)
+        weights = 1 << np.arange(bits)
+        centered = vectors - vectors.mean(axis=0)  # Answers are all positive, so center to balance the buckets
+        self.codes = np.stack([((centered @ table) > 0) @ weights for table in planes])
+
+    def top_k(self, k: int):
+        n = len(self.vectors)
+        k = max(0, min(k, n - 1))
+        if k == 0:
+            return np.empty((n, 0), dtype=np.int64), np.empty((n, 0), dtype=np.float32)
+
+        n_tables = len(self.codes)
+        candidates = np.full((n, n_tables * k), -1, dtype=np.int64)
+        candidate_scores = np.full((n, n_tables * k), -np.inf, dtype=np.float32)
+        for table, codes in enumerate(self.codes):
+            order = np.argsort(codes, kind="stable")
+            for members in np.split(order, np.flatnonzero(np.diff(codes[order])) + 1):
+                if len(members) < 2:
+                    continue
+                bucket_k = min(k, len(members) - 1)
+                columns = slice(table * k, table * k + bucket_k)
+                local, local_scores = top_k_rows(self.queries[members], np.arange(len(members)), bucket_k,
+                                                 keys=self.keys[members], ids=self.ids[members], rescore=False)
+                candidates[members, columns] = members[local]
+                candidate_scores[members, columns] = local_scores
+
+        # The same neighbor can come from several tables; keep one copy of each
+        order = np.argsort(candidates, axis=1, kind="stable")
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        duplicate = np.zeros_like(candidates, dtype=bool)
+        duplicate[:, 1:] = candidates[:, 1:] == candidates[:, :-1]
+        candidate_scores[duplicate | (candidates < 0)] = -np.inf
+
+        def exact(rows, cols):
+            return pair_scores(self.queries, self.keys, rows, candidates[rows, cols])
+
+        best, scores = _top_k_of_block(candidate_scores, k, self.ids[candidates], exact)
+        neighbors = np.take_along_axis(candidates, best, axis=1)
+
+        short = np.flatnonzero(np.isneginf(scores[:, -1]))
+        if len(short):
+            neighbors[short], scores[short] = top_k_rows(self.queries, short, k, keys=self.keys, ids=self.ids)
+        return neighbors, scores
+
+
+INDEX_TYPES = {"exact": ExactIndex, "lsh": RandomProjectionIndex}
+
+
+def build_index(vectors: np.ndarray, mode: str = None, constraints=None, ids: np.ndarray = None):
+    """Build the candidate-retrieval index selected by SIMILARITY_INDEX (or ``mode``).
+
+    ``constraints`` are the dealbreaker blocks of the same rows, if any, and
+    ``ids`` the keys that break score ties (row positions by default).
+    """
+    mode = mode or SIMILARITY_INDEX
+    if mode not in INDEX_TYPES:
+        raise ValueError(f"Unknown similarity index: {mode}")
+    return INDEX_TYPES[mode](vectors, constraints=constraints, ids=ids)
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+# bcrypt releases the GIL while hashing, so a thread per core gives real parallelism
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "1024"))  # Hashes queued or running before new ones are refused
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer 503."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated, bounded thread pool instead of the request threadpool.
+
+    Hashing requests past ``max_pending`` are refused straight away, so a login
+    burst queues in one place with a known bound instead of tying up the
+    threads every other endpoint needs.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._max_queued = 0
+        self._started = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def _reserve(self):
+        with self._lock:
+            if self._queued + self._running >= self.max_pending:
+                self._rejected += 1
+                raise PasswordHasherBusy("Too many password hashes pending")
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+
+    def _run(self, func, args, submitted_at: float):
+        started = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._started += 1
+            self._wait_seconds += started - submitted_at
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._run_seconds += time.perf_counter() - started
+
+    def _release(self):
+        """Give back a reserved slot whose hash will never run."""
+        with self._lock:
+            self._queued -= 1
+
+    def _submit(self, func, *args):
+        self._reserve()
+        try:
+            future = self._executor.submit(self._run, func, args, time.perf_counter())
+        except BaseException:  # e.g. RuntimeError once the pool is shut down
+            self._release()
+            raise
+        # A future cancelled while queued never reaches _run, so its slot is given back here
+        future.add_done_callback(lambda f: f.cancelled() and self._release())
+        return future
+
+    async def _call(self, func, *args):
+        return await asyncio.wrap_future(self._submit(func, *args))
+
+    async def hash(self, password: str) -> str:
+        return await self._call(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._call(pwd_context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str):
+        """(valid, new_hash); new_hash is set when the stored hash uses outdated settings such as fewer rounds."""
+        return await self._call(pwd_context.verify_and_update, password, hashed_password)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            started, completed = self._started, self._completed
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queued": self._queued,
+                "running": self._running,
+                "max_queued": self._max_queued,
+                "completed": completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(1000 * self._wait_seconds / started, 2) if started else 0.0,
+                "avg_run_ms": round(1000 * self._run_seconds / completed, 2) if completed else 0.0,
+            }
+
+
+password_hasher = PasswordHasher()
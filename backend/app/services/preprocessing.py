@@ -1,19 +1,225 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 import numpy as np
-import pandas as pd
-from sklearn.preprocessing import StandardScaler
+from app.models import MISSING_ANSWER, QUESTION_COUNT
+from app.services.response_loader import NEUTRAL_RESPONSE
 
-def preprocess_responses(df: pd.DataFrame):
-    """Preprocess roommate questionnaire responses by normalizing data."""
-    
-    question_columns = [f"question{i}" for i in range(1, 26)]
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
-    # Ensure all missing values are filled with 4
-    df[question_columns] = df[question_columns].fillna(4).astype(float)
+# Fitted pipelines are written here, one pair of files per version, and shared by every worker on the host
+FEATURE_PIPELINE_DIR = os.getenv("FEATURE_PIPELINE_DIR", "artifacts/feature_pipelines")
+FEATURE_PIPELINE_KEEP = int(os.getenv("FEATURE_PIPELINE_KEEP", "20"))  # Older versions on disk are deleted; at least 1
+# "none" keeps raw answers with neutral imputation (plain cosine, as before); "standard" imputes the cohort mean
+# and scales answers to z-scores, which changes every similarity score
+FEATURE_SCALING = os.getenv("FEATURE_SCALING", "none")
+QUESTION_WEIGHTS = os.getenv("QUESTION_WEIGHTS")  # Optional comma-separated weight per question
+PIPELINE_FORMAT = 1  # Bump when the parameter layout or transform changes, so old files are refitted
 
+# Rows of the parameter array
+FILL, CENTER, SCALE, WEIGHTS = range(4)
 
-    # Normalize responses using StandardScaler
-    scaler = StandardScaler()
-    df_scaled = scaler.fit_transform(df[question_columns])
 
+def parse_weights(spec) -> np.ndarray:
+    if not spec:
+        return np.ones(QUESTION_COUNT, dtype=np.float32)
+    weights = np.array([float(weight) for weight in spec.split(",")], dtype=np.float32)
+    if weights.shape != (QUESTION_COUNT,) or (weights < 0).any():
+        raise ValueError(f"QUESTION_WEIGHTS needs {QUESTION_COUNT} non-negative comma-separated numbers")
+    return weights
 
-    return pd.DataFrame(df_scaled, columns=question_columns, index=df.index)  # Keep it as a DataFrame
\ No newline at end of file
+
+class FeaturePipeline:
+    """Fitted imputation, scaling and question weights that turn packed answers into feature vectors.
+
+    ``params`` is a (4, QUESTION_COUNT) float32 array (FILL, CENTER, SCALE
+    and WEIGHTS rows); loaded pipelines keep it memory-mapped. The version
+    identifies the cohort snapshot and settings it was fitted for, so every
+    worker that sees the same responses transforms with the same parameters.
+    """
+
+    def __init__(self, params: np.ndarray, version: str, metadata: dict):
+        self.params = params
+        self.version = version
+        self.metadata = metadata
+        self._multiplier = params[WEIGHTS] / params[SCALE]
+
+    def transform(self, answers: np.ndarray) -> np.ndarray:
+        """Float32 features of packed answers (one row per user, MISSING_ANSWER where unanswered)."""
+        features = np.where(answers == MISSING_ANSWER, self.params[FILL], answers).astype(np.float32)
+        features -= self.params[CENTER]
+        features *= self._multiplier
+        return features
+
+
+def fit_params(answers: np.ndarray, scaling: str = FEATURE_SCALING, weights: np.ndarray = None) -> np.ndarray:
+    """Fit the parameter array on a cohort's packed answers; only answered questions count toward the statistics."""
+    params = np.zeros((4, QUESTION_COUNT), dtype=np.float32)
+    params[SCALE] = 1.0
+    params[WEIGHTS] = weights if weights is not None else parse_weights(QUESTION_WEIGHTS)
+    if scaling == "none":
+        params[FILL] = NEUTRAL_RESPONSE
+        return params
+    if scaling != "standard":
+        raise ValueError(f"Unknown FEATURE_SCALING: {scaling}")
+
+    answered = answers != MISSING_ANSWER
+    counts = answered.sum(axis=0)
+    sums = np.where(answered, answers, 0).sum(axis=0, dtype=np.float64)
+    means = np.divide(sums, counts, out=np.full(QUESTION_COUNT, float(NEUTRAL_RESPONSE)), where=counts > 0)
+
+    # Imputed answers sit at the mean, so the variance of the filled matrix only comes from real answers
+    squares = np.where(answered, (answers - means) ** 2, 0).sum(axis=0)
+    stds = np.sqrt(squares / max(len(answers), 1))
+    params[FILL] = means
+    params[CENTER] = means
+    params[SCALE] = np.where(stds > 0, stds, 1.0)
+    return params
+
+
+def pipeline_version(fingerprint, scaling: str = FEATURE_SCALING, weights_spec=QUESTION_WEIGHTS) -> str:
+    """Version of the pipeline for a responses-table fingerprint and the current settings.
+
+    Unscaled parameters don't depend on the cohort, so with scaling "none"
+    one version serves every snapshot.
+    """
+    cohort = None if scaling == "none" else [str(value) for value in fingerprint]
+    key = json.dumps([PIPELINE_FORMAT, scaling, weights_spec, cohort])
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _paths(directory: str, version: str):
+    return os.path.join(directory, f"{version}.npy"), os.path.join(directory, f"{version}.json")
+
+
+def _lock_path(directory: str, version: str):
+    return os.path.join(directory, f"{version}.lock")
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Hold an exclusive lock on ``path`` shared by every process on the host: flock, or msvcrt on Windows."""
+    with open(path, "a+b") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        else:
+            lock.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after about 10 seconds; keep waiting like flock does
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def save_pipeline(pipeline: FeaturePipeline, directory: str = FEATURE_PIPELINE_DIR):
+    """Write the parameters and metadata atomically, then drop the oldest versions beyond FEATURE_PIPELINE_KEEP."""
+    os.makedirs(directory, exist_ok=True)
+    params_path, metadata_path = _paths(directory, pipeline.version)
+    for path, write in ((params_path, lambda f: np.save(f, np.asarray(pipeline.params))),
+                        (metadata_path, lambda f: f.write(json.dumps(pipeline.metadata).encode()))):
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(temp_path, path)
+
+    versions = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".npy")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    keep = max(FEATURE_PIPELINE_KEEP, 1)  # The version just written always stays
+    for entry in versions[:max(len(versions) - keep, 0)]:
+        version = entry.name[:-len(".npy")]
+        for path in (*_paths(directory, version), _lock_path(directory, version)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except PermissionError:
+                pass  # Windows can't delete a lock file another process holds open; a later save retries
+
+
+def load_pipeline(version: str, directory: str = FEATURE_PIPELINE_DIR):
+    """Memory-map a saved pipeline, or None if this version hasn't been fitted (or is from another format)."""
+    params_path, metadata_path = _paths(directory, version)
+    try:
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        params = np.load(params_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if metadata.get("format") != PIPELINE_FORMAT or params.shape != (4, QUESTION_COUNT):
+        return None
+    return FeaturePipeline(params, version, metadata)
+
+
+class PipelineCache:
+    """Per-process cache of fitted pipelines in front of the on-disk store.
+
+    A pipeline is fitted at most once per cohort snapshot across all
+    workers: the first one to need it takes a file lock for that version and
+    fits and saves it, while the others wait on the lock and then load it.
+    """
+
+    def __init__(self, directory: str = FEATURE_PIPELINE_DIR, maxsize: int = 4):
+        self.directory = directory
+        self.maxsize = maxsize
+        self._pipelines = OrderedDict()
+        self._lock = threading.Lock()
+        self.fits = 0
+        self.loads = 0
+
+    def get(self, fingerprint, answers: np.ndarray) -> FeaturePipeline:
+        """The pipeline for this snapshot of the responses table; ``answers`` are only read if it must be fitted."""
+        version = pipeline_version(fingerprint)
+        with self._lock:
+            pipeline = self._pipelines.get(version)
+            if pipeline is None:
+                pipeline = load_pipeline(version, self.directory)
+                if pipeline is not None:
+                    self.loads += 1
+                else:
+                    pipeline = self._load_or_fit(version, fingerprint, answers)
+                self._pipelines[version] = pipeline
+                while len(self._pipelines) > self.maxsize:
+                    self._pipelines.popitem(last=False)
+            self._pipelines.move_to_end(version)
+            return pipeline
+
+    def _load_or_fit(self, version: str, fingerprint, answers: np.ndarray) -> FeaturePipeline:
+        os.makedirs(self.directory, exist_ok=True)
+        with _file_lock(_lock_path(self.directory, version)):
+            pipeline = load_pipeline(version, self.directory)  # Another worker may have fitted it meanwhile
+            if pipeline is not None:
+                self.loads += 1
+                return pipeline
+            metadata = {"format": PIPELINE_FORMAT, "scaling": FEATURE_SCALING, "users": len(answers),
+                        "fingerprint": [str(value) for value in fingerprint], "fitted_at": time.time()}
+            pipeline = FeaturePipeline(fit_params(answers), version, metadata)
+            save_pipeline(pipeline, self.directory)
+            self.fits += 1
+            return pipeline
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {"cached": len(self._pipelines), "fits": self.fits, "loads": self.loads}
+
+
+feature_pipelines = PipelineCache()
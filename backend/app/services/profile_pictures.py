@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+
+UPLOAD_DIR = "static/profile_pics"
+# Uploads and thumbnails are written here until they're validated; it must not be served and must share a
+# filesystem with UPLOAD_DIR, so finished files can be moved into place with an atomic os.replace
+STAGING_DIR = os.getenv("PROFILE_PICTURE_STAGING_DIR", "uploads")
+PUBLIC_PREFIX = "/static/profile_pics"
+DEFAULT_PICTURE = f"{PUBLIC_PREFIX}/default-avatar.png"
+
+PROFILE_PICTURE_MAX_BYTES = int(os.getenv("PROFILE_PICTURE_MAX_BYTES", str(5 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+THUMBNAIL_SIZES = (96, 320)  # Navbar avatar and match cards, in pixels along the longer side
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+DIGEST_LENGTH = 32  # Hex characters of the SHA-256 kept in file names
+
+MAX_IMAGE_PIXELS = 40_000_000  # Refuse decompression bombs well before they exhaust memory
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+CONTENT_ADDRESSED_NAME = re.compile(rf"^[0-9a-f]{{{DIGEST_LENGTH}}}(_\d+)?\.[a-z]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PUBLISHED_MODE = 0o644  # mkstemp creates files only their owner can read
+
+os.makedirs(UPLOAD_DIR, exist_ok=True)  # StaticFiles refuses to mount a missing directory
+os.makedirs(STAGING_DIR, exist_ok=True)
+
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+
+
+class InvalidPicture(Exception):
+    """The upload is too large or not an image we accept; the message is safe to show."""
+
+
+async def _stream_to_temp(upload: UploadFile):
+    """Copy an upload to a temp file in STAGING_DIR in chunks off the event loop; return (path, sha256 hex)."""
+    if upload.size is not None and upload.size > PROFILE_PICTURE_MAX_BYTES:
+        raise InvalidPicture(f"Profile picture must be at most {PROFILE_PICTURE_MAX_BYTES // (1024 * 1024)} MB.")
+
+    fd, path = tempfile.mkstemp(dir=STAGING_DIR, suffix=".upload")
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > PROFILE_PICTURE_MAX_BYTES:
+                    raise InvalidPicture(f"Profile picture must be at most {PROFILE_PICTURE_MAX_BYTES // (1024 * 1024)} MB.")
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest()[:DIGEST_LENGTH]
+
+
+def _render_variants(temp_path: str, name: str) -> str:
+    """Validate and decode the staged image, write its thumbnails, then move it to its content-addressed name.
+
+    Everything is decoded and rendered in STAGING_DIR first, so a file that
+    fails part-way is never published. Runs on the image worker pool.
+    Returns the original's file name.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError  # Loaded with the first upload, not at startup
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    try:
+        with Image.open(temp_path) as image:
+            image_format = image.format
+            image.verify()
+        if image_format not in FORMAT_EXTENSIONS:
+            raise InvalidPicture("Profile picture must be a JPEG, PNG, WebP or GIF image.")
+        # verify() only checks the headers; a truncated or corrupt body only fails once it is decoded
+        with Image.open(temp_path) as image:
+            image = ImageOps.exif_transpose(image).convert("RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+        raise InvalidPicture("Profile picture must be a JPEG, PNG, WebP or GIF image.")
+
+    rendered = []  # (staged thumbnail, published path)
+    try:
+        for size in THUMBNAIL_SIZES:
+            target = os.path.join(UPLOAD_DIR, f"{name}_{size}.jpg")
+            if os.path.exists(target):
+                continue  # Same content was uploaded before
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size), Image.LANCZOS)
+            fd, partial = tempfile.mkstemp(dir=STAGING_DIR, suffix=".jpg")
+            rendered.append((partial, target))
+            with os.fdopen(fd, "wb") as out:
+                thumbnail.save(out, "JPEG", quality=85, optimize=True, progressive=True)
+
+        filename = f"{name}.{FORMAT_EXTENSIONS[image_format]}"
+        for partial, target in rendered + [(temp_path, os.path.join(UPLOAD_DIR, filename))]:
+            os.chmod(partial, PUBLISHED_MODE)
+            os.replace(partial, target)
+    finally:
+        for partial, _ in rendered:
+            if os.path.exists(partial):
+                os.unlink(partial)
+    return filename
+
+
+async def save_profile_picture(upload: UploadFile) -> str:
+    """Store an uploaded profile picture and its thumbnails; return its public URL.
+
+    Files are named after a hash of their content, so a URL never changes
+    meaning and can be cached forever.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    temp_path, name = await _stream_to_temp(upload)
+    try:
+        filename = await asyncio.get_running_loop().run_in_executor(_executor, _render_variants, temp_path, name)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+    return f"{PUBLIC_PREFIX}/{filename}"
+
+
+def delete_profile_picture(profile_picture: str):
+    """Remove a stored picture and its thumbnails; the caller checks that no user points at it any more."""
+    if not profile_picture or not profile_picture.startswith(f"{PUBLIC_PREFIX}/"):
+        return
+    filename = profile_picture.rsplit("/", 1)[1]
+    if not CONTENT_ADDRESSED_NAME.match(filename):
+        return  # The default avatar and pictures stored before content addressing
+    name = filename.rsplit(".", 1)[0]
+    for variant in (filename, *(f"{name}_{size}.jpg" for size in THUMBNAIL_SIZES)):
+        try:
+            os.unlink(os.path.join(UPLOAD_DIR, variant))
+        except FileNotFoundError:
+            pass
+
+
+def thumbnail_url(profile_picture, size: int = THUMBNAIL_SIZES[-1]) -> str:
+    """URL of a thumbnail variant; pictures stored before thumbnails existed are returned as-is."""
+    if not profile_picture:
+        return DEFAULT_PICTURE
+    directory, filename = profile_picture.rsplit("/", 1)
+    name = filename.rsplit(".", 1)[0]
+    if directory != PUBLIC_PREFIX or len(name) != DIGEST_LENGTH:
+        return profile_picture
+    return f"{directory}/{name}_{size}.jpg"
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that lets browsers cache content-addressed files forever.
+
+    Everything else is served with no-cache, so clients revalidate it with the
+    ETag / Last-Modified validators StaticFiles already sends.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        is_immutable = CONTENT_ADDRESSED_NAME.match(os.path.basename(full_path))
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if is_immutable else "no-cache"
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
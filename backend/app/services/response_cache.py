@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+# Bounds how long another worker's write can go unnoticed here; writes in this process invalidate immediately
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+
+# Namespaces of cached responses; a write invalidates the user's entry in the namespace it affects
+PROFILES = "profiles"
+QUESTIONNAIRES = "questionnaires"
+
+# Bodies are per user, so shared caches must not store them; browsers revalidate every time
+CACHE_CONTROL = "private, no-cache"
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    """A serialized JSON body and its strong ETag (a hash of the bytes)."""
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_payload(cls, payload) -> "CachedBody":
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def conditional_response(request: Request, cached: CachedBody) -> Response:
+    """304 if the client already has this body, else the body itself, with validators either way."""
+    headers = {"ETag": cached.etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """Thread-safe LRU of serialized responses keyed by namespace and user id.
+
+    A write invalidates the user's entry in that namespace and bumps their
+    version, so a body built from data read before the write is never stored;
+    entries also expire after a TTL to pick up writes made by other workers.
+    Versions are kept in an LRU of the same size: an evicted user reads as
+    the newest evicted version, which is above any version handed out before
+    it, so eviction can only turn a store into a miss. The ETag is derived
+    from the body, so it stays valid across workers and restarts: a client
+    revalidating after an entry expired, or against another process, still
+    gets a 304 if nothing changed.
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL_SECONDS, maxsize: int = RESPONSE_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._versions = OrderedDict()
+        self._generation = 0  # Source of versions; grows with every invalidation
+        self._evicted = 0  # Newest version dropped from _versions
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _version(self, key) -> int:
+        return self._versions.get(key, self._evicted)
+
+    def get_or_build(self, namespace: str, user_id: int, build) -> CachedBody:
+        """Cached body for a user, calling ``build()`` for the payload on a miss.
+
+        Exceptions from ``build`` (e.g. a 404) propagate and are not cached.
+        """
+        key = (namespace, user_id)
+        now = time.monotonic()
+        with self._lock:
+            version = self._version(key)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        cached = CachedBody.from_payload(build())
+
+        with self._lock:
+            # Don't store a body built from data that changed while we were building it
+            if self._version(key) == version:
+                self._entries[key] = (cached, now + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return cached
+
+    def invalidate(self, namespace: str, user_id: int):
+        """Drop a user's entry in a namespace and bump their version after writing the data behind it."""
+        key = (namespace, user_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+            self._versions[key] = self._generation
+            self._versions.move_to_end(key)
+            while len(self._versions) > self.maxsize:
+                self._evicted = max(self._evicted, self._versions.popitem(last=False)[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._evicted = self._generation
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,105 @@
+import os
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models import MISSING_ANSWER, QUESTION_COUNT, Response
+
+NEUTRAL_RESPONSE = 4  # Value used for unanswered questions
+LOADER_CHUNK_SIZE = int(os.getenv("RESPONSE_LOADER_CHUNK_SIZE", "10000"))
+
+
+def unpack_answers(blobs, count: int) -> np.ndarray:
+    """View packed answer blobs as one contiguous (count, QUESTION_COUNT) int8 array."""
+    return np.frombuffer(b"".join(blobs), dtype=np.int8).reshape(count, QUESTION_COUNT)
+
+
+def answers_query():
+    """Default loader statement: every stored response as (user_id, answers), oldest first."""
+    return select(Response.user_id, Response.answers).order_by(Response.id)
+
+
+def iter_answer_chunks(db: Session, chunk_size: int = LOADER_CHUNK_SIZE, query=None):
+    """Stream responses as ``(user_ids, answers)`` array pairs of at most chunk_size rows.
+
+    Rows are fetched through a server-side cursor where the driver supports
+    one, so only a single chunk is ever held in memory. ``query`` may be any
+    statement returning (user_id, answers) rows; it defaults to answers_query().
+    Every stored response is yielded, including older ones of the same user.
+    """
+    result = db.execute(
+        query if query is not None else answers_query(),
+        execution_options={"stream_results": True, "yield_per": chunk_size},
+    )
+    for rows in result.partitions():
+        user_ids = np.fromiter((user_id for user_id, _ in rows), dtype=np.int64, count=len(rows))
+        yield user_ids, unpack_answers((answers for _, answers in rows), len(rows))
+
+
+def load_answer_matrix(db: Session, chunk_size: int = LOADER_CHUNK_SIZE, query=None):
+    """Bulk-load every user's latest answers without building ORM objects.
+
+    Returns ``(user_ids, answers)``: an int64 array of user ids and a
+    contiguous int8 matrix with one row per user, where MISSING_ANSWER
+    marks unanswered questions. Chunks are copied straight into arrays sized
+    from a row count taken up front.
+    """
+    base = query if query is not None else answers_query()
+    capacity = db.execute(select(func.count()).select_from(base.order_by(None).subquery())).scalar()
+    user_ids = np.empty(capacity, dtype=np.int64)
+    answers = np.empty((capacity, QUESTION_COUNT), dtype=np.int8)
+
+    size = 0
+    for chunk_ids, chunk_answers in iter_answer_chunks(db, chunk_size, base):
+        end = size + len(chunk_ids)
+        if end > capacity:
+            # Rows committed after the count was taken
+            capacity = max(end, capacity * 2)
+            user_ids = np.resize(user_ids, capacity)
+            answers = np.resize(answers, (capacity, QUESTION_COUNT))
+        user_ids[size:end] = chunk_ids
+        answers[size:end] = chunk_answers
+        size = end
+    user_ids, answers = user_ids[:size], answers[:size]
+
+    # Keep only the last (newest) response of each user
+    reversed_ids = user_ids[::-1]
+    _, last = np.unique(reversed_ids, return_index=True)
+    if len(last) == size:
+        return user_ids, answers
+    keep = np.sort(size - 1 - last)
+    return user_ids[keep], np.ascontiguousarray(answers[keep])
+
+
+def load_user_answers(db: Session, user_id: int):
+    """Latest packed answers of a single user as an int8 vector, or None."""
+    answers = db.execute(
+        select(Response.answers).where(Response.user_id == user_id).order_by(Response.id.desc()).limit(1)
+    ).scalar()
+    if answers is None:
+        return None
+    return unpack_answers([answers], 1)[0]
+
+
+def responses_fingerprint(db: Session):
+    """Cheap summary of the responses table used to detect changes: (rows, max id, last update)."""
+    return tuple(db.execute(
+        select(func.count(Response.id), func.max(Response.id), func.max(Response.updated_at))
+    ).one())
+
+
+def changed_responses(db: Session, since):
+    """(id, user_id, updated_at) of every response written at or after ``since``, oldest first."""
+    return db.execute(
+        select(Response.id, Response.user_id, Response.updated_at)
+        .where(Response.updated_at >= since).order_by(Response.id)
+    ).all()
+
+
+def response_user_ids(db: Session) -> set:
+    """Ids of every user with a stored response."""
+    return set(db.execute(select(Response.user_id).distinct()).scalars())
+
+
+def fill_missing(answers: np.ndarray) -> np.ndarray:
+    """Float copy of an answer matrix with unanswered questions set to the neutral response."""
+    return np.where(answers == MISSING_ANSWER, NEUTRAL_RESPONSE, answers).astype(np.float32)
@@ -0,0 +1,356 @@
+import os
+import threading
+import time
+from datetime import timedelta
+import numpy as np
+from sqlalchemy.orm import Session
+from app.services.dealbreakers import dealbreakers, select_rows
+from app.services.neighbor_index import (
+    EXCLUDED_SCORE, build_index, normalize_rows, pair_scores, rank_rows, score_matrices, top_k_rows,
+)
+from app.services.preprocessing import feature_pipelines
+from app.services.response_loader import (
+    changed_responses, load_answer_matrix, load_user_answers, response_user_ids, responses_fingerprint,
+)
+
+# Number of neighbors kept per user and how often the store re-checks the DB for changes
+SIMILARITY_TOP_K = int(os.getenv("SIMILARITY_TOP_K", "50"))
+SIMILARITY_REFRESH_SECONDS = float(os.getenv("SIMILARITY_REFRESH_SECONDS", "5"))
+# Up to this many changed users are patched into the snapshot in place; more than that and it is rebuilt
+SIMILARITY_MAX_DELTA = int(os.getenv("SIMILARITY_MAX_DELTA", "256"))
+# A write can commit after a later-stamped one is already visible, so catching up re-reads this far back
+SIMILARITY_DELTA_LOOKBACK_SECONDS = float(os.getenv("SIMILARITY_DELTA_LOOKBACK_SECONDS", "30"))
+
+
+class ReciprocalTable:
+    """CSR-style table of every user's reciprocal matches, best first.
+
+    Row ``i`` holds the users that rank ``i`` in their own top-N, ordered by
+    similarity and truncated to N. This is the same result shape as the old
+    per-user ``reciprocal_matches`` dict, computed for everyone at once.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, scores: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+
+    def row(self, idx: int):
+        start, stop = self.indptr[idx], self.indptr[idx + 1]
+        return self.indices[start:stop], self.scores[start:stop]
+
+
+def reciprocal_top_n(neighbors: np.ndarray, scores: np.ndarray, top_n: int, ids: np.ndarray = None) -> ReciprocalTable:
+    """Build the reciprocal table from precomputed top-K neighbor lists.
+
+    Transposes the sparse "i ranks j in its top-N" relation with a single
+    sort instead of re-ranking each candidate's similarity row. Equal scores
+    go to the lowest of ``ids`` (row positions by default).
+    """
+    n = len(neighbors)
+    top_n = min(top_n, neighbors.shape[1])
+
+    allowed = np.isfinite(scores[:, :top_n].ravel())  # Lists short of allowed candidates are padded with -inf
+    sources = np.repeat(np.arange(n), top_n)[allowed]
+    targets = neighbors[:, :top_n].ravel()[allowed]
+    values = scores[:, :top_n].ravel()[allowed]
+
+    # Group edges by target, best score first within each group
+    order = np.lexsort((sources if ids is None else ids[sources], -values, targets))
+    sources, targets, values = sources[order], targets[order], values[order]
+
+    counts = np.bincount(targets, minlength=n)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    keep = np.arange(len(targets)) - starts[targets] < top_n
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.minimum(counts, top_n), out=indptr[1:])
+    return ReciprocalTable(indptr, sources[keep], values[keep])
+
+
+class SimilaritySnapshot:
+    """Immutable view of the population: normalized vectors plus top-K neighbor lists.
+
+    ``pipeline`` is the fitted feature pipeline the vectors were made with;
+    answers patched in later go through the same parameters. ``constraints``
+    holds every user's dealbreaker blocks (None without dealbreakers); pairs
+    that break one are never in each other's lists.
+    """
+
+    def __init__(self, version: int, user_ids: np.ndarray, vectors: np.ndarray,
+                 neighbors: np.ndarray, scores: np.ndarray, index: dict = None, pipeline=None, constraints=None):
+        self.version = version
+        self.pipeline = pipeline
+        self.constraints = constraints
+        self.user_ids = user_ids
+        self.vectors = vectors
+        self.neighbors = neighbors
+        self.scores = scores
+        self.index = index if index is not None else {int(user_id): i for i, user_id in enumerate(user_ids)}
+        self.built_at = time.time()
+        self._reciprocal = {}
+
+    @property
+    def top_k(self) -> int:
+        return self.neighbors.shape[1]
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def similarity(self, user_a: int, user_b: int) -> float:
+        """Cosine similarity between two users' responses."""
+        a, b = self.index[user_a], self.index[user_b]
+        return float(self.vectors[a] @ self.vectors[b])
+
+    def _neighbor_lists(self, n: int):
+        """Top-n neighbor indices and scores, recomputed if n exceeds the stored K."""
+        if n <= self.top_k or self.top_k == len(self) - 1:
+            return self.neighbors[:, :n], self.scores[:, :n]
+        return build_index(self.vectors, constraints=self.constraints, ids=self.user_ids).top_k(n)
+
+    def reciprocal_table(self, top_n: int) -> ReciprocalTable:
+        """Reciprocal matches for every user, computed once per top_n and cached."""
+        table = self._reciprocal.get(top_n)
+        if table is None:
+            table = reciprocal_top_n(*self._neighbor_lists(top_n), top_n, self.user_ids)
+            self._reciprocal[top_n] = table
+        return table
+
+    def reciprocal_matches(self, user_id: int, top_n: int = 5):
+        """Best candidates (by similarity) that also rank ``user_id`` in their own top-N.
+
+        Returns a list of ``(match_user_id, score)`` tuples, best first, or None
+        if the user has no stored response.
+        """
+        idx = self.index.get(user_id)
+        if idx is None:
+            return None
+
+        indices, scores = self.reciprocal_table(top_n).row(idx)
+        return [(int(self.user_ids[i]), float(score)) for i, score in zip(indices, scores)]
+
+
+    def with_user(self, user_id: int, answers: np.ndarray, version: int, top_k: int):
+        """Copy of the snapshot with one user's response (packed answers) added or replaced.
+
+        Only that user's row and the neighbor lists it enters or leaves are
+        recomputed. Returns None if the neighbor list length would change, in
+        which case the caller should rebuild.
+        """
+        idx = self.index.get(user_id)
+        size = len(self) + (idx is None)
+        if min(top_k, size - 1) != self.top_k or self.top_k == 0:
+            return None
+
+        vector = normalize_rows(self.pipeline.transform(answers[None, :]))[0]
+        parts = dealbreakers.features(answers[None, :])
+        user_ids, vectors, index = self.user_ids, self.vectors.copy(), dict(self.index)
+        neighbors, scores = self.neighbors.copy(), self.scores.copy()
+        constraints = self.constraints
+        if idx is None:
+            idx = len(user_ids)
+            user_ids = np.append(user_ids, user_id)
+            vectors = np.vstack([vectors, vector])
+            if parts is not None:
+                constraints = tuple(np.vstack([existing, part]) for existing, part in zip(constraints, parts))
+            neighbors = np.vstack([neighbors, np.zeros((1, self.top_k), dtype=neighbors.dtype)])
+            scores = np.vstack([scores, np.full((1, self.top_k), -np.inf, dtype=scores.dtype)])
+            index[user_id] = idx
+        else:
+            vectors[idx] = vector
+            if parts is not None:
+                constraints = tuple(existing.copy() for existing in constraints)
+                for existing, part in zip(constraints, parts):
+                    existing[idx] = part[0]
+
+        queries, keys = score_matrices(vectors, constraints)
+        similarities = pair_scores(queries, keys, np.arange(len(user_ids)), np.full(len(user_ids), idx))
+        similarities[similarities < EXCLUDED_SCORE] = -np.inf
+        similarities[idx] = -np.inf
+        contains = neighbors == idx
+        contains[idx] = False
+        had = contains.any(axis=1)
+
+        # Lists rank by score and then by lowest user id, like a rebuild; compare with each list's last entry
+        last_scores, last_ids = scores[:, -1], user_ids[neighbors[:, -1]]
+        tie = (similarities == last_scores) & np.isfinite(similarities)
+
+        # Lists that keep the user just get its new score; falling behind the last entry could let an unseen user in
+        still_in = had & ((similarities > last_scores) | (tie & (user_id <= last_ids)))
+        rows, cols = np.nonzero(contains & still_in[:, None])
+        scores[rows, cols] = similarities[rows]
+
+        # Lists the user newly enters drop their current last neighbor
+        enters = ~had & ((similarities > last_scores) | (tie & (user_id < last_ids)))
+        enters[idx] = False
+        rows = np.flatnonzero(enters)
+        neighbors[rows, -1] = idx
+        scores[rows, -1] = similarities[rows]
+
+        touched = np.flatnonzero(still_in | enters)
+        order = rank_rows(scores[touched], user_ids[neighbors[touched]])
+        neighbors[touched] = np.take_along_axis(neighbors[touched], order, axis=1)
+        scores[touched] = np.take_along_axis(scores[touched], order, axis=1)
+
+        # Lists the user fell out of lost an unknown K-th neighbor, so recompute them with the user's own list
+        recompute = np.append(np.flatnonzero(had & ~still_in), idx)
+        neighbors[recompute], scores[recompute] = top_k_rows(queries, recompute, self.top_k, keys=keys, ids=user_ids)
+
+        return SimilaritySnapshot(version, user_ids, vectors, neighbors, scores, index, self.pipeline, constraints)
+
+    def without_user(self, user_id: int, version: int, top_k: int):
+        """Copy of the snapshot with one user removed, or None if the caller should rebuild."""
+        idx = self.index.get(user_id)
+        if idx is None:
+            return self
+        if min(top_k, len(self) - 2) != self.top_k or self.top_k == 0:
+            return None
+
+        keep = np.arange(len(self)) != idx
+        user_ids, vectors = self.user_ids[keep], self.vectors[keep]
+        neighbors, scores = self.neighbors[keep], self.scores[keep]
+        constraints = select_rows(self.constraints, keep)
+
+        stale = np.flatnonzero((neighbors == idx).any(axis=1))
+        neighbors = neighbors - (neighbors > idx)  # Shift indices past the removed row
+        queries, keys = score_matrices(vectors, constraints)
+        neighbors[stale], scores[stale] = top_k_rows(queries, stale, self.top_k, keys=keys, ids=user_ids)
+
+        return SimilaritySnapshot(version, user_ids, vectors, neighbors, scores,
+                                  pipeline=self.pipeline, constraints=constraints)
+
+
+class SimilarityStore:
+    """Shared, versioned similarity cache that follows changes to the responses table.
+
+    When the table's fingerprint changes, the responses written since the
+    last one seen are patched into the snapshot in place, so every worker
+    keeps up with writes made by any other worker without a full O(N^2)
+    rebuild. It rebuilds when too many users changed at once or a patch
+    can't be applied.
+    """
+
+    def __init__(self, top_k: int = SIMILARITY_TOP_K, refresh_interval: float = SIMILARITY_REFRESH_SECONDS,
+                 max_delta: int = SIMILARITY_MAX_DELTA, lookback: float = SIMILARITY_DELTA_LOOKBACK_SECONDS):
+        self.top_k = top_k
+        self.refresh_interval = refresh_interval
+        self.max_delta = max_delta
+        self.lookback = timedelta(seconds=lookback)
+        self._snapshot = None
+        self._fingerprint = None
+        self._applied = {}  # response id -> updated_at of every row already in the snapshot, within the lookback
+        self._checked_at = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.patched_users = 0
+
+    def invalidate(self):
+        """Force the next lookup to rebuild."""
+        with self._lock:
+            self._fingerprint = None
+            self._checked_at = 0.0
+
+    def update_user(self, db: Session, user_id: int):
+        """Bring the snapshot up to date right after ``user_id``'s response was written or deleted.
+
+        This catches up on every change since the last fingerprint, not only
+        this user's, and leaves a rebuild to the next lookup if it can't.
+        """
+        with self._lock:
+            if self._snapshot is None or self._fingerprint is None:
+                self._fingerprint = None
+                return
+            fingerprint = responses_fingerprint(db)
+            if fingerprint != self._fingerprint and not self._catch_up(db, fingerprint):
+                self._fingerprint = None
+
+    def snapshot(self, db: Session):
+        """Return the current snapshot, patched or rebuilt if the responses table changed."""
+        now = time.monotonic()
+        if self._snapshot is not None and self._fingerprint is not None \
+                and now - self._checked_at < self.refresh_interval:
+            return self._snapshot
+
+        with self._lock:
+            fingerprint = responses_fingerprint(db)
+            if self._snapshot is None or fingerprint != self._fingerprint:
+                if not self._catch_up(db, fingerprint):
+                    self._snapshot = self._build(db, fingerprint)
+                    self._fingerprint = fingerprint
+                    self._applied = self._recent_versions(db, fingerprint)
+                    self.rebuilds += 1
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def _recent_versions(self, db: Session, fingerprint) -> dict:
+        """response id -> updated_at of the rows in the lookback window before the fingerprint's last update."""
+        if fingerprint[2] is None:
+            return {}
+        return {response_id: updated_at for response_id, _, updated_at in
+                changed_responses(db, fingerprint[2] - self.lookback)}
+
+    def _catch_up(self, db: Session, fingerprint) -> bool:
+        """Patch the responses written since the previous fingerprint into the snapshot; False if it must be rebuilt."""
+        snapshot, previous = self._snapshot, self._fingerprint
+        if snapshot is None or previous is None or previous[2] is None or fingerprint[2] is None:
+            return False
+
+        # Any row not yet applied at its current version changes its user, even one older than the user's newest
+        versions, changed = {}, set()
+        inserted = 0
+        for response_id, user_id, updated_at in changed_responses(db, previous[2] - self.lookback):
+            versions[response_id] = updated_at
+            if self._applied.get(response_id) != updated_at:
+                changed.add(user_id)
+            inserted += previous[1] is None or response_id > previous[1]
+
+        # Rows that are neither counted before nor inserted since were deleted; find whose responses are gone
+        removed = []
+        if fingerprint[0] < previous[0] + inserted:
+            stored = response_user_ids(db)
+            removed = [int(user_id) for user_id in snapshot.user_ids if int(user_id) not in stored]
+        if len(changed) + len(removed) > self.max_delta:
+            return False
+
+        version = self._version
+        for user_id in sorted(changed):
+            # The changed row may be an older one of the user's; a rebuild uses the newest, so re-read that
+            answers = load_user_answers(db, user_id)
+            version += 1
+            if answers is None:
+                snapshot = snapshot.without_user(user_id, version, self.top_k)
+            else:
+                snapshot = snapshot.with_user(user_id, answers, version, self.top_k)
+            if snapshot is None:
+                return False
+        for user_id in removed:
+            version += 1
+            snapshot = snapshot.without_user(user_id, version, self.top_k)
+            if snapshot is None:
+                return False
+
+        cutoff = fingerprint[2] - self.lookback
+        applied = {response_id: updated_at for response_id, updated_at in self._applied.items() if updated_at >= cutoff}
+        applied.update(versions)
+        self._snapshot, self._fingerprint, self._applied, self._version = snapshot, fingerprint, applied, version
+        self.patched_users += len(changed) + len(removed)
+        return True
+
+    def _build(self, db: Session, fingerprint):
+        user_ids, answers = load_answer_matrix(db)
+        if len(user_ids) == 0:
+            return None
+
+        # Fitted once per snapshot of the table and shared through disk, so every worker uses the same parameters
+        pipeline = feature_pipelines.get(fingerprint, answers)
+        vectors = normalize_rows(pipeline.transform(answers))
+        constraints = dealbreakers.features(answers)
+        neighbors, scores = build_index(vectors, constraints=constraints, ids=user_ids).top_k(self.top_k)
+        self._version += 1
+        return SimilaritySnapshot(self._version, user_ids, vectors, neighbors, scores,
+                                  pipeline=pipeline, constraints=constraints)
+
+
+# Process-wide store shared by /matches, /admin/match-users and other callers
+similarity_store = SimilarityStore()
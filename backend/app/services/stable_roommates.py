@@ -0,0 +1,203 @@
+import os
+import numpy as np
+
+# Times stable_matching may drop the rows that make an instance unsolvable and try again
+STABLE_MAX_RESTARTS = int(os.getenv("STABLE_MAX_RESTARTS", "50"))
+
+
+def mirror_positions(preferences: np.ndarray) -> np.ndarray:
+    """For every entry j at position p of i's list, the position of i in j's list (-1 if j doesn't list i).
+
+    ``preferences`` is an (n, width) table of row indices, best first, padded
+    with -1. Computed with one sort instead of a dense n x n rank table.
+    """
+    n, width = preferences.shape
+    rows = np.repeat(np.arange(n, dtype=np.int64), width)
+    cols = preferences.ravel().astype(np.int64)
+    valid = np.flatnonzero(cols >= 0)
+
+    keys = rows[valid] * n + cols[valid]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    reverse = cols[valid] * n + rows[valid]
+    found = np.minimum(np.searchsorted(sorted_keys, reverse), max(len(sorted_keys) - 1, 0))
+
+    mirror = np.full(n * width, -1, dtype=np.int64)
+    if len(valid):
+        positions = valid % width
+        mirror[valid] = np.where(sorted_keys[found] == reverse, positions[order][found], -1)
+    return mirror.reshape(n, width)
+
+
+class StableRoommates:
+    """Irving's stable-roommates algorithm over a table of (possibly truncated) preference lists.
+
+    Row ``i`` of ``preferences`` lists the rows ``i`` would accept, best
+    first, padded with -1. A pair is only acceptable if both list each other,
+    so truncated top-K lists give a matching that is stable with respect to
+    those lists. Every entry is addressed by (row, position): ``mirror`` gives
+    the same pair's position in the other list, so deleting a pair from both
+    lists and comparing ranks are O(1) without any id lookups.
+    """
+
+    def __init__(self, preferences: np.ndarray):
+        self.preferences = preferences
+        self.mirror = mirror_positions(preferences)
+        self._pref = preferences.tolist()
+        self._mirror = self.mirror.tolist()
+        self._alive = (self.mirror >= 0).tolist()
+        self._length = (self.mirror >= 0).sum(axis=1).tolist()  # Entries left in each list
+        self._emptied = []  # Rows whose list ran out while eliminating rotations
+        self._head = [0] * len(preferences)
+        self._tail = [preferences.shape[1] - 1] * len(preferences)
+
+    def _first(self, i: int) -> int:
+        """Position of the best remaining entry of i's list, or -1 if it is empty."""
+        alive, head, tail = self._alive[i], self._head[i], self._tail[i]
+        while head <= tail and not alive[head]:
+            head += 1
+        self._head[i] = head
+        return head if head <= tail else -1
+
+    def _second(self, i: int) -> int:
+        alive, tail = self._alive[i], self._tail[i]
+        position = self._first(i)
+        if position < 0:
+            return -1
+        position += 1
+        while position <= tail and not alive[position]:
+            position += 1
+        return position if position <= tail else -1
+
+    def _last(self, i: int) -> int:
+        alive, head, tail = self._alive[i], self._head[i], self._tail[i]
+        while tail >= head and not alive[tail]:
+            tail -= 1
+        self._tail[i] = tail
+        return tail if tail >= head else -1
+
+    def _truncate(self, i: int, position: int):
+        """Delete every entry after ``position`` from i's list, and i from those lists."""
+        alive, length, pref, mirror = self._alive, self._length, self._pref[i], self._mirror[i]
+        row = alive[i]
+        for q in range(position + 1, self._tail[i] + 1):
+            if row[q]:
+                row[q] = False
+                other = pref[q]
+                alive[other][mirror[q]] = False
+                length[i] -= 1
+                length[other] -= 1
+                if length[other] == 0:
+                    self._emptied.append(other)
+        self._tail[i] = position
+
+    def _phase_one(self):
+        """Proposal phase: everyone proposes down their list; a proposal truncates the receiver's list after it."""
+        pref, mirror = self._pref, self._mirror
+        holding = [-1] * len(pref)  # Position (in the receiver's list) of the proposal each row holds
+        free = list(range(len(pref)))
+        while free:
+            i = free.pop()
+            position = self._first(i)
+            if position < 0:
+                continue  # i ran out of acceptable partners and stays single
+            j, rank = pref[i][position], mirror[i][position]
+            previous = holding[j]
+            holding[j] = rank
+            self._truncate(j, rank)  # Deletes the previous proposer's entry too
+            if previous >= 0:
+                free.append(pref[j][previous])
+
+    def _rotation(self, start: int):
+        """Walk x -> last(second(x)) from ``start`` until it cycles; return the cycle, or None if it dead-ends."""
+        pref = self._pref
+        sequence, seen = [], {}
+        x = start
+        while x not in seen:
+            second = self._second(x)
+            if second < 0:
+                return None
+            seen[x] = len(sequence)
+            sequence.append(x)
+            y = pref[x][second]
+            x = pref[y][self._last(y)]
+        return sequence[seen[x]:]
+
+    def _phase_two(self) -> bool:
+        """Eliminate rotations until every list has at most one entry; False if a list empties (no stable matching)."""
+        pref, mirror = self._pref, self._mirror
+        self._emptied = []  # Lists emptied in phase one just mean those rows stay single
+        for start in range(len(pref)):
+            while self._length[start] > 1:
+                cycle = self._rotation(start)
+                if cycle is None:
+                    self._emptied.append(start)
+                    return False
+                seconds = [self._second(x) for x in cycle]
+                for x, position in zip(cycle, seconds):
+                    # x moves on to its second choice, who drops everyone it likes less than x
+                    self._truncate(pref[x][position], mirror[x][position])
+                if self._emptied:
+                    return False
+        return True
+
+    @property
+    def unsolvable_rows(self) -> list:
+        """Rows whose lists ran out in phase two, which is what makes an instance unsolvable."""
+        return sorted(set(self._emptied))
+
+    def solve(self):
+        """Return (partner of every row or -1, whether the matching is stable).
+
+        When the instance has no stable matching, the partners are None.
+        """
+        self._phase_one()
+        if not self._phase_two():
+            return None, False
+
+        partner = np.full(len(self._pref), -1, dtype=np.int64)
+        for i in range(len(self._pref)):
+            position = self._first(i)
+            if position >= 0:
+                partner[i] = self._pref[i][position]
+        return partner, True
+
+
+def stable_matching(preferences: np.ndarray, max_restarts: int = STABLE_MAX_RESTARTS):
+    """Irving's algorithm, taking out the rows that make an instance unsolvable.
+
+    Many instances have no stable matching, and large ones with asymmetric
+    preferences rarely do. Then the rows whose lists ran out are left single
+    and the rest is solved again, so everyone paired is in a matching that is
+    stable among them. Returns (partner, rows left single this way), or
+    (None, rows) if it still fails after ``max_restarts`` rounds.
+    """
+    preferences = preferences.copy()
+    removed = []
+    for _ in range(max_restarts + 1):
+        solver = StableRoommates(preferences)
+        partner, stable = solver.solve()
+        if stable:
+            return partner, removed
+        rows = solver.unsolvable_rows
+        removed.extend(rows)
+        preferences[rows] = -1
+        preferences[np.isin(preferences, rows)] = -1
+    return None, removed
+
+
+def blocking_pairs(preferences: np.ndarray, partner: np.ndarray, mirror: np.ndarray = None) -> int:
+    """Number of mutually acceptable pairs who both prefer each other to their partners (0 means stable)."""
+    if mirror is None:
+        mirror = mirror_positions(preferences)
+    n, width = preferences.shape
+
+    # Position of each row's partner in its own list; being single ranks below every listed partner
+    partner_rank = np.full(n, width, dtype=np.int64)
+    rows, positions = np.nonzero((preferences == partner[:, None]) & (partner[:, None] >= 0))
+    partner_rank[rows] = positions
+
+    rows, positions = np.nonzero(mirror >= 0)
+    others = preferences[rows, positions]
+    blocking = (positions < partner_rank[rows]) & (mirror[rows, positions] < partner_rank[others])
+    return int(blocking.sum()) // 2
@@ -0,0 +1,29 @@
+"""Add updated_at to responses
+
+Revision ID: 3c9d2e7a41b8
+Revises: f7c13b914cea
+Create Date: 2026-10-18 09:12:44.512093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9d2e7a41b8'
+down_revision: Union[str, None] = 'f7c13b914cea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('responses', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE responses SET updated_at = now()")
+    op.create_index(op.f('ix_responses_updated_at'), 'responses', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_responses_updated_at'), table_name='responses')
+    op.drop_column('responses', 'updated_at')
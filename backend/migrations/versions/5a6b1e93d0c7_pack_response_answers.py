@@ -0,0 +1,48 @@
+"""Pack response answers into a single bytea column
+
+Revision ID: 5a6b1e93d0c7
+Revises: d27a9c4e5f10
+Create Date: 2026-10-18 12:41:52.630118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a6b1e93d0c7'
+down_revision: Union[str, None] = 'd27a9c4e5f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+QUESTION_COUNT = 25
+MIN_ANSWER, MAX_ANSWER = 1, 7
+
+
+def upgrade() -> None:
+    op.add_column('responses', sa.Column('answers', sa.LargeBinary(), nullable=True))
+
+    # One byte per question, question1 first; unanswered (NULL) questions become 0. Stored values off the
+    # 1-7 scale can't be packed (to_hex of a negative number is 8 digits), so they count as unanswered too.
+    packed = " || ".join(
+        f"lpad(to_hex(CASE WHEN question{i} BETWEEN {MIN_ANSWER} AND {MAX_ANSWER} THEN question{i} ELSE 0 END), 2, '0')"
+        for i in range(1, QUESTION_COUNT + 1)
+    )
+    op.execute(f"UPDATE responses SET answers = decode({packed}, 'hex')")
+    op.alter_column('responses', 'answers', nullable=False)
+
+    for i in range(1, QUESTION_COUNT + 1):
+        op.drop_column('responses', f'question{i}')
+
+
+def downgrade() -> None:
+    for i in range(1, QUESTION_COUNT + 1):
+        op.add_column('responses', sa.Column(f'question{i}', sa.Integer(), nullable=True))
+
+    assignments = ", ".join(
+        f"question{i} = nullif(get_byte(answers, {i - 1}), 0)" for i in range(1, QUESTION_COUNT + 1)
+    )
+    op.execute(f"UPDATE responses SET {assignments}")
+    op.drop_column('responses', 'answers')
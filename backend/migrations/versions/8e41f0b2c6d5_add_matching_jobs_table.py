@@ -0,0 +1,44 @@
+"""Add matching_jobs table
+
+Revision ID: 8e41f0b2c6d5
+Revises: 3c9d2e7a41b8
+Create Date: 2026-10-18 10:03:27.804519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e41f0b2c6d5'
+down_revision: Union[str, None] = '3c9d2e7a41b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('matching_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('strategy', sa.String(), nullable=False),
+    sa.Column('max_rounds', sa.Integer(), nullable=False),
+    sa.Column('rounds_completed', sa.Integer(), nullable=False),
+    sa.Column('pairs_written', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_matching_jobs_id'), 'matching_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_matching_jobs_status'), 'matching_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_matching_jobs_status'), table_name='matching_jobs')
+    op.drop_index(op.f('ix_matching_jobs_id'), table_name='matching_jobs')
+    op.drop_table('matching_jobs')
@@ -0,0 +1,28 @@
+"""Add expires_at to revoked_tokens
+
+Revision ID: 9d3b6f1e2a47
+Revises: c5f8a3d17e92
+Create Date: 2026-10-18 21:12:45.903114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3b6f1e2a47'
+down_revision: Union[str, None] = 'c5f8a3d17e92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('revoked_tokens', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_revoked_tokens_expires_at'), 'revoked_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_revoked_tokens_expires_at'), table_name='revoked_tokens')
+    op.drop_column('revoked_tokens', 'expires_at')
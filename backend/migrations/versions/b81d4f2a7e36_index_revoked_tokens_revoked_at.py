@@ -0,0 +1,26 @@
+"""Index revoked_tokens.revoked_at
+
+Revision ID: b81d4f2a7e36
+Revises: 5a6b1e93d0c7
+Create Date: 2026-10-18 14:03:27.184530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81d4f2a7e36'
+down_revision: Union[str, None] = '5a6b1e93d0c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_revoked_tokens_revoked_at'), 'revoked_tokens', ['revoked_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_revoked_tokens_revoked_at'), table_name='revoked_tokens')
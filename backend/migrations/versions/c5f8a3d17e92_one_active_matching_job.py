@@ -0,0 +1,34 @@
+"""Allow only one active matching job
+
+Revision ID: c5f8a3d17e92
+Revises: e4c2a9d71b58
+Create Date: 2026-10-18 18:41:09.527306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5f8a3d17e92'
+down_revision: Union[str, None] = 'e4c2a9d71b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE = "status IN ('queued', 'running')"
+
+
+def upgrade() -> None:
+    # Only the newest active job survives; any others were already racing it
+    op.execute(
+        "UPDATE matching_jobs SET status = 'failed', error = 'Superseded by a newer matching job' "
+        f"WHERE {ACTIVE} AND id < (SELECT MAX(id) FROM matching_jobs WHERE {ACTIVE})"
+    )
+    op.create_index('uq_matching_jobs_active', 'matching_jobs', [sa.text(f"({ACTIVE})")], unique=True,
+                    postgresql_where=sa.text(ACTIVE), sqlite_where=sa.text(ACTIVE))
+
+
+def downgrade() -> None:
+    op.drop_index('uq_matching_jobs_active', table_name='matching_jobs')
@@ -0,0 +1,73 @@
+"""Add match_count to users
+
+Revision ID: d27a9c4e5f10
+Revises: 8e41f0b2c6d5
+Create Date: 2026-10-18 11:20:05.117342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd27a9c4e5f10'
+down_revision: Union[str, None] = '8e41f0b2c6d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('match_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_index(op.f('ix_users_match_count'), 'users', ['match_count'], unique=False)
+    op.create_index(op.f('ix_matches_user_id'), 'matches', ['user_id'], unique=False)
+    op.create_index(op.f('ix_matches_match_id'), 'matches', ['match_id'], unique=False)
+
+    # Backfill from existing matches (a user counts once per row they appear in, on either side)
+    op.execute("""
+        UPDATE users SET match_count = counts.n
+        FROM (
+            SELECT id, count(*) AS n FROM (
+                SELECT user_id AS id FROM matches UNION ALL SELECT match_id FROM matches
+            ) ids GROUP BY id
+        ) counts
+        WHERE users.id = counts.id
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION matches_adjust_count() RETURNS trigger AS $$
+        DECLARE
+            direction integer := CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END;
+        BEGIN
+            UPDATE users SET match_count = users.match_count + direction * delta.n
+            FROM (
+                SELECT id, count(*) AS n FROM (
+                    SELECT user_id AS id FROM changed_matches UNION ALL SELECT match_id FROM changed_matches
+                ) ids GROUP BY id
+            ) delta
+            WHERE users.id = delta.id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER matches_count_insert AFTER INSERT ON matches
+        REFERENCING NEW TABLE AS changed_matches
+        FOR EACH STATEMENT EXECUTE PROCEDURE matches_adjust_count()
+    """)
+    op.execute("""
+        CREATE TRIGGER matches_count_delete AFTER DELETE ON matches
+        REFERENCING OLD TABLE AS changed_matches
+        FOR EACH STATEMENT EXECUTE PROCEDURE matches_adjust_count()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS matches_count_delete ON matches")
+    op.execute("DROP TRIGGER IF EXISTS matches_count_insert ON matches")
+    op.execute("DROP FUNCTION IF EXISTS matches_adjust_count()")
+    op.drop_index(op.f('ix_matches_match_id'), table_name='matches')
+    op.drop_index(op.f('ix_matches_user_id'), table_name='matches')
+    op.drop_index(op.f('ix_users_match_count'), table_name='users')
+    op.drop_column('users', 'match_count')
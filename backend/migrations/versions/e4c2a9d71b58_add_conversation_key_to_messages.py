@@ -0,0 +1,34 @@
+"""Add conversation_key to messages
+
+Revision ID: e4c2a9d71b58
+Revises: b81d4f2a7e36
+Create Date: 2026-10-18 15:21:09.407716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4c2a9d71b58'
+down_revision: Union[str, None] = 'b81d4f2a7e36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('conversation_key', sa.BigInteger(), nullable=True))
+    # (smaller user id << 32) | larger user id, matching Message.conversation_key_for
+    op.execute(
+        "UPDATE messages SET conversation_key = "
+        "CAST(CASE WHEN sender_id < receiver_id THEN sender_id ELSE receiver_id END AS BIGINT) * 4294967296 "
+        "+ CASE WHEN sender_id < receiver_id THEN receiver_id ELSE sender_id END"
+    )
+    op.create_index('ix_messages_conversation_key_id', 'messages', ['conversation_key', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_conversation_key_id', table_name='messages')
+    op.drop_column('messages', 'conversation_key')
@@ -0,0 +1,63 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+# The app reads its database settings at import time, so point it at a throwaway SQLite file first
+DB_DIR = tempfile.mkdtemp(prefix="roommatch-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'test.db')}"
+os.environ["CREATE_SCHEMA_ON_STARTUP"] = "true"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.database import SessionLocal, async_engine, engine
+from app.main import app
+from app.models import User
+
+PASSWORD = "Passw0rd!"
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def register(client):
+    """Register a user and return (user id, auth headers)."""
+    def register(name: str):
+        email = f"{name}@mymail.pomona.edu"
+        response = client.post("/register", data={"email": email, "password": PASSWORD, "school": "Pomona College"})
+        assert response.status_code == 201, response.text
+        token = client.post("/token", data={"username": email, "password": PASSWORD}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        session = SessionLocal()
+        try:
+            return session.query(User.id).filter(User.email == email).scalar(), headers
+        finally:
+            session.close()
+    return register
+
+
+@pytest.fixture
+def count_queries():
+    """Context manager that collects every statement sent to the database inside it."""
+    @contextmanager
+    def count_queries():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        # With DB_ASYNC_ENABLED, run_db(..., io_only=True) queries go through the async engine
+        engines = [engine] + ([async_engine.sync_engine] if async_engine is not None else [])
+        for listened in engines:
+            event.listen(listened, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            for listened in engines:
+                event.remove(listened, "before_cursor_execute", record)
+    return count_queries
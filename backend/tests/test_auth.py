@@ -0,0 +1,13 @@
+"""Logging out revokes only the presented token."""
+
+
+def test_logged_out_token_is_rejected_and_a_fresh_one_works(client, register):
+    _, headers = register("logout-user")
+    assert client.get("/user-profile", headers=headers).status_code == 200
+
+    assert client.post("/logout", headers=headers).status_code == 200
+    assert client.get("/user-profile", headers=headers).status_code == 401
+
+    token = client.post("/token", data={"username": "logout-user@mymail.pomona.edu", "password": "Passw0rd!"})
+    fresh = {"Authorization": f"Bearer {token.json()['access_token']}"}
+    assert client.get("/user-profile", headers=fresh).status_code == 200
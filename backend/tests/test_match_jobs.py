@@ -0,0 +1,119 @@
+"""Only one matching job may be active at a time, and a running job keeps its heartbeat fresh between rounds."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import pytest
+from app.auth import get_current_admin
+from app.database import SessionLocal
+from app.models import MatchingJob
+from app.services import jobs
+
+
+@pytest.fixture
+def no_workers(client, monkeypatch):
+    """Record jobs without starting worker processes, and finish any left active afterwards."""
+    monkeypatch.setattr(jobs, "_dispatch", lambda job_id, reset=False: None)
+    yield
+    db = SessionLocal()
+    try:
+        db.query(MatchingJob).filter(MatchingJob.status.in_(("queued", "running"))).update({"status": "completed"})
+        db.commit()
+    finally:
+        db.close()
+
+
+def submit():
+    db = SessionLocal()
+    try:
+        return jobs.submit_matching_job(db).id
+    except jobs.JobAlreadyActive:
+        return None
+    finally:
+        db.close()
+
+
+def test_concurrent_submissions_start_one_job(no_workers):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        submitted = [job_id for job_id in pool.map(lambda _: submit(), range(8)) if job_id is not None]
+
+    assert len(submitted) == 1
+
+
+def test_submit_route_reports_the_active_job(client, no_workers):
+    job_id = submit()
+    client.app.dependency_overrides[get_current_admin] = lambda: None
+    try:
+        response = client.post("/admin/match-jobs")
+    finally:
+        client.app.dependency_overrides.pop(get_current_admin)
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == f"Matching job {job_id} is already queued"
+
+
+def test_heartbeat_refreshes_a_running_job(no_workers):
+    job_id = submit()
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    db = SessionLocal()
+    try:
+        job = db.get(MatchingJob, job_id)
+        job.status, job.heartbeat_at = "running", long_ago
+        db.commit()
+
+        heartbeat = jobs._Heartbeat(job_id, interval=0.05)
+        heartbeat.start()
+        time.sleep(0.3)
+        heartbeat.stop()
+
+        db.expire_all()
+        assert db.get(MatchingJob, job_id).heartbeat_at > long_ago + timedelta(minutes=59)
+    finally:
+        db.close()
+
+
+def test_stale_job_out_of_attempts_is_failed_not_reclaimed(no_workers):
+    job_id = submit()
+    db = SessionLocal()
+    try:
+        job = db.get(MatchingJob, job_id)
+        job.status, job.attempts = "running", jobs.MAX_JOB_ATTEMPTS
+        job.heartbeat_at = datetime.utcnow() - timedelta(hours=1)
+        db.commit()
+
+        assert not jobs._claim_job(db, job_id)
+        db.expire_all()
+        job = db.get(MatchingJob, job_id)
+        assert (job.status, job.attempts) == ("failed", jobs.MAX_JOB_ATTEMPTS)
+    finally:
+        db.close()
+
+
+def test_submit_resumes_a_job_whose_worker_died(no_workers, monkeypatch):
+    job_id = submit()
+    db = SessionLocal()
+    try:
+        job = db.get(MatchingJob, job_id)
+        job.status, job.attempts = "running", 1
+        job.heartbeat_at = datetime.utcnow() - timedelta(hours=1)
+        db.commit()
+    finally:
+        db.close()
+    dispatched = []
+    monkeypatch.setattr(jobs, "_dispatch", lambda job_id, reset=False: dispatched.append(job_id))
+
+    assert submit() is None  # The resumed job is still the active one
+    assert dispatched == [job_id]
+
+
+def test_dead_job_out_of_attempts_does_not_block_new_jobs(no_workers):
+    job_id = submit()
+    db = SessionLocal()
+    try:
+        job = db.get(MatchingJob, job_id)
+        job.status, job.attempts = "running", jobs.MAX_JOB_ATTEMPTS
+        job.heartbeat_at = datetime.utcnow() - timedelta(hours=1)
+        db.commit()
+    finally:
+        db.close()
+
+    assert submit() not in (None, job_id)
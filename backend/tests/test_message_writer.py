@@ -0,0 +1,66 @@
+"""A batch is split only on row errors; when the database is unreachable it is retried whole."""
+import asyncio
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app.database import SessionLocal
+from app.services.message_writer import MessageWriter
+
+
+class FlakySession:
+    """SessionLocal whose first ``failures`` executes raise as if the connection dropped; counts every execute.
+
+    A batch with a message whose content is "bad" fails with an IntegrityError, like a row breaking a constraint.
+    """
+
+    def __init__(self, state: dict):
+        self.state = state
+        self.session = SessionLocal()
+
+    def execute(self, *args, **kwargs):
+        self.state["executes"] += 1
+        if self.state["failures"]:
+            self.state["failures"] -= 1
+            raise OperationalError("INSERT INTO messages", {}, Exception("server closed the connection"))
+        if any(row["content"] == "bad" for row in args[1]):
+            raise IntegrityError("INSERT INTO messages", {}, Exception("constraint failed"))
+        return self.session.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+@pytest.fixture(scope="module")
+def users(register):
+    return register("writer-sender")[0], register("writer-receiver")[0]
+
+
+def write_all(writer: MessageWriter, messages: list):
+    async def run():
+        await writer.start()
+        try:
+            futures = [await writer.submit(*message) for message in messages]
+            return await asyncio.gather(*futures, return_exceptions=True)
+        finally:
+            await writer.stop()
+    return asyncio.run(run())
+
+
+def test_lost_connection_retries_the_whole_batch(users):
+    state = {"failures": 2, "executes": 0}
+    writer = MessageWriter(session_factory=lambda: FlakySession(state), batch_size=8, retry_delay=0.001)
+
+    results = write_all(writer, [(*users, f"message {i}") for i in range(8)])
+
+    assert all(isinstance(result, tuple) for result in results), results
+    assert state["executes"] == 3  # Two failed attempts of the full batch, then one insert; no bisection
+    assert writer.metrics()["retried_batches"] == 2
+
+
+def test_only_the_bad_row_of_a_batch_fails(users):
+    state = {"failures": 0, "executes": 0}
+    writer = MessageWriter(session_factory=lambda: FlakySession(state), batch_size=4, retry_delay=0.001)
+
+    results = write_all(writer, [(*users, "fine"), (*users, "bad"), (*users, "also fine"), (*users, "last")])
+
+    assert [isinstance(result, Exception) for result in results] == [False, True, False, False]
+    assert writer.metrics()["retried_batches"] == 0
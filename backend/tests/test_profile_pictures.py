@@ -0,0 +1,73 @@
+"""Uploads are validated and rendered in the staging directory; only complete, decodable pictures are published."""
+import io
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from app.routes import user_routes
+from app.services import profile_pictures
+
+
+@pytest.fixture
+def picture_dirs(tmp_path, monkeypatch):
+    upload_dir, staging_dir = tmp_path / "profile_pics", tmp_path / "uploads"
+    upload_dir.mkdir()
+    staging_dir.mkdir()
+    monkeypatch.setattr(profile_pictures, "UPLOAD_DIR", str(upload_dir))
+    monkeypatch.setattr(profile_pictures, "STAGING_DIR", str(staging_dir))
+    return upload_dir, staging_dir
+
+
+def jpeg_bytes(seed: int = 0) -> bytes:
+    pixels = np.random.default_rng(seed).integers(0, 256, size=(400, 600, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def upload(client, headers, content: bytes):
+    return client.post("/update-profile", data={"hometown": "Claremont"},
+                       files={"profile_picture": ("picture.jpg", content, "image/jpeg")}, headers=headers)
+
+
+def test_picture_is_published_with_thumbnails(client, register, picture_dirs):
+    upload_dir, staging_dir = picture_dirs
+    _, headers = register("picture-user")
+
+    response = upload(client, headers, jpeg_bytes())
+
+    assert response.status_code == 200, response.text
+    name = os.path.basename(response.json()["profile_picture"]).rsplit(".", 1)[0]
+    expected = {f"{name}.jpg"} | {f"{name}_{size}.jpg" for size in profile_pictures.THUMBNAIL_SIZES}
+    assert set(os.listdir(upload_dir)) == expected
+    assert os.listdir(staging_dir) == []
+
+
+def test_truncated_picture_is_rejected_and_not_published(client, register, picture_dirs):
+    upload_dir, staging_dir = picture_dirs
+    _, headers = register("truncated-picture-user")
+    content = jpeg_bytes()
+
+    response = upload(client, headers, content[:len(content) // 2])
+
+    assert response.status_code == 400
+    assert os.listdir(upload_dir) == []
+    assert os.listdir(staging_dir) == []
+
+
+def test_picture_is_removed_when_registration_fails(client, picture_dirs, monkeypatch):
+    upload_dir, staging_dir = picture_dirs
+
+    def fail_insert(db, user):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(user_routes, "save_new_user", fail_insert)
+    response = client.post(
+        "/register",
+        data={"email": "failed-insert@mymail.pomona.edu", "password": "Passw0rd!", "school": "Pomona College"},
+        files={"profile_picture": ("picture.jpg", jpeg_bytes(seed=1), "image/jpeg")},
+    )
+
+    assert response.status_code == 500
+    assert os.listdir(upload_dir) == []
+    assert os.listdir(staging_dir) == []
@@ -0,0 +1,49 @@
+"""Each match endpoint must cost a fixed number of queries, however many matches the user has (no N+1)."""
+import pytest
+from app.database import SessionLocal
+from app.models import Match, Response
+
+MATCHES = 4
+
+
+@pytest.fixture(scope="module")
+def matched_user(client, register):
+    """A user with MATCHES matches, on both sides of the Match rows, all with questionnaire answers."""
+    user_id, headers = register("query-count-user")
+    partners = [register(f"query-count-partner{i}")[0] for i in range(MATCHES)]
+    db = SessionLocal()
+    try:
+        for i, partner_id in enumerate(partners):
+            user_a, user_b = (user_id, partner_id) if i % 2 else (partner_id, user_id)
+            db.add(Match(user_id=user_a, match_id=user_b, similarity_score=0.5))
+        for i, member in enumerate([user_id] + partners):
+            db.add(Response(user_id=member, answers=Response.pack_answers([(i + q) % 7 + 1 for q in range(25)])))
+        db.commit()
+    finally:
+        db.close()
+    return headers
+
+
+def request_queries(client, count_queries, method: str, path: str, headers: dict):
+    client.request(method, path, headers=headers)  # Warm the auth and similarity caches
+    with count_queries() as statements:
+        response = client.request(method, path, headers=headers)
+    assert response.status_code == 200, response.text
+    return response, statements
+
+
+def test_match_results_is_one_query(client, count_queries, matched_user):
+    response, statements = request_queries(client, count_queries, "GET", "/match-results", matched_user)
+    assert len(response.json()) == MATCHES
+    assert len(statements) == 1, statements
+
+
+def test_match_notify_is_one_query(client, count_queries, matched_user):
+    _, statements = request_queries(client, count_queries, "POST", "/match/notify", matched_user)
+    assert len(statements) == 1, statements
+
+
+def test_best_matches_is_one_query(client, count_queries, matched_user):
+    response, statements = request_queries(client, count_queries, "GET", "/matches", matched_user)
+    assert response.json()["matches"]
+    assert len(statements) == 1, statements
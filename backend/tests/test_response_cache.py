@@ -0,0 +1,26 @@
+"""The response cache's version bookkeeping stays bounded and never lets a stale body in."""
+from app.services.response_cache import PROFILES, ResponseCache
+
+
+def test_versions_are_bounded_like_the_entries():
+    cache = ResponseCache(maxsize=4)
+    for user_id in range(100):
+        cache.get_or_build(PROFILES, user_id, lambda: {"user": user_id})
+        cache.invalidate(PROFILES, user_id)
+
+    assert len(cache._versions) == 4
+    assert len(cache._entries) <= 4
+
+
+def test_body_built_across_an_invalidation_is_not_stored_even_if_its_version_is_evicted():
+    cache = ResponseCache(maxsize=2)
+
+    def stale_build():
+        # A write lands while the body is being built, then enough other writes evict the user's version
+        cache.invalidate(PROFILES, 1)
+        for other in range(2, 5):
+            cache.invalidate(PROFILES, other)
+        return {"name": "before the write"}
+
+    cache.get_or_build(PROFILES, 1, stale_build)
+    assert b"after the write" in cache.get_or_build(PROFILES, 1, lambda: {"name": "after the write"}).body
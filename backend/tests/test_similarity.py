@@ -0,0 +1,95 @@
+"""A snapshot patched one user at a time must rank neighbors exactly like one rebuilt from scratch."""
+import numpy as np
+from app.database import SessionLocal
+from app.models import QUESTION_COUNT, Response
+from app.services.neighbor_index import build_index, normalize_rows
+from app.services.preprocessing import FeaturePipeline, fit_params
+from app.services.response_loader import responses_fingerprint
+from app.services.similarity import SimilaritySnapshot, SimilarityStore
+
+TOP_K = 8
+PIPELINE = FeaturePipeline(fit_params(np.ones((1, QUESTION_COUNT), dtype=np.int8), scaling="none"), "test", {})
+
+
+def random_answers(rng, count: int) -> np.ndarray:
+    """Answers drawn from a few archetypes, so many users tie exactly."""
+    archetypes = rng.integers(1, 8, size=(6, QUESTION_COUNT), dtype=np.int8)
+    return archetypes[rng.integers(0, len(archetypes), size=count)]
+
+
+def build(answers_by_user: dict, version: int = 1) -> SimilaritySnapshot:
+    """Snapshot built the way SimilarityStore._build does, rows in user id order."""
+    user_ids = np.array(sorted(answers_by_user), dtype=np.int64)
+    answers = np.array([answers_by_user[user_id] for user_id in user_ids])
+    vectors = normalize_rows(PIPELINE.transform(answers))
+    neighbors, scores = build_index(vectors, ids=user_ids).top_k(TOP_K)
+    return SimilaritySnapshot(version, user_ids, vectors, neighbors, scores, pipeline=PIPELINE)
+
+
+def neighbor_lists(snapshot: SimilaritySnapshot) -> dict:
+    """user id -> [(neighbor user id, score), ...] with positions resolved to user ids."""
+    return {
+        int(user_id): [(int(snapshot.user_ids[j]), round(float(score), 5))
+                       for j, score in zip(snapshot.neighbors[i], snapshot.scores[i]) if np.isfinite(score)]
+        for i, user_id in enumerate(snapshot.user_ids)
+    }
+
+
+def test_patched_snapshot_equals_rebuild():
+    rng = np.random.default_rng(7)
+    answers_by_user = dict(zip(range(10, 130), random_answers(rng, 120)))
+    snapshot = build(answers_by_user)
+
+    # New users (some with lower ids than everyone else), changed answers and removals, interleaved
+    version = 1
+    for step in range(60):
+        version += 1
+        kind = step % 3
+        if kind == 0:
+            user_id = int(rng.integers(1, 10)) if step % 2 else 200 + step
+            answers_by_user[user_id] = random_answers(rng, 1)[0]
+            snapshot = snapshot.with_user(user_id, answers_by_user[user_id], version, TOP_K)
+        elif kind == 1:
+            user_id = int(rng.choice(list(answers_by_user)))
+            answers_by_user[user_id] = random_answers(rng, 1)[0]
+            snapshot = snapshot.with_user(user_id, answers_by_user[user_id], version, TOP_K)
+        else:
+            user_id = int(rng.choice(list(answers_by_user)))
+            del answers_by_user[user_id]
+            snapshot = snapshot.without_user(user_id, version, TOP_K)
+        assert snapshot is not None
+
+    rebuilt = build(answers_by_user)
+    assert neighbor_lists(snapshot) == neighbor_lists(rebuilt)
+    for user_id in answers_by_user:
+        assert snapshot.reciprocal_matches(user_id, 5) == rebuilt.reciprocal_matches(user_id, 5)
+
+
+def test_editing_an_older_response_patches_in_the_newest(register):
+    """A user with two responses keeps the newest one, like load_answer_matrix, when the older one is edited."""
+    rng = np.random.default_rng(11)
+    user_ids = [register(f"older-response-{i}")[0] for i in range(6)]
+    db = SessionLocal()
+    try:
+        for user_id in user_ids:
+            db.add(Response(user_id=user_id, answers=Response.pack_answers(random_answers(rng, 1)[0].tolist())))
+        older = Response(user_id=user_ids[0], answers=Response.pack_answers(random_answers(rng, 1)[0].tolist()))
+        db.add(older)
+        db.flush()
+        db.add(Response(user_id=user_ids[0], answers=Response.pack_answers(random_answers(rng, 1)[0].tolist())))
+        db.commit()
+
+        store = SimilarityStore(top_k=TOP_K, refresh_interval=0)
+        store.snapshot(db)
+        older.answers = Response.pack_answers(random_answers(rng, 1)[0].tolist())
+        db.commit()
+        store.update_user(db, user_ids[0])
+        assert (store.rebuilds, store.patched_users) == (1, 1)
+
+        patched = store.snapshot(db)
+        rebuilt = SimilarityStore(top_k=TOP_K)._build(db, responses_fingerprint(db))
+        idx = patched.index[user_ids[0]]
+        assert np.array_equal(patched.vectors[idx], rebuilt.vectors[rebuilt.index[user_ids[0]]])
+        assert neighbor_lists(patched) == neighbor_lists(rebuilt)
+    finally:
+        db.close()
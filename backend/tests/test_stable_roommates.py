@@ -0,0 +1,47 @@
+"""Irving's solver returns stable matchings, and falls back when an instance has none."""
+from functools import partial
+import numpy as np
+from app.services import match_engine
+from app.services.neighbor_index import build_index, normalize_rows
+from app.services.stable_roommates import StableRoommates, blocking_pairs, stable_matching
+
+# Rows 0-2 rank each other in a cycle and row 3 last: the classic instance with no stable matching
+NO_STABLE_MATCHING = np.array([[1, 2, 3], [2, 0, 3], [0, 1, 3], [0, 1, 2]])
+
+
+def test_top_k_lists_from_similarity_get_a_stable_matching():
+    # Lists ranked by one symmetric score always admit a stable matching; these are built like a block's lists
+    vectors = normalize_rows(np.random.default_rng(3).integers(1, 8, size=(300, 25)).astype(np.float32))
+    neighbors, _ = build_index(vectors, mode="exact").top_k(10)
+
+    partner, removed = stable_matching(neighbors)
+
+    assert removed == []
+    assert blocking_pairs(neighbors, partner) == 0
+    paired = np.flatnonzero(partner >= 0)
+    assert np.array_equal(partner[partner[paired]], paired)
+
+
+def test_unsolvable_rows_are_taken_out_and_the_rest_solved_stably():
+    assert StableRoommates(NO_STABLE_MATCHING).solve() == (None, False)
+
+    partner, removed = stable_matching(NO_STABLE_MATCHING)
+
+    assert removed
+    assert (partner[removed] == -1).all()
+    rest = np.where(np.isin(NO_STABLE_MATCHING, removed), -1, NO_STABLE_MATCHING)
+    rest[removed] = -1
+    assert blocking_pairs(rest, partner) == 0
+    assert stable_matching(NO_STABLE_MATCHING, max_restarts=0) == (None, removed)
+
+
+def test_block_without_stable_matching_is_paired_greedily(monkeypatch):
+    monkeypatch.setattr(match_engine, "stable_matching", partial(stable_matching, max_restarts=0))
+    vectors = normalize_rows(np.random.default_rng(5).random((4, 25), dtype=np.float32))
+    rows = np.arange(4)
+    scores = np.einsum("ij,ij->i", vectors[rows.repeat(3)], vectors[NO_STABLE_MATCHING.ravel()]).reshape(4, 3)
+
+    pairs = match_engine._stable_pairs(vectors, [(rows, NO_STABLE_MATCHING, scores)], np.ones(4, dtype=bool),
+                                       set(), [11, 12, 13, 14])
+
+    assert sorted(user for a, b, _ in pairs for user in (a, b)) == [0, 1, 2, 3]
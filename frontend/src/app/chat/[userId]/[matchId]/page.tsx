@@ -6,6 +6,7 @@ import { useAuth } from "@/app/context/AuthContext";
 import { getMessages, sendMessage, getMatchProfile } from "@/app/utils/api";
 
 interface Message {
+  id?: number;
   sender: string;
   content: string;
   timestamp: string;
@@ -14,6 +15,7 @@ interface Message {
 interface MatchProfile {
   email: string;
   profile_picture?: string;
+  profile_picture_thumbnail?: string;
   hometown?: string;
   major?: string;
   interests?: string;
@@ -30,6 +32,8 @@ export default function ChatPage() {
   const matchIdStr: string = Array.isArray(matchId) ? matchId[0] : matchId || "";
 
   const [messages, setMessages] = useState<Message[]>([]);
+  const [hasOlder, setHasOlder] = useState(false);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [newMessage, setNewMessage] = useState("");
   const [matchProfile, setMatchProfile] = useState<MatchProfile | null>(null);
   const fetchedMatchRef = useRef<string | null>(null); // Store last fetched matchId
@@ -48,8 +52,9 @@ export default function ChatPage() {
         const profileData = await getMatchProfile(matchIdStr);
         setMatchProfile(profileData);
 
-        const messageData = await getMessages(userIdStr, matchIdStr);
-        setMessages(messageData);
+        const page = await getMessages(userIdStr, matchIdStr);
+        setMessages(page.messages);
+        setHasOlder(page.hasMore);
       } catch (error) {
         console.error("Error fetching chat data:", error);
       }
@@ -58,6 +63,17 @@ export default function ChatPage() {
     fetchData();
   }, [userIdStr, matchIdStr]);
 
+  const loadOlder = async () => {
+    const oldest = messages.find((msg) => msg.id !== undefined);
+    if (!oldest || loadingOlder) return;
+
+    setLoadingOlder(true);
+    const page = await getMessages(userIdStr, matchIdStr, oldest.id);
+    setMessages((current) => [...page.messages, ...current]);
+    setHasOlder(page.hasMore);
+    setLoadingOlder(false);
+  };
+
   const handleSend = async () => {
     if (!userIdStr || !matchIdStr) {
       console.error("Cannot send message: userId or matchId is undefined!");
@@ -85,7 +101,7 @@ export default function ChatPage() {
         <div className="mb-4 flex items-center gap-4 p-4 border rounded-lg shadow bg-gray-50">
           {matchProfile.profile_picture ? (
             <img
-              src={`http://127.0.0.1:8000${matchProfile.profile_picture}`}
+              src={`http://127.0.0.1:8000${matchProfile.profile_picture_thumbnail || matchProfile.profile_picture}`}
               alt="Profile"
               className="w-16 h-16 object-cover rounded-full"
             />
@@ -110,6 +126,11 @@ export default function ChatPage() {
 
       {/* Chat Messages */}
       <div className="h-96 overflow-y-auto border rounded-lg p-4 bg-gray-100 flex flex-col">
+        {hasOlder && (
+          <button onClick={loadOlder} disabled={loadingOlder} className="mb-2 self-center text-sm text-blue-500">
+            {loadingOlder ? "Loading..." : "Load older messages"}
+          </button>
+        )}
         {messages.map((msg, index) => {
           const isSentByUser = loggedInUserId && msg.sender.toString() === loggedInUserId.toString();
 
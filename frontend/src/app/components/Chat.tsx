@@ -16,7 +16,16 @@ export default function Chat({ userId, receiverId }: { userId: number; receiverI
     const socket = new WebSocket(`ws://127.0.0.1:8000/chat/${userId}/${receiverId}`);
 
     socket.onmessage = (event) => {
-      setMessages((prev) => [...prev, { sender: "them", content: event.data }]);
+      // Frames are JSON; only "message" frames are chat messages (acks and errors answer frames we sent)
+      let frame;
+      try {
+        frame = JSON.parse(event.data);
+      } catch {
+        return;
+      }
+      if (frame.type !== undefined && frame.type !== "message") return;
+      const sender = String(frame.sender) === String(userId) ? "me" : "them";
+      setMessages((prev) => [...prev, { sender, content: frame.content }]);
     };
 
     socket.onclose = () => console.log("Chat closed");
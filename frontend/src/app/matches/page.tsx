@@ -12,6 +12,7 @@ interface Match {
     score: number;
     profile?: {
       profile_picture?: string;
+      profile_picture_thumbnail?: string;
       hometown?: string;
       major?: string;
       interests?: string;
@@ -102,7 +103,7 @@ export default function MatchesPage() {
                   {/* Profile Picture Large */}
                   {match.profile.profile_picture ? (
                     <img
-                      src={`http://127.0.0.1:8000${match.profile.profile_picture}`}
+                      src={`http://127.0.0.1:8000${match.profile.profile_picture_thumbnail || match.profile.profile_picture}`}
                       alt="Profile"
                       className="w-36 h-35 object-cover rounded-lg"
                     />
@@ -197,10 +197,12 @@ export const getUserResponses = async () => {
 };
 
 
-export const getMessages = async (userId: string, matchId: string) => {
+// Loads one page of a conversation, oldest first: the newest messages, or the ones before message id `before`.
+// hasMore tells whether older messages are left to load.
+export const getMessages = async (userId: string, matchId: string, before?: number) => {
   if (!userId || !matchId) {
     console.error("Cannot fetch messages: userId or matchId is undefined!");
-    return [];
+    return { messages: [], hasMore: false };
   }
 
   try {
@@ -210,12 +212,13 @@ export const getMessages = async (userId: string, matchId: string) => {
 
     const response = await axios.get(`http://127.0.0.1:8000/chat/messages/${userId}/${matchId}`, {
       headers: { Authorization: `Bearer ${token}` },
+      params: before !== undefined ? { before } : {},
     });
 
-    return response.data;
+    return { messages: response.data, hasMore: response.headers["x-has-more"] === "true" };
   } catch (error) {
     console.error("Error fetching messages:", error);
-    return [];
+    return { messages: [], hasMore: false };
   }
 };
 